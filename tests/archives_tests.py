@@ -0,0 +1,88 @@
+"""
+Unit tests for the reading of archives and JSON lines files.
+"""
+
+import gzip
+import io
+import json
+import logging
+import os
+import sys
+import tarfile
+import zipfile
+
+import pytest
+
+from trafilatura import cli
+from trafilatura.archives import extract_records, iter_records, record_options
+from trafilatura.settings import Extractor
+
+logging.basicConfig(stream=sys.stdout, level=logging.DEBUG)
+
+HTML = "<html><body><article><p>" + "Stored text of a page. " * 20 + "</p></article></body></html>"
+
+
+def _write_archives(directory):
+    "Store the same pages in a tar, a zip and a JSON lines file."
+    pages = {"site/a.html": HTML.replace("Stored", "First"), "site/b.html": HTML.replace("Stored", "Second")}
+    with tarfile.open(directory / "pages.tar.gz", "w:gz") as archive:
+        for name, html in pages.items():
+            info = tarfile.TarInfo(name)
+            data = html.encode()
+            info.size, info.mtime = len(data), 1700000000
+            archive.addfile(info, io.BytesIO(data))
+        info = tarfile.TarInfo("site/style.css")
+        archive.addfile(info, io.BytesIO(b""))
+    with zipfile.ZipFile(directory / "pages.zip", "w") as archive:
+        for name, html in pages.items():
+            archive.writestr(zipfile.ZipInfo(name, (2023, 11, 14, 0, 0, 0)), html)
+    with gzip.open(directory / "pages.jsonl.gz", "wt", encoding="utf-8") as filehandle:
+        for i, html in enumerate(pages.values()):
+            filehandle.write(json.dumps({"url": f"https://example.org/{i}", "html": html, "date": "2023-11-14T12:00"}) + "\n")
+        filehandle.write("not JSON\n")
+        filehandle.write(json.dumps({"html": HTML}) + "\n")
+
+
+def test_iter_records(tmp_path):
+    "Pages are read from archives along with their source and date."
+    _write_archives(tmp_path)
+    tar = list(iter_records(str(tmp_path / "pages.tar.gz")))
+    assert [(source, url) for source, url, _, _ in tar] == [("site/a.html", None), ("site/b.html", None)]
+    assert b"First" in tar[0][2] and tar[0][3] == "2023-11-14"
+    archived = list(iter_records(str(tmp_path / "pages.zip")))
+    assert [r[0] for r in archived] == ["site/a.html", "site/b.html"] and archived[1][3] == "2023-11-14"
+    lines = list(iter_records(str(tmp_path / "pages.jsonl.gz")))
+    assert [r[1] for r in lines] == ["https://example.org/0", "https://example.org/1", None]
+    assert lines[2][0].endswith("pages.jsonl.gz:4") and lines[0][3] == "2023-11-14"
+    with pytest.raises(ValueError):
+        list(iter_records(str(tmp_path / "pages.rar")))
+
+    options = record_options(Extractor(), lines[0])
+    assert options.url == options.source == "https://example.org/0"
+    assert options.date_params["max_date"] == "2023-11-14"
+
+    results = dict(extract_records(str(tmp_path / "pages.jsonl.gz"), Extractor(output_format="json", with_metadata=True)))
+    assert json.loads(results["https://example.org/1"])["source"] == "https://example.org/1"
+    assert "Second text" in json.loads(results["https://example.org/1"])["text"]
+
+
+def test_cli_archives(tmp_path):
+    "Archives are processed by the command-line interface."
+    _write_archives(tmp_path)
+    output = tmp_path / "output"
+    args = cli.parse_args(["--input-archive", str(tmp_path / "pages.tar.gz"), str(tmp_path / "pages.zip"), "-o", str(output)])
+    cli.process_args(args)
+    outputs = [f for _, _, files in os.walk(output) for f in files]
+    # two pages with different content, the same ones in both archives
+    assert len(outputs) == 2
+
+    # backups of the archived pages
+    args = cli.parse_args(
+        ["--input-archive", str(tmp_path / "pages.zip"), "-o", str(output), "--backup-dir", str(tmp_path / "backup")]
+    )
+    cli.process_args(args)
+    backups = [os.path.join(d, f) for d, _, files in os.walk(tmp_path / "backup") for f in files]
+    assert len(backups) == 2
+    for filename in backups:
+        with gzip.open(filename, "rt", encoding="utf-8") as filehandle:
+            assert filehandle.read().startswith("<html><body><article><p>")
@@ -0,0 +1,277 @@
+"""
+Measure the speed and memory use of Trafilatura on the bundled test pages
+and compare the results with a previous run.
+
+python3 benchmark.py run --output baseline.json
+python3 benchmark.py compare baseline.json new.json
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from functools import wraps
+from importlib.metadata import version
+from statistics import mean
+
+from trafilatura import bare_extraction, baseline, core, external, extract, extract_metadata, html2txt
+from trafilatura.meta import reset_caches
+
+logging.basicConfig(stream=sys.stderr, level=logging.ERROR)
+
+TEST_DIR = os.path.abspath(os.path.dirname(__file__))
+CORPORA = ("cache", "eval")
+
+FUNCTIONS = {
+    "extract": extract,
+    "bare_extraction": bare_extraction,
+    "extract_metadata": extract_metadata,
+    "baseline": baseline,
+    "html2txt": html2txt,
+}
+
+# functions timed inside the extraction: module, attribute, stage name
+# the stages are nested, e.g. readability and justext run within the comparison
+STAGES = [
+    (core, "load_html", "load_html"),
+    (core, "extract_metadata", "metadata"),
+    (core, "tree_cleaning", "tree_cleaning"),
+    (core, "extract_content", "main_extractor"),
+    (core, "compare_extraction", "external_comparison"),
+    (external, "try_readability", "readability"),
+    (core, "justext_rescue", "justext"),
+    (external, "justext_rescue", "justext"),
+    (core, "baseline", "baseline_rescue"),
+    (core, "_recall_retry", "recall_retry"),
+    (core, "determine_returnstring", "output"),
+]
+CASCADE = ("main_extractor", "external_comparison", "justext", "baseline_rescue", "recall_retry")
+
+# relative changes considered as regressions by default
+THRESHOLD = 0.1
+
+STAGE_TIMES = defaultdict(float)
+STAGE_CALLS = Counter()
+FIRED = set()
+
+
+def load_documents(limit=None):
+    "Read the HTML files of the test corpora."
+    documents = {}
+    for corpus in CORPORA:
+        directory = os.path.join(TEST_DIR, corpus)
+        for filename in sorted(os.listdir(directory)):
+            if filename.endswith(".html"):
+                with open(os.path.join(directory, filename), "rb") as inputf:
+                    documents[f"{corpus}/{filename}"] = inputf.read()
+    if limit:
+        documents = dict(list(documents.items())[:limit])
+    return documents
+
+
+def _timed(func, stage):
+    "Wrap a function so that its calls and execution time are recorded."
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            STAGE_TIMES[stage] += time.perf_counter() - start
+            STAGE_CALLS[stage] += 1
+            FIRED.add(stage)
+
+    return wrapper
+
+
+def instrument():
+    "Replace the functions of the extraction stages by timed versions, return a function undoing it."
+    originals = [(module, name, getattr(module, name)) for module, name, _ in STAGES]
+    for module, name, stage in STAGES:
+        setattr(module, name, _timed(getattr(module, name), stage))
+
+    def restore():
+        for module, name, func in originals:
+            setattr(module, name, func)
+
+    return restore
+
+
+def percentile(values, share):
+    "Nearest-rank percentile."
+    values = sorted(values)
+    return values[max(int(share * len(values) + 0.5) - 1, 0)] if values else 0.0
+
+
+def measure_function(name, documents, repeat):
+    "Time a function on every document, record the stages and the cascade."
+    func = FUNCTIONS[name]
+    cascade = Counter()
+    timings = {}
+    # warm-up: imports and lazy initializations
+    func(next(iter(documents.values())))
+    STAGE_TIMES.clear()
+    STAGE_CALLS.clear()
+    for docname, htmlstring in documents.items():
+        runs = []
+        for _ in range(repeat):
+            FIRED.clear()
+            start = time.perf_counter()
+            func(htmlstring)
+            runs.append(time.perf_counter() - start)
+        cascade.update(FIRED)
+        timings[docname] = min(runs)
+    values = list(timings.values())
+    return {
+        "total": sum(values),
+        "mean": mean(values),
+        "p50": percentile(values, 0.5),
+        "p95": percentile(values, 0.95),
+        "max": max(values),
+        "slowest": sorted(timings, key=timings.get, reverse=True)[:5],
+        "stages": {
+            stage: {"calls": STAGE_CALLS[stage], "time": STAGE_TIMES[stage] / repeat}
+            for stage in sorted(STAGE_CALLS, key=STAGE_TIMES.get, reverse=True)
+        },
+        "cascade": {stage: cascade[stage] / len(documents) for stage in CASCADE if stage in cascade},
+    }, timings
+
+
+def measure_memory(name, documents):
+    "Peak memory allocated by a function, by document, in bytes."
+    func = FUNCTIONS[name]
+    peaks = []
+    tracemalloc.start()
+    for htmlstring in documents.values():
+        tracemalloc.reset_peak()
+        func(htmlstring)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+    tracemalloc.stop()
+    return {"peak": max(peaks), "mean_peak": int(mean(peaks))}
+
+
+def _extract_all(htmlstrings):
+    "Worker function."
+    for htmlstring in htmlstrings:
+        extract(htmlstring)
+    return len(htmlstrings)
+
+
+def measure_throughput(documents, workers):
+    "Documents per second with extract() in several processes."
+    htmlstrings = list(documents.values())
+    chunks = [htmlstrings[i : i + 10] for i in range(0, len(htmlstrings), 10)]
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        total = sum(executor.map(_extract_all, chunks))
+    return total / (time.perf_counter() - start)
+
+
+def run(args):
+    "Run the benchmark and write the results."
+    documents = load_documents(args.limit)
+    print(f"{len(documents)} documents", file=sys.stderr)
+    results = {
+        "meta": {
+            "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "trafilatura": version("trafilatura"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "documents": len(documents),
+            "repeat": args.repeat,
+        },
+        "functions": {},
+        "documents": {},
+        "throughput": {},
+    }
+    restore = instrument()
+    try:
+        for name in args.functions:
+            # caches would favor later functions
+            reset_caches()
+            figures, timings = measure_function(name, documents, args.repeat)
+            reset_caches()
+            figures.update(measure_memory(name, documents))
+            results["functions"][name] = figures
+            results["documents"][name] = timings
+            print(f"{name}: {figures['total']:.2f}s, peak {figures['peak'] / 2**20:.1f} MB", file=sys.stderr)
+    finally:
+        restore()
+    for workers in args.workers:
+        results["throughput"][str(workers)] = measure_throughput(documents, workers)
+        print(f"{workers} workers: {results['throughput'][str(workers)]:.1f} docs/s", file=sys.stderr)
+
+    with open(args.output, "w", encoding="utf-8") as outputf:
+        json.dump(results, outputf, indent=1)
+
+
+def compare(args):
+    "Compare two result files, flag regressions and return the exit code."
+    with open(args.old, encoding="utf-8") as inputf:
+        old = json.load(inputf)
+    with open(args.new, encoding="utf-8") as inputf:
+        new = json.load(inputf)
+
+    regressions = []
+    rows = []
+    # higher is worse, except for throughput
+    for name, figures in new["functions"].items():
+        if name not in old["functions"]:
+            continue
+        for key in ("total", "p95", "peak"):
+            rows.append((f"{name} {key}", old["functions"][name][key], figures[key], False))
+        for stage, values in figures["stages"].items():
+            if stage in old["functions"][name]["stages"]:
+                rows.append((f"{name} stage {stage}", old["functions"][name]["stages"][stage]["time"], values["time"], False))
+    for workers, value in new["throughput"].items():
+        if workers in old["throughput"]:
+            rows.append((f"throughput {workers} workers", old["throughput"][workers], value, True))
+
+    for label, before, after, higher_is_better in rows:
+        change = (after - before) / before if before else 0.0
+        flagged = change < -args.threshold if higher_is_better else change > args.threshold
+        if flagged:
+            regressions.append(label)
+        print(f"{'!' if flagged else ' '} {label:<45} {before:>14.4f} {after:>14.4f} {change:>+8.1%}")
+
+    if old["meta"]["documents"] != new["meta"]["documents"]:
+        print("warning: different number of documents", file=sys.stderr)
+    if regressions:
+        print(f"{len(regressions)} regressions above {args.threshold:.0%}", file=sys.stderr)
+        return 1
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Trafilatura on the test pages")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    run_parser = subparsers.add_parser("run", help="measure and write the results to a JSON file")
+    run_parser.add_argument("--output", default="benchmark.json", help="JSON file to write")
+    run_parser.add_argument(
+        "--functions", nargs="+", choices=list(FUNCTIONS), default=list(FUNCTIONS), help="functions to measure"
+    )
+    run_parser.add_argument("--limit", type=int, help="only use the first documents")
+    run_parser.add_argument("--repeat", type=int, default=1, help="runs per document, the fastest is kept")
+    run_parser.add_argument("--workers", type=int, nargs="*", default=[1, 2, 4], help="worker counts for throughput")
+    compare_parser = subparsers.add_parser("compare", help="compare two result files")
+    compare_parser.add_argument("old", help="baseline results")
+    compare_parser.add_argument("new", help="new results")
+    compare_parser.add_argument("--threshold", type=float, default=THRESHOLD, help="tolerated relative change")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        run(args)
+    else:
+        sys.exit(compare(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -3,16 +3,19 @@ Unit tests for the command-line interface.
 """
 
 import io
+import json
 import logging
 import os
+import pickle
 import re
 import subprocess
 import sys
+import time
 
 from contextlib import redirect_stdout
 from datetime import datetime
 from os import path
-from tempfile import gettempdir
+from tempfile import TemporaryDirectory, gettempdir
 from unittest.mock import patch
 
 import pytest
@@ -20,7 +23,10 @@ import pytest
 from courlan import UrlStore
 
 from trafilatura import cli, cli_utils, spider, settings
+from trafilatura.deduplication import SIMHASH_INDEX
 from trafilatura.downloads import add_to_compressed_dict, fetch_url
+from trafilatura.meta import reset_caches
+from trafilatura.sinks import ShardWriter, read_record
 from trafilatura.utils import LANGID_FLAG
 
 logging.basicConfig(stream=sys.stdout, level=logging.DEBUG)
@@ -124,6 +130,14 @@ def test_keep_dirs_requires_output_dir():
         cli.parse_args(["--keep-dirs"])
 
 
+def test_dedup_store_requires_deduplicate():
+    "--dedup-store without --deduplicate must exit with an error."
+    with pytest.raises(SystemExit):
+        cli.parse_args(["--dedup-store", "dedup.sqlite"])
+    args = cli.parse_args(["--deduplicate", "--dedup-store", "dedup.sqlite"])
+    assert args.dedup_store == "dedup.sqlite"
+
+
 def test_list_ignores_extraction_opts(capsys):
     "--list warns about extraction/format options that have no effect in list mode."
     cli.parse_args(["--list", "--json"])
@@ -194,6 +208,36 @@ def test_input_type():
     assert 10 <= len(list(cli_utils.generate_filelist(RESOURCES_DIR))) <= 21
 
 
+def _near_duplicate_downloads(bufferlist, args, options):
+    "Pages differing by a single word."
+    text = " ".join(f"token{i}word" for i in range(1000))
+    for url in bufferlist:
+        yield url, f"<html><body><article><p>{text}</p><p>{url[8:-5]}</p></article></body></html>"
+
+
+def test_cli_near_dedup(tmp_path):
+    "Near-duplicate documents are discarded with --near-dedup, whatever the number of processes."
+    args = cli.parse_args(["--near-dedup"])
+    html = "<html><body><article>" + "<p>Near-duplicate paragraph content, repeated.</p>" * 5 + "</article></body></html>"
+    result = cli.examine(html, args)
+    assert result is not None and cli.examine(html.replace("repeated", "duplicated", 1), args) is not None
+    with redirect_stdout(io.StringIO()):
+        assert cli_utils.write_result(result, args) is True
+        assert cli_utils.write_result(cli.examine(html.replace("repeated", "duplicated", 1), args), args) is False
+        assert cli_utils.write_result(result, cli.parse_args([])) is True
+
+    # the hashes are kept in the main process
+    urls = [f"https://example{i}.org/" for i in range(6)]
+    for parallel in ("1", "3"):
+        SIMHASH_INDEX.clear()
+        outputdir = tmp_path / parallel
+        args = cli.parse_args(["-o", str(outputdir), "--near-dedup", "--parallel", parallel])
+        with patch.object(cli_utils, "download_pages", _near_duplicate_downloads):
+            cli_utils.download_queue_processing(add_to_compressed_dict(urls), args, -1, settings.args_to_extractor(args))
+        assert len(os.listdir(outputdir)) == 1
+    SIMHASH_INDEX.clear()
+
+
 def test_cli_stdin():
     "Input read directly from STDIN when no URL/file/dir is given."
     testargs = ["", "-v"]
@@ -376,6 +420,14 @@ def test_cli_pipeline():
     with redirect_stdout(f):
         cli.process_args(args)
     assert f.getvalue().strip().endswith("https://www.sitemaps.org/zh_TW/terms.html")
+    # recurring run: the entries are older than the first run
+    with TemporaryDirectory() as tmpdir:
+        args = cli.parse_args([*testargs[1:], "--sitemap-state", path.join(tmpdir, "state.json")])
+        for expected in (True, False):
+            f = io.StringIO()
+            with redirect_stdout(f):
+                cli.process_args(args)
+            assert bool(f.getvalue().strip()) is expected
     # CLI options
     testargs = ["", "--links", "--images"]
     args = cli.parse_args(testargs[1:])
@@ -390,6 +442,193 @@ def test_cli_pipeline():
     assert result.startswith("<html") and result.endswith("</html>")
 
 
+def test_pipelined_downloads(tmp_path):
+    """test overlapping downloads, extraction and output"""
+    urls = ["https://example.org/", "https://httpbun.com/html", "https://example.com/missing"]
+    testargs = ["", "--parallel", "2", "-o", str(tmp_path / "out"), "--backup-dir", str(tmp_path / "backup")]
+    args = cli.parse_args(testargs[1:])
+    options = settings.args_to_extractor(args)
+    errors, counter = cli_utils.download_queue_processing(add_to_compressed_dict(urls), args, 0, options)
+    assert errors == ["https://example.com/missing"] and counter == 2
+    outputs = [f for _, _, files in os.walk(tmp_path / "out") for f in files]
+    backups = [f for _, _, files in os.walk(tmp_path / "backup") for f in files]
+    assert len(outputs) == 2 and len(backups) == 2
+    # same file names for backup and output
+    assert {f.split(".")[0] for f in outputs} == {f.split(".")[0] for f in backups}
+
+    # no result, no output
+    writer = cli_utils.ResultWriter(args, -1, 1)
+    writer.start()
+    writer.put("", None)
+    assert writer.close() == -1
+
+
+def _fake_downloads(bufferlist, args, options):
+    "Pages sharing a paragraph, each with its own text."
+    repeated = "<p>" + "This paragraph is repeated on every page of the website. " * 5 + "</p>"
+    for url in bufferlist:
+        words = " ".join(f"{url[8:-5]}word{i}" for i in range(60))
+        own = f"<p>Text of the page which is not found anywhere else: {words}.</p>"
+        yield url, f"<html><body><article>{own}{repeated}</article></body></html>"
+
+
+def test_parallel_deduplication(tmp_path):
+    "Segments are counted across all documents whether the extraction runs in one or several processes."
+    urls = [f"https://example{i}.org/" for i in range(8)]
+    for name, extra in (("single", ["--parallel", "1"]), ("parallel", ["--parallel", "3"])):
+        for store in ([], ["--dedup-store", str(tmp_path / f"{name}.sqlite")]):
+            reset_caches()
+            outputdir = tmp_path / f"{name}{len(store)}"
+            args = cli.parse_args(["-o", str(outputdir), "--deduplicate", *extra, *store])
+            with patch.object(cli_utils, "download_pages", _fake_downloads):
+                errors, _ = cli_utils.download_queue_processing(
+                    add_to_compressed_dict(urls), args, -1, settings.args_to_extractor(args)
+                )
+            texts = [(outputdir / f).read_text(encoding="utf-8") for f in os.listdir(outputdir)]
+            assert not errors and len(texts) == 8
+            # kept in the first documents only (as many times as the default maximum)
+            assert sum("repeated on every page" in text for text in texts) == 3
+
+
+def _pool_task(task):
+    "Task for the supervised pool: sleep, fail or crash."
+    if task == "sleep":
+        time.sleep(30)
+    elif task == "error":
+        raise ValueError("bad file")
+    elif task == "crash":
+        os._exit(3)
+    return task.upper()
+
+
+def test_supervised_pool(tmp_path):
+    "Failures and timeouts are recorded, workers are replaced and recycled."
+    pool = cli_utils.SupervisedPool(_pool_task, 2, timeout=1, max_tasks=2)
+    start = time.monotonic()
+    pool.run(["ok", "sleep", "error", "ok", "crash", "ok", "ok"])
+    assert time.monotonic() - start < 15
+    assert sorted((task, status) for task, status, _ in pool.failures) == [
+        ("crash", "crash"),
+        ("error", "error"),
+        ("sleep", "timeout"),
+    ]
+    assert "bad file" in next(m for t, _, m in pool.failures if t == "error")
+    # initial workers, replacement of the killed ones and recycling
+    assert pool.spawned > 3
+
+    pool = cli_utils.SupervisedPool(_pool_task, 1, max_tasks=2)
+    results = []
+    pool.run(["ok"] * 6, lambda task, result: results.append(result))
+    assert pool.spawned == 3 and not pool.failures
+    assert results == ["OK"] * 6
+
+    report = tmp_path / "report.jsonl"
+    cli_utils.write_failure_report([(("file.html", -1), "timeout", "too long")], str(report))
+    assert json.loads(report.read_text(encoding="utf-8")) == {"file": "file.html", "status": "timeout", "message": "too long"}
+
+    # CLI
+    args = cli.parse_args(["--input-dir", RESOURCES_DIR, "-o", str(tmp_path / "out"), "--failure-report", str(report)])
+    cli_utils.file_processing_pipeline(args)
+    assert report.exists()
+    with pytest.raises(SystemExit):
+        cli.parse_args(["-u", "https://example.org", "--failure-report", str(report)])
+
+
+def test_output_shards(tmp_path):
+    "Results are gathered in rotating shards listed in an index."
+    for compression in (None, "gzip"):
+        directory = tmp_path / str(compression)
+        with ShardWriter(str(directory), "json", shard_size=20, compression=compression) as writer:
+            for i in range(5):
+                writer.write(json.dumps({"text": "abc" * i}), f"https://example.org/{i}")
+        index = [line.split("\t") for line in (directory / "shard-index.tsv").read_text().splitlines()]
+        assert len(index) == 5 and len({shard for _, shard, _, _ in index}) == 3
+        key, shard, offset, length = index[4]
+        assert key == "https://example.org/4"
+        assert json.loads(read_record(str(directory / shard), int(offset), int(length))) == {"text": "abc" * 4}
+        # numbering goes on after the shards of a previous run
+        with ShardWriter(str(directory), "json", compression=compression) as writer:
+            assert writer.write("{}")[0] == "shard-00003.jsonl" + (".gz" if compression else "")
+
+    with ShardWriter(str(tmp_path / "xml"), "xml") as writer:
+        writer.write("<doc/>", "file.html")
+    assert (tmp_path / "xml" / "shard-00000.xml").read_text().endswith("<doc/>\n</collection>\n")
+    with pytest.raises(ValueError):
+        ShardWriter(str(tmp_path), "markdown")
+
+    # CLI
+    with pytest.raises(SystemExit):
+        cli.parse_args(["--input-dir", RESOURCES_DIR, "--shard-size", "1", "--json"])
+    with pytest.raises(SystemExit):
+        cli.parse_args(["--input-dir", RESOURCES_DIR, "-o", str(tmp_path), "--shard-size", "1"])
+    with pytest.raises(SystemExit):
+        cli.parse_args(["--input-dir", RESOURCES_DIR, "-o", str(tmp_path), "--compression", "gzip", "--json"])
+    output = tmp_path / "cli"
+    args = cli.parse_args(
+        ["--input-dir", RESOURCES_DIR, "-o", str(output), "--shard-size", "1", "--compression", "gzip", "--json"]
+    )
+    cli.process_args(args)
+    assert cli_utils.OUTPUT_SHARDS is None
+    index = (output / "shard-index.tsv").read_text().splitlines()
+    assert index and all(line.startswith(RESOURCES_DIR) for line in index)
+    key, shard, offset, length = index[0].split("\t")
+    assert "text" in json.loads(read_record(str(output / shard), int(offset), int(length)))
+
+
+def test_checkpoint(tmp_path):
+    "Progress is saved and resumed, output written after the checkpoint is rolled back."
+    directory = tmp_path / "shards"
+    with ShardWriter(str(directory), "json") as writer:
+        writer.write("{}", "a")
+        state = writer.checkpoint()
+        writer.write("{}", "b")
+    writer = ShardWriter(str(directory), "json")
+    writer.rollback(state)
+    assert sorted(f.name for f in directory.iterdir()) == ["shard-00000.jsonl", "shard-index.tsv"]
+    assert writer.write("{}", "c")[0] == "shard-00001.jsonl"
+    writer.close()
+    assert [line.split("\t")[0] for line in (directory / "shard-index.tsv").read_text().splitlines()] == ["a", "c"]
+
+    with pytest.raises(SystemExit):
+        cli.parse_args(["-i", "list.txt", "--resume"])
+    filename = str(tmp_path / "checkpoint")
+    urls = ["https://example.org/", "https://httpbun.com/html", "https://example.com/missing"]
+    for parallel in ("1", "2"):
+        args = cli.parse_args(["--parallel", parallel, "-o", str(tmp_path / "out"), "--checkpoint", filename])
+        checkpoint = cli_utils.Checkpoint(filename, 0)
+        errors, counter = cli_utils.download_queue_processing(
+            add_to_compressed_dict(urls), args, 0, settings.args_to_extractor(args), checkpoint
+        )
+        state = cli_utils.Checkpoint(filename, 0).load()
+        assert state["url_store"].done and state["errors"] == errors == ["https://example.com/missing"]
+        assert state["counter"] == counter == 2
+
+    # nothing left to do
+    args.resume = True
+    with patch.object(cli_utils, "download_pages") as downloads:
+        assert cli_utils.url_processing_pipeline(args, add_to_compressed_dict(urls)) == 1
+    assert not downloads.called
+
+    # document hashes of a parallel run are saved and restored
+    filename = str(tmp_path / "near-dedup-checkpoint")
+    urls = [f"https://example{i}.org/" for i in range(6)]
+    SIMHASH_INDEX.clear()
+    args = cli.parse_args(["--parallel", "3", "-o", str(tmp_path / "near"), "--near-dedup", "--checkpoint", filename])
+    with patch.object(cli_utils, "download_pages", _near_duplicate_downloads):
+        assert cli_utils.url_processing_pipeline(args, add_to_compressed_dict(urls[:3])) == 0
+    with open(filename, "rb") as checkpoint_file:
+        assert len(pickle.load(checkpoint_file)["simhash"]) == 1
+    SIMHASH_INDEX.clear()
+    args.resume = True
+    state = cli_utils.Checkpoint(filename, 0).load()
+    assert state is not None and len(SIMHASH_INDEX) == 1
+    # the following documents are near-duplicates of the ones written before
+    with patch.object(cli_utils, "download_pages", _near_duplicate_downloads):
+        cli_utils.download_queue_processing(add_to_compressed_dict(urls[3:]), args, -1, settings.args_to_extractor(args))
+    assert len(os.listdir(tmp_path / "near")) == 1
+    SIMHASH_INDEX.clear()
+
+
 def test_file_processing():
     "Test file processing pipeline on actual directories."
     backup = settings.MAX_FILES_PER_DIRECTORY
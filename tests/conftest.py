@@ -70,6 +70,13 @@ def _fake_send(url, no_ssl, with_headers, config):
     return Response(data, 200, final_url)
 
 
+def _fake_stream(url, no_ssl, config):
+    canned = CANNED_RESPONSES.get(url)
+    if canned is not None:
+        data = canned[0] if isinstance(canned, tuple) else canned
+        yield from (data[i : i + 1000] for i in range(0, len(data), 1000))
+
+
 def _fake_is_live(url):
     return any(known.startswith(url.rstrip("/")) for known in CANNED_RESPONSES)
 
@@ -78,5 +85,6 @@ def _fake_is_live(url):
 def mock_network(monkeypatch):
     monkeypatch.setattr(dl, "_send_urllib_request", _fake_send)
     monkeypatch.setattr(dl, "_send_pycurl_request", _fake_send)
+    monkeypatch.setattr(dl, "_stream_urllib_request", _fake_stream)
     monkeypatch.setattr(dl, "_urllib3_is_live_page", _fake_is_live)
     monkeypatch.setattr(dl, "_pycurl_is_live_page", _fake_is_live)
@@ -3,6 +3,10 @@
 Unit tests for the trafilatura's text hashing and cache.
 """
 
+import pickle
+
+from concurrent.futures import ProcessPoolExecutor
+
 import pytest
 
 from lxml import etree, html
@@ -12,7 +16,20 @@ import trafilatura.deduplication
 from trafilatura import extract
 from trafilatura.cli_utils import generate_hash_filename
 from trafilatura.core import Extractor
-from trafilatura.deduplication import LRUCache, Simhash, content_fingerprint, duplicate_test
+from trafilatura.deduplication import (
+    BloomFilter,
+    ClockCache,
+    LRUCache,
+    SQLiteCache,
+    Simhash,
+    SimhashIndex,
+    content_fingerprint,
+    duplicate_test,
+    simhash_many,
+    use_bloom_filter,
+    use_compact_cache,
+    use_shared_store,
+)
 from trafilatura.meta import reset_caches
 
 
@@ -87,6 +104,56 @@ def test_simhash():
     assert Simhash("abcde " * 100).similarity(Simhash("abcde")) == 1.0
 
 
+def test_simhash_many(monkeypatch):
+    "Test batched Simhash computation against the Simhash class."
+    texts = [
+        "This is like putting lipstick on a pig.",
+        "",
+        "这是一个测试。我们在测试中文。",
+        "abcde ijk l, " * 10,
+        "The words are completely different but let's see. " * 20,
+    ]
+    for length in (32, 64, 80):
+        expected = [Simhash(text, length=length).hash for text in texts]
+        assert simhash_many(texts, length) == expected
+        # pure-Python path
+        with monkeypatch.context() as m:
+            m.setattr(trafilatura.deduplication, "HAS_NUMPY", False)
+            assert simhash_many(texts, length) == expected
+    assert simhash_many([]) == []
+
+
+def test_simhash_index(tmp_path):
+    "Test near-duplicate lookups with the Simhash index."
+    with pytest.raises(ValueError):
+        SimhashIndex(distance=64)
+    index = SimhashIndex(distance=3)
+    assert len(index.bands) == 4
+    value = Simhash("This is like putting lipstick on a pig.").hash
+    index.add(value)
+    index.add(value)
+    assert len(index) == 1 and value in index
+    # up to 3 differing bits, spread or within a band
+    for flipped in (value ^ 0b1, value ^ 0b111, value ^ (1 | 1 << 20 | 1 << 63)):
+        assert index.query(flipped) == [value]
+    assert index.query(value ^ 0b1111) == []
+    assert index.query(value ^ (1 << 64) - 1) == []
+
+    # persistence
+    index.add(value ^ (1 << 64) - 1)
+    index.save(str(tmp_path / "index.json"))
+    loaded = SimhashIndex.load(str(tmp_path / "index.json"))
+    assert loaded.distance == 3 and len(loaded) == 2
+    assert loaded.query(value ^ 0b1) == [value]
+
+    # deletion
+    index.remove(value)
+    index.remove(value)
+    assert index.query(value) == [] and len(index) == 1
+    index.clear()
+    assert len(index) == 0 and not any(index.tables)
+
+
 def test_lrucache():
     """test basic duplicate detection"""
     lru_test = LRUCache(maxsize=2)
@@ -131,6 +198,108 @@ def test_lrucache():
     assert lru_test.get("tralala") == -1
 
 
+def test_clockcache():
+    "Test the compact hash-keyed cache."
+    for threadsafe in (True, False):
+        cache = ClockCache(maxsize=2, threadsafe=threadsafe)
+        assert cache.get("tralala") == -1
+        cache.put("a", 1)
+        cache.put("a", 2)
+        assert cache.get("a") == 2 and len(cache) == 1
+        # eviction: size is bounded, recently accessed keys get a second chance
+        for i in range(100):
+            cache.put(str(i), i)
+            cache.get("a")
+            assert len(cache) <= 2
+        assert cache.get("a") == 2 and cache.get("99") == 99 and cache.get("0") == -1
+        cache.clear()
+        assert cache.get("a") == -1 and len(cache) == 0
+
+    # all entries remain reachable after deletions
+    cache = ClockCache(maxsize=50)
+    for i in range(500):
+        cache.put(str(i), i)
+    assert len(cache) == 50
+    assert all(cache.get(str(i)) == i for i in range(450, 500))
+    assert all(cache.keys[cache.table[cache._find(key)] - 1] == key for key in cache.keys)
+
+    # drop-in replacement for the LRU cache
+    use_compact_cache(maxsize=10**6, threadsafe=False)
+    my_element = html.fromstring("<p>" + "AAAA BBBB " * 20 + "</p>")
+    assert [duplicate_test(my_element, DEFAULT_OPTIONS) for _ in range(4)] == [False, False, False, True]
+
+
+def test_bloomfilter(tmp_path, monkeypatch):
+    "Test the counting Bloom filter."
+    with pytest.raises(ValueError):
+        BloomFilter(error_rate=1.5)
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    assert bloom.hashes == 7 and bloom.size == 9586
+    assert bloom.get("tralala") == -1
+    bloom.put("tralala", 1)
+    bloom.put("tralala", 3)
+    bloom.put("tralala", 2)
+    assert bloom.get("tralala") == 3
+    bloom.put("saturated", 100)
+    assert bloom.get("saturated") == 15
+    # false positive rate within bounds
+    for i in range(1000):
+        bloom.put(str(i), 1)
+    assert all(bloom.get(str(i)) >= 1 for i in range(1000))
+    assert sum(bloom.get(f"other{i}") != -1 for i in range(1000)) < 30
+    bloom.clear()
+    assert bloom.get("tralala") == -1
+
+    # persistence and sharing
+    filename = str(tmp_path / "bloom.bin")
+    bloom = BloomFilter(capacity=1000, filename=filename)
+    bloom.put("tralala", 2)
+    bloom.flush()
+    assert BloomFilter(capacity=10, filename=filename).get("tralala") == 2
+    assert pickle.loads(pickle.dumps(bloom)).get("tralala") == 2
+    in_memory = BloomFilter(capacity=1000)
+    in_memory.put("tralala", 1)
+    assert pickle.loads(pickle.dumps(in_memory)).get("tralala") == 1
+
+    # merge
+    bloom.merge(in_memory)
+    assert bloom.get("tralala") == 3
+    with pytest.raises(ValueError):
+        bloom.merge(BloomFilter(capacity=10))
+    # counters are added in chunks and saturate at 15
+    first, second = BloomFilter(capacity=1000), BloomFilter(capacity=1000)
+    first.data[:] = bytes(i % 256 for i in range(len(first.data)))
+    second.data[:] = bytes((i * 7) % 256 for i in range(len(second.data)))
+    expected = bytes(
+        min(15, (a & 15) + (b & 15)) | (min(15, (a >> 4) + (b >> 4)) << 4) for a, b in zip(first.data, second.data)
+    )
+    monkeypatch.setattr(trafilatura.deduplication, "BLOOM_CHUNK", 1000)
+    first.merge(second)
+    assert first.data == expected
+    (tmp_path / "other.bin").write_bytes(b"x" * 100)
+    with pytest.raises(ValueError):
+        BloomFilter(filename=str(tmp_path / "other.bin"))
+    # release the memory map
+    with BloomFilter(filename=filename) as shared:
+        shared.put("closed", 4)
+    assert shared.data.closed
+    shared.close()
+    bloom.close()
+    assert BloomFilter(filename=filename).get("closed") == 4
+
+    # drop-in replacement for the LRU cache
+    use_bloom_filter(capacity=1000)
+    my_element = html.fromstring("<p>" + "AAAA BBBB " * 20 + "</p>")
+    assert [duplicate_test(my_element, DEFAULT_OPTIONS) for _ in range(4)] == [False, False, False, True]
+    reset_caches()
+    assert duplicate_test(my_element, DEFAULT_OPTIONS) is False
+    # the counters in a file are kept
+    use_bloom_filter(capacity=1000, filename=filename)
+    assert [duplicate_test(my_element, DEFAULT_OPTIONS) for _ in range(4)] == [False, False, False, True]
+    reset_caches()
+    assert duplicate_test(my_element, DEFAULT_OPTIONS) is True
+
+
 def test_dedup():
     "Test paragraph-level deduplication."
     my_p = "<p>abc</p>"
@@ -165,6 +334,51 @@ def test_dedup_reset_caches():
         reset_caches()
 
 
+def _increment_many(store):
+    return [store.increment("tralala") for _ in range(50)]
+
+
+def test_sqlite_store(tmp_path):
+    "Test the shared SQLite deduplication store."
+    store = SQLiteCache(str(tmp_path / "dedup.sqlite"))
+    assert store.get("tralala") == -1
+    store.put("tralala", 1)
+    store.put("tralala", 2)
+    assert store.get("tralala") == 2
+
+    # another instance (or process) sees the same data
+    copied = pickle.loads(pickle.dumps(store))
+    assert copied.get("tralala") == 2
+
+    # snapshots: export and merge
+    store.export_snapshot(str(tmp_path / "snapshot.sqlite"))
+    other = SQLiteCache(str(tmp_path / "other.sqlite"))
+    other.put("tralala", 1)
+    other.import_snapshot(str(tmp_path / "snapshot.sqlite"))
+    assert other.get("tralala") == 3
+    store.clear()
+    assert store.get("tralala") == -1
+
+    # concurrent updates from several processes are all counted
+    assert store.increment("tralala") == 1
+    with ProcessPoolExecutor(max_workers=4) as executor:
+        counts = list(executor.map(_increment_many, [store] * 4))
+    assert store.get("tralala") == 201 and max(map(max, counts)) == 201
+    assert len(set().union(*counts)) == 200
+
+    # drop-in replacement for the LRU cache
+    use_shared_store(str(tmp_path / "dedup.sqlite"))
+    my_element = html.fromstring("<p>" + "AAAA BBBB " * 20 + "</p>")
+    assert duplicate_test(my_element, DEFAULT_OPTIONS) is False
+    assert duplicate_test(my_element, DEFAULT_OPTIONS) is False
+    assert duplicate_test(my_element, DEFAULT_OPTIONS) is False
+    assert duplicate_test(my_element, DEFAULT_OPTIONS) is True
+    assert SQLiteCache(str(tmp_path / "dedup.sqlite")).get(trafilatura.utils.trim(my_element.text)) == 4
+    # persistent stores are not emptied along with the caches
+    reset_caches()
+    assert duplicate_test(my_element, DEFAULT_OPTIONS) is True
+
+
 def test_sample_tokens(monkeypatch):
     "Test token sampling functions including fallback for non-latin text"
 
@@ -48,6 +48,7 @@ from trafilatura.downloads import (
     _send_urllib_request,
     _urllib3_is_live_page,
     add_to_compressed_dict,
+    fetch_stream,
     fetch_url,
     is_live_page,
     load_download_buffer,
@@ -199,6 +200,32 @@ def test_no_ssl_pool():
     assert secure.connection_pool_kw["ca_certs"] is not None
 
 
+def test_fetch_stream():
+    "Data is passed on chunk by chunk, the download stops on errors and at MAX_FILE_SIZE."
+    import urllib3
+
+    resp = MagicMock(status=200)
+    resp.stream.return_value = iter([b"<urlset>", b"</urlset>"])
+    pool = MagicMock(request=MagicMock(side_effect=[urllib3.exceptions.SSLError("bad cert"), resp]))
+    with patch.object(dl, "_initiate_pool", return_value=pool):
+        chunks = fetch_stream("https://ssl.example/sitemap.xml")
+        assert next(chunks) == b"<urlset>" and not resp.release_conn.called
+        assert list(chunks) == [b"</urlset>"]
+    assert pool.request.call_count == 2
+    resp.release_conn.assert_called_once()
+
+    resp = MagicMock(status=200)
+    resp.stream.return_value = iter([b"x" * (2**17)] * 1000)
+    with patch.object(dl, "_initiate_pool", return_value=MagicMock(request=MagicMock(return_value=resp))):
+        assert sum(len(c) for c in fetch_stream("https://example.org")) <= DEFAULT_CONFIG.getint("DEFAULT", "MAX_FILE_SIZE")
+    resp.release_conn.assert_called_once()
+
+    resp = MagicMock(status=404)
+    with patch.object(dl, "_initiate_pool", return_value=MagicMock(request=MagicMock(return_value=resp))):
+        assert not list(fetch_stream("https://example.org"))
+    resp.stream.assert_not_called()
+
+
 def test_urllib_request_ssl_retry():
     "An SSLError triggers a retry with no_ssl=True."
     import urllib3
@@ -333,6 +360,8 @@ def test_queue():
     args.archived = True
     args.config_file = os.path.join(RESOURCES_DIR, "newsettings.cfg")
     options = args_to_extractor(args)
+    # the configuration of the options is shared, use a new one
+    options.config = use_config(args.config_file)
     options.config["DEFAULT"]["SLEEP_TIME"] = "0.2"
     results = download_queue_processing(url_store, args, -1, options)
     assert len(results[0]) == 5 and results[1] is -1
@@ -0,0 +1,348 @@
+"""
+Load test of the download functions against local HTTP servers,
+no Internet connection is needed.
+
+python3 loadtest.py --pages 500 --latency 0.05 --threads 1 4 16
+python3 loadtest.py --modes crawl sitemaps --hosts 2 --error-rate 0.05
+"""
+
+import argparse
+import gzip
+import json
+import logging
+import random
+import socket
+import sys
+import threading
+import time
+import zlib
+from collections import Counter
+from configparser import ConfigParser
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+from trafilatura import downloads, spider
+from trafilatura.settings import DEFAULT_CONFIG, Extractor
+from trafilatura.sitemaps import sitemap_search
+
+logging.basicConfig(stream=sys.stderr, level=logging.CRITICAL)
+
+# the crawler only follows links with a domain name, they are resolved locally
+HOSTNAME = "www.loadtest{}.org"
+PAGES_PER_SITEMAP = 1000
+LINKS_PER_PAGE = 10
+ERROR_STATUSES = (404, 500, 503)
+WORDS = [
+    "lorem",
+    "ipsum",
+    "dolor",
+    "sit",
+    "amet",
+    "consectetur",
+    "adipiscing",
+    "elit",
+    "sed",
+    "do",
+    "eiusmod",
+    "tempor",
+    "incididunt",
+]
+
+
+class MockServer(ThreadingHTTPServer):
+    "HTTP server simulating a website, records the connections and requests it gets."
+
+    daemon_threads = True
+    # keep up with many simultaneous connections
+    request_queue_size = 128
+
+    def __init__(self, number, settings):
+        super().__init__(("127.0.0.1", 0), MockHandler)
+        self.number = number
+        self.settings = settings
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.requests = Counter()
+        self.sent = 0
+        self.window = []
+
+    @property
+    def hostname(self):
+        return f"{HOSTNAME.format(self.number)}:{self.server_address[1]}"
+
+    def throttled(self):
+        "Tell if the number of requests of the last second exceeds the limit."
+        if not self.settings.host_rate:
+            return False
+        now = time.monotonic()
+        with self.lock:
+            self.window = [t for t in self.window if now - t < 1]
+            if len(self.window) >= self.settings.host_rate:
+                return True
+            self.window.append(now)
+        return False
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    "Serve pages, redirects, errors, robots.txt and sitemaps."
+
+    # keep-alive connections
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_HEAD(self):
+        self.do_GET()
+
+    def log_message(self, format, *args):
+        pass
+
+    def send(self, status, body=b"", content_type="text/html; charset=utf-8", headers=None):
+        "Send a response, compressed if possible."
+        settings = self.server.settings
+        encoding = settings.compression
+        if body and encoding != "none" and encoding in self.headers.get("Accept-Encoding", ""):
+            body = gzip.compress(body) if encoding == "gzip" else zlib.compress(body)
+        else:
+            encoding = None
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        if encoding:
+            self.send_header("Content-Encoding", encoding)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+        with self.server.lock:
+            self.server.requests[status] += 1
+            self.server.sent += len(body)
+
+    def do_GET(self):
+        settings = self.server.settings
+        path = urlsplit(self.path).path
+        base = f"http://{self.headers.get('Host', self.server.hostname)}"
+        # the same page always behaves the same way
+        rng = random.Random(f"{self.server.number}{path}")
+        time.sleep(max(rng.gauss(settings.latency, settings.jitter), 0))
+
+        if self.server.throttled():
+            self.send(429, headers={"Retry-After": "1"})
+        elif path == "/robots.txt":
+            robots = f"User-agent: *\nCrawl-delay: {settings.crawl_delay}\nDisallow: /private/\nSitemap: {base}/sitemap.xml\n"
+            self.send(200, robots.encode(), "text/plain")
+        elif path == "/sitemap.xml":
+            sitemaps = "".join(
+                f"<sitemap><loc>{base}/sitemap-{i}.xml</loc></sitemap>" for i in range(0, settings.pages, PAGES_PER_SITEMAP)
+            )
+            index = f'<?xml version="1.0" encoding="UTF-8"?><sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{sitemaps}</sitemapindex>'
+            self.send(200, index.encode(), "application/xml")
+        elif path.startswith("/sitemap-"):
+            start = int(path[9:-4])
+            urls = "".join(
+                f"<url><loc>{base}/page/{i}</loc><lastmod>2024-01-01</lastmod></url>"
+                for i in range(start, min(start + PAGES_PER_SITEMAP, settings.pages))
+            )
+            urlset = f'<?xml version="1.0" encoding="UTF-8"?><urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{urls}</urlset>'
+            self.send(200, urlset.encode(), "application/xml")
+        elif path == "/":
+            self.send(200, self.page(path, rng, base))
+        elif path.startswith("/page/"):
+            if rng.random() < settings.error_rate:
+                self.send(rng.choice(ERROR_STATUSES), b"error")
+            elif path.endswith("/final") or rng.random() >= settings.redirect_rate:
+                self.send(200, self.page(path, rng, base))
+            else:
+                self.send(301, headers={"Location": f"{base}{path.rstrip('/')}/final"})
+        else:
+            self.send(404, b"not found")
+
+    def page(self, path, rng, base):
+        "Build an HTML page of about the required size with links to other pages."
+        pages = self.server.settings.pages
+        links = "".join(f'<li><a href="{base}/page/{rng.randrange(pages)}">Link</a></li>' for _ in range(LINKS_PER_PAGE))
+        paragraphs = []
+        length = 0
+        while length < self.server.settings.size:
+            paragraph = f"<p>{' '.join(rng.choices(WORDS, k=50))}.</p>"
+            paragraphs.append(paragraph)
+            length += len(paragraph)
+        return (
+            f"<html><head><title>Page {path}</title></head><body><nav><ul>{links}</ul></nav>"
+            f"<article><h1>Page {path}</h1>{''.join(paragraphs)}</article></body></html>"
+        ).encode()
+
+
+def start_servers(settings):
+    "Start a server per simulated host."
+    servers = [MockServer(i, settings) for i in range(settings.hosts)]
+    for server in servers:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    return servers
+
+
+def resolve_locally(servers):
+    "Resolve the host names of the servers to the loopback address."
+    names = {HOSTNAME.format(server.number) for server in servers}
+    original = socket.getaddrinfo
+
+    @wraps(original)
+    def getaddrinfo(host, *args, **kwargs):
+        return original("127.0.0.1" if host in names else host, *args, **kwargs)
+
+    socket.getaddrinfo = getaddrinfo
+
+
+def reset_downloads(settings):
+    "Start with new connection pools and a retry strategy using the given timeout."
+    config = ConfigParser()
+    config.read_dict({"DEFAULT": dict(DEFAULT_CONFIG["DEFAULT"])})
+    config["DEFAULT"]["DOWNLOAD_TIMEOUT"] = str(settings.timeout)
+    config["DEFAULT"]["SLEEP_TIME"] = "0"
+    downloads.HTTP_POOL = downloads.NO_CERT_POOL = downloads.RETRY_STRATEGY = None
+    downloads._get_retry_strategy(config)
+    return config
+
+
+def page_urls(servers, settings, by_address=False):
+    """URLs of all the pages, the hosts alternate. The IP address replaces
+    the host name for pycurl, which does its own name resolution."""
+    hosts = [f"127.0.0.1:{s.server_address[1]}" if by_address else s.hostname for s in servers]
+    return [f"http://{hosts[i % len(hosts)]}/page/{i // len(hosts)}" for i in range(settings.pages)]
+
+
+def percentile(values, share):
+    "Nearest-rank percentile."
+    values = sorted(values)
+    return values[max(int(share * len(values) + 0.5) - 1, 0)] if values else 0.0
+
+
+def _timed(func, latencies):
+    "Record the duration of each call."
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            latencies.append(time.perf_counter() - start)
+
+    return wrapper
+
+
+def run_mode(mode, threads, servers, settings):
+    "Drive a download function against the servers and return the results."
+    config = reset_downloads(settings)
+    options = Extractor(config=config)
+    for server in servers:
+        with server.lock:
+            server.connections = server.sent = 0
+            server.requests.clear()
+    # all the requests go through these functions
+    latencies = []
+    originals = downloads._send_urllib_request, downloads._send_pycurl_request
+    downloads._send_urllib_request, downloads._send_pycurl_request = (_timed(f, latencies) for f in originals)
+    results = []
+    start = time.perf_counter()
+    try:
+        if mode == "fetch_url":
+            results = [downloads.fetch_url(url, options=options) for url in page_urls(servers, settings)]
+        elif mode in ("buffered", "pycurl"):
+            urls = page_urls(servers, settings, by_address=mode == "pycurl")
+            results = [r for _, r in downloads.buffered_downloads(urls, threads, options)]
+        elif mode == "crawl":
+            spider.URL_STORE.reset()
+            _, results = spider.focused_crawler(f"http://{servers[0].hostname}/", max_seen_urls=settings.pages, config=config)
+        elif mode == "sitemaps":
+            for server in servers:
+                results.extend(sitemap_search(f"http://{server.hostname}/", sleep_time=0))
+    finally:
+        downloads._send_urllib_request, downloads._send_pycurl_request = originals
+
+    elapsed = time.perf_counter() - start
+    connections = sum(s.connections for s in servers)
+    requests = sum(sum(s.requests.values()) for s in servers)
+    statuses = sum((s.requests for s in servers), Counter())
+    return {
+        "mode": mode,
+        "threads": threads,
+        "results": sum(1 for r in results if r),
+        "seconds": elapsed,
+        "requests_per_s": requests / elapsed,
+        # as sent by the servers, i.e. compressed
+        "mb_per_s": sum(s.sent for s in servers) / 2**20 / elapsed,
+        "requests": requests,
+        "connections": connections,
+        "requests_per_connection": requests / connections if connections else 0.0,
+        "statuses": {str(k): v for k, v in sorted(statuses.items())},
+        "latency": {
+            "p50": percentile(latencies, 0.5),
+            "p90": percentile(latencies, 0.9),
+            "p99": percentile(latencies, 0.99),
+            "max": max(latencies, default=0.0),
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test of the download functions against local servers")
+    parser.add_argument(
+        "--modes",
+        nargs="+",
+        choices=["fetch_url", "buffered", "pycurl", "crawl", "sitemaps"],
+        default=["fetch_url", "buffered", "crawl", "sitemaps"],
+        help="download functions to test, pycurl requires the package",
+    )
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 4, 16], help="download threads (buffered)")
+    parser.add_argument("--hosts", type=int, default=4, help="number of simulated websites")
+    parser.add_argument("--pages", type=int, default=200, help="pages to download or crawl")
+    parser.add_argument("--size", type=int, default=20000, help="approximate size of the pages in bytes")
+    parser.add_argument("--latency", type=float, default=0.02, help="mean response time in seconds")
+    parser.add_argument("--jitter", type=float, default=0.01, help="standard deviation of the response time")
+    parser.add_argument("--compression", choices=["gzip", "deflate", "none"], default="gzip", help="content encoding")
+    parser.add_argument("--redirect-rate", type=float, default=0.0, help="share of pages redirected")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of error responses (404, 500, 503)")
+    parser.add_argument("--host-rate", type=int, default=0, help="requests per second and host, then 429 (0: no limit)")
+    parser.add_argument("--crawl-delay", type=float, default=0, help="crawl delay in robots.txt")
+    parser.add_argument("--timeout", type=int, default=2, help="download timeout, also sets the retry backoff")
+    parser.add_argument("--output", help="write the results as JSON")
+    settings = parser.parse_args()
+
+    if "pycurl" in settings.modes and not downloads.HAS_PYCURL:
+        parser.error("pycurl is not installed")
+    # urllib3 unless pycurl is tested
+    has_pycurl = downloads.HAS_PYCURL
+
+    servers = start_servers(settings)
+    resolve_locally(servers)
+    reports = []
+    try:
+        for mode in settings.modes:
+            downloads.HAS_PYCURL = mode == "pycurl"
+            for threads in settings.threads if mode in ("buffered", "pycurl") else [1]:
+                report = run_mode(mode, threads, servers, settings)
+                reports.append(report)
+                print(
+                    f"{mode:<10} {threads:>3} threads: {report['requests_per_s']:8.1f} req/s "
+                    f"{report['mb_per_s']:6.2f} MB/s, {report['requests_per_connection']:5.1f} req/conn, "
+                    f"p50 {report['latency']['p50'] * 1000:.0f} ms p99 {report['latency']['p99'] * 1000:.0f} ms "
+                    f"max {report['latency']['max'] * 1000:.0f} ms, {report['results']} results, {report['statuses']}"
+                )
+    finally:
+        downloads.HAS_PYCURL = has_pycurl
+        for server in servers:
+            server.shutdown()
+
+    if settings.output:
+        with open(settings.output, "w", encoding="utf-8") as outputf:
+            json.dump(reports, outputf, indent=1)
+
+
+if __name__ == "__main__":
+    main()
@@ -595,3 +595,31 @@ def test_document_as_dict():
     assert dict_["categories"] == ["Cat1", "Cat2"]
     assert dict_["license"] == "CC BY-SA 4.0"
     assert dict_["image"] == "https://example.org/example.jpg"
+
+
+def test_head_only():
+    "Test metadata extraction restricted to the document head."
+    htmldoc = """<html><head><title>Head Title</title>
+    <link rel="canonical" href="https://example.org/article"/>
+    <meta property="article:published_time" content="2021-05-04"/>
+    </head><body><h1>Body Title</h1><p>Text</p></body></html>"""
+    document = extract_metadata(htmldoc, head_only=True)
+    assert document.title == "Head Title"
+    assert document.url == "https://example.org/article"
+    assert document.date == "2021-05-04"
+    assert extract_metadata(htmldoc).title == "Body Title"
+
+    # missing closing tag: stop at the body
+    htmldoc = htmldoc.replace("</head>", "")
+    assert extract_metadata(htmldoc, head_only=True).title == "Head Title"
+
+    # incomplete head: resort to the whole document
+    htmldoc = """<html><head><title>Head Title</title></head>
+    <body><h1>Body Title</h1><p>Published on 2021-05-04</p></body></html>"""
+    document = extract_metadata(htmldoc, default_url="https://example.org", head_only=True)
+    assert document.title == "Body Title"
+    assert document.url == "https://example.org"
+
+    # already parsed tree or no head boundary
+    assert extract_metadata(html.fromstring(htmldoc), head_only=True).title == "Body Title"
+    assert extract_metadata("<html><p>Test</p><p>Text</p></html>", head_only=True).title is None
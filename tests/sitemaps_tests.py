@@ -2,9 +2,14 @@
 Unit tests for sitemaps parsing.
 """
 
+import gzip
+import json
 import logging
 import os
 import sys
+import time
+from datetime import datetime, timedelta, timezone
+from itertools import islice, pairwise
 
 import pytest
 
@@ -98,7 +103,7 @@ def test_extraction():
     # invalid
     sitemap = sitemaps.SitemapObject(baseurl, domain, [])
     sitemap.content = "<html>\n</html>"
-    sitemap.extract_sitemap_links()
+    sitemap.process()
     assert not sitemap.sitemap_urls and not sitemap.urls
 
     # parsing a file
@@ -109,6 +114,9 @@ def test_extraction():
     assert sitemaps.is_plausible_sitemap("http://sitemaps.org/sitemap.xml", teststring) is True
     sitemap = sitemaps.SitemapObject(baseurl, domain, [])
     sitemap.content = teststring
+    sitemap.process()
+    assert not sitemap.sitemap_urls and len(sitemap.urls) == 84
+    sitemap.urls = []
     sitemap.extract_sitemap_links()
     assert not sitemap.sitemap_urls and len(sitemap.urls) == 84
     # hreflang
@@ -123,9 +131,9 @@ def test_extraction():
         teststring = f.read()
     sitemap = sitemaps.SitemapObject(baseurl, domain, [url])
     sitemap.content = teststring
-    sitemap.extract_sitemap_links()
+    sitemap.process()
     assert (
-        sitemap.sitemap_urls
+        list(sitemap.sitemap_urls)
         == [
             "http://www.example.com/sitemap.xml",
             "http://www.example.com/sitemap1.xml.gz",
@@ -140,15 +148,20 @@ def test_extraction():
         '<?xml version="1.0" encoding="UTF-8"?><urlset><url><loc>http://www.test.org/english/page.html</loc></url></urlset>'
     )
     sitemap.process()
-    assert (sitemap.sitemap_urls, sitemap.urls) == ([], ["http://www.test.org/english/page.html"])
+    assert (list(sitemap.sitemap_urls), sitemap.urls) == ([], ["http://www.test.org/english/page.html"])
     filepath = os.path.join(RESOURCES_DIR, "sitemap-hreflang.xml")
     with open(filepath, "r", encoding="utf-8") as f:
         teststring = f.read()
     sitemap = sitemaps.SitemapObject(baseurl, domain, [], "de")
     sitemap.content = teststring
-    sitemap.extract_sitemap_langlinks()
-    assert sitemap.sitemap_urls == ["http://www.example.com/sitemap-de.xml.gz"]
+    sitemap.process()
+    assert list(sitemap.sitemap_urls) == ["http://www.example.com/sitemap-de.xml.gz"]
     assert len(sitemap.urls) > 0
+    urls = sitemap.urls
+    sitemap = sitemaps.SitemapObject(baseurl, domain, [], "de")
+    sitemap.content = teststring
+    sitemap.extract_sitemap_langlinks()
+    assert list(sitemap.sitemap_urls) == ["http://www.example.com/sitemap-de.xml.gz"] and sitemap.urls == urls
 
     # GZ-compressed sitemaps
     url, domain, baseurl = "https://www.sitemaps.org/sitemap.xml", "sitemaps.org", "https://www.sitemaps.org"
@@ -159,7 +172,7 @@ def test_extraction():
     assert sitemaps.is_plausible_sitemap("http://example.org/sitemap.xml.gz", teststring) is True
     sitemap = sitemaps.SitemapObject(baseurl, domain, [url])
     sitemap.content = teststring
-    sitemap.extract_sitemap_links()
+    sitemap.process()
     assert len(sitemap.sitemap_urls) == 1 and len(sitemap.urls) == 84
 
     # check contents
@@ -171,13 +184,13 @@ def test_extraction():
     sitemap = sitemaps.SitemapObject("https://test.org/", "test.org", [])
     sitemap.content = "Tralala\nhttps://test.org/1\nhttps://test.org/2"
     sitemap.process()
-    assert (sitemap.sitemap_urls, sitemap.urls) == ([], ["https://test.org/1", "https://test.org/2"])
+    assert (list(sitemap.sitemap_urls), sitemap.urls) == ([], ["https://test.org/1", "https://test.org/2"])
 
     # TXT links + language
     sitemap = sitemaps.SitemapObject("https://test.org/", "test.org", [], "en")
     sitemap.content = "Tralala\nhttps://test.org/en/1\nhttps://test.org/en/2\nhttps://test.org/es/3"
     sitemap.process()
-    assert (sitemap.sitemap_urls, sitemap.urls) == ([], ["https://test.org/en/1", "https://test.org/en/2"])
+    assert (list(sitemap.sitemap_urls), sitemap.urls) == ([], ["https://test.org/en/1", "https://test.org/en/2"])
 
     # XML sitemap with matching hreflang links: return after the langlink pass
     sitemap = sitemaps.SitemapObject("https://example.org", "example.org", [], "de")
@@ -193,6 +206,80 @@ def test_extraction():
     assert sitemap.urls == ["https://example.org/de/page"]
 
 
+def test_streaming():
+    "Sitemaps are parsed as they are downloaded, whatever the size of the chunks."
+
+    def split(data, size):
+        return [data[i : i + size] for i in range(0, len(data), size)]
+
+    with open(os.path.join(RESOURCES_DIR, "sitemap.xml.gz"), "rb") as f:
+        compressed = f.read()
+    expected = [
+        link for link, _ in sitemaps.iter_sitemap_links([decode_file(compressed)], "http://example.org/sitemap.xml.gz")
+    ]
+    assert len(expected) == 84
+    for size in (1, 100, len(compressed)):
+        links = sitemaps.iter_sitemap_links(split(compressed, size), "http://example.org/sitemap.xml.gz")
+        assert [link for link, _ in links] == expected
+    # concatenated GZip members
+    data = gzip.compress(b"https://test.org/1\n") + gzip.compress(b"https://test.org/2\n")
+    assert list(sitemaps.iter_sitemap_links(split(data, 7))) == [("https://test.org/1", None), ("https://test.org/2", None)]
+    assert not list(sitemaps.iter_sitemap_links([b"\x1f\x8b\x08ABC"], "http://example.org/sitemap.xml.gz"))
+
+    # TXT: links split between chunks
+    data = b"Tralala\nhttps://test.org/abcdef\nhttps://test.org/\xc3\xa9t\xc3\xa9"
+    for size in (1, 5, len(data)):
+        links = [link for link, _ in sitemaps.iter_sitemap_links(split(data, size), "http://example.org/sitemap")]
+        assert links == ["https://test.org/abcdef", "https://test.org/été"]
+    # other encodings are detected
+    expected = [f"https://test.org/{i}/été-à-noël-dès-très-préféré" for i in range(30)]
+    data = ("Liste des pages : " + " ".join(expected)).encode("latin-1")
+    links = [link for link, _ in sitemaps.iter_sitemap_links(split(data, 100), "http://example.org/sitemap.txt")]
+    assert links == expected
+
+    # lastmod, alternate links and images
+    data = (
+        b'<?xml version="1.0" encoding="UTF-8"?>'
+        b'<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9" xmlns:xhtml="http://www.w3.org/1999/xhtml"'
+        b' xmlns:image="http://www.google.com/schemas/sitemap-image/1.1">'
+        b"<url><loc>https://example.org/page</loc><lastmod>2024-01-02</lastmod>"
+        b'<xhtml:link rel="alternate" hreflang="de-AT" href="https://example.org/de/page"/>'
+        b'<xhtml:link rel="alternate" hreflang="fr" href="https://example.org/fr/page"/></url>'
+        b"<url><image:image><image:loc>https://example.org/image.jpg</image:loc></image:image>"
+        b"<loc><![CDATA[https://example.org/other]]></loc></url>"
+        b"<url><loc>/relative</loc></url>"
+        b"</urlset>"
+    )
+    links = list(sitemaps.iter_sitemap_links(split(data, 3), "https://example.org/sitemap.xml"))
+    assert links == [("https://example.org/page", "2024-01-02"), ("https://example.org/other", None)]
+    # main links are dropped as soon as the sitemap contains alternate links in the target language
+    links = list(sitemaps.iter_sitemap_links(split(data, 3), "https://example.org/sitemap.xml", "de"))
+    assert links == [("https://example.org/de/page", "2024-01-02")]
+    links = list(sitemaps.iter_sitemap_links([data], "https://example.org/sitemap.xml", "es"))
+    assert links == [("https://example.org/page", "2024-01-02"), ("https://example.org/other", None)]
+    # loc as root element
+    assert not list(
+        sitemaps.iter_sitemap_links(
+            [b'<?xml version="1.0"?><loc>https://example.org/a</loc>'], "https://example.org/sitemap.xml"
+        )
+    )
+
+    # entries are discarded once read and links are available before the end of the download
+    def large_sitemap():
+        yield b"<urlset>"
+        for i in range(100000):
+            yield f"<url><loc>https://example.org/{i}</loc></url>".encode()
+        raise AssertionError("sitemap read entirely")
+
+    links = sitemaps.iter_sitemap_links(large_sitemap(), "https://example.org/sitemap.xml")
+    assert next(links) == ("https://example.org/0", None)
+    assert sum(1 for _ in islice(links, 50000)) == 50000
+
+    # invalid content
+    assert not list(sitemaps.iter_sitemap_links([b"<html><body/></html>"], "https://example.org/sitemap.xml"))
+    assert not list(sitemaps.iter_sitemap_links([], "https://example.org/sitemap.xml"))
+
+
 def test_robotstxt():
     """Check if sitemaps can be found over robots.txt"""
     assert not sitemaps.find_robots_sitemaps("https://http.org")
@@ -205,6 +292,141 @@ def test_robotstxt():
     ]
 
 
+def test_frontier():
+    "Sitemaps are only queued once and never visited twice."
+    sitemap = sitemaps.SitemapObject("https://example.org", "example.org", ["https://example.org/sitemap.xml"] * 2)
+    assert list(sitemap.sitemap_urls) == ["https://example.org/sitemap.xml"]
+    sitemap.current_url = sitemap.next_sitemap()
+    sitemap.seen.add(sitemap.current_url)
+    for link in ("https://example.org/sitemap.xml", "https://example.org/a.xml", "https://example.org/a.xml"):
+        sitemap.add_sitemap(link)
+    assert list(sitemap.sitemap_urls) == ["https://example.org/a.xml"] and sitemap.queued == {"https://example.org/a.xml"}
+
+
+def test_discovery(monkeypatch):
+    "Requests to several websites are interleaved, each host waiting between two requests."
+    sleep_time = 0.2
+    calls = []
+
+    def fake_fetch(url):
+        calls.append((url, time.monotonic()))
+        host = url.split("/")[2]
+        if url.endswith("robots.txt"):
+            return f"Sitemap: https://{host}/index.xml"
+        if url.endswith("index.xml"):
+            parts = "".join(f"<sitemap><loc>https://{host}/part-{i}.xml</loc></sitemap>" for i in range(3))
+            return f"<sitemapindex>{parts}</sitemapindex>"
+        return f'<?xml version="1.0"?><urlset><url><loc>https://{host}{url[-11:-4]}</loc></url></urlset>'
+
+    monkeypatch.setattr(sitemaps, "fetch_url", fake_fetch)
+    monkeypatch.setattr(sitemaps, "fetch_stream", lambda url: iter([fake_fetch(url).encode()]))
+    monkeypatch.setattr(sitemaps, "is_live_page", lambda url: True)
+    hosts = [f"site{i}.org" for i in range(6)]
+    urls = [f"https://{host}/" for host in hosts] + ["https://site0.org/part-0.xml", "12345"]
+
+    start = time.monotonic()
+    results = dict(sitemaps.sitemap_discovery(urls, sleep_time=sleep_time, max_workers=4))
+    elapsed = time.monotonic() - start
+    assert set(results) == set(urls) and results["12345"] == []
+    assert sorted(results["https://site3.org/"]) == [f"https://site3.org/part-{i}" for i in range(3)]
+    assert results["https://site0.org/part-0.xml"] == ["https://site0.org/part-0"]
+    assert results["https://site3.org/"] == sitemaps.sitemap_search("https://site3.org/", sleep_time=0)
+
+    # 5 requests per host (robots.txt, index, 3 parts), 6 for the first one
+    # sequentially: at least 6 * 4 * sleep_time, interleaved: about 5 * sleep_time
+    assert elapsed < 2 * 5 * sleep_time
+    # robots.txt is fetched right before the first sitemap, as in sitemap_search()
+    per_host = {}
+    for url, timestamp in calls[:-5]:
+        if not url.endswith("robots.txt"):
+            per_host.setdefault(url.split("/")[2], []).append(timestamp)
+    for timestamps in per_host.values():
+        assert all(b - a >= sleep_time * 0.9 for a, b in pairwise(timestamps))
+
+
+def test_incremental(monkeypatch, tmp_path):
+    "Only the sitemaps and links modified since the last run are taken."
+    assert sitemaps.parse_lastmod("2024-05") == datetime(2024, 5, 1, tzinfo=timezone.utc)
+    assert sitemaps.parse_lastmod("2024-05-03T10:00:00+02:00") == datetime(2024, 5, 3, 8, tzinfo=timezone.utc)
+    assert sitemaps.parse_lastmod("2024-05-03T10:00Z") == datetime(2024, 5, 3, 10, tzinfo=timezone.utc)
+    assert sitemaps.parse_lastmod("yesterday") is None and sitemaps.parse_lastmod(None) is None
+    since = datetime(2024, 5, 3, 12, tzinfo=timezone.utc)
+    assert sitemaps.is_outdated("2024-05-02", since) and sitemaps.is_outdated("2024-05-03T11:59Z", since)
+    assert not sitemaps.is_outdated("2024-05-03", since) and not sitemaps.is_outdated("invalid", since)
+
+    fetched = []
+
+    def fake_stream(url):
+        fetched.append(url)
+        if url.endswith("index.xml"):
+            data = (
+                "<sitemapindex>"
+                "<sitemap><loc>https://example.org/old.xml</loc><lastmod>2020-01-01</lastmod></sitemap>"
+                "<sitemap><loc>https://example.org/new.xml</loc><lastmod>2030-01-01T00:00:00+00:00</lastmod></sitemap>"
+                "<sitemap><loc>https://example.org/undated.xml</loc></sitemap>"
+                "</sitemapindex>"
+            )
+        else:
+            name = url[20:-4]
+            data = (
+                "<urlset>"
+                f"<url><loc>https://example.org/{name}/1</loc><lastmod>2020-01-01</lastmod></url>"
+                f"<url><loc>https://example.org/{name}/2</loc><lastmod>2030-01-01</lastmod></url>"
+                f"<url><loc>https://example.org/{name}/3</loc></url>"
+                "</urlset>"
+            )
+        return iter([data.encode("utf-8")])
+
+    monkeypatch.setattr(sitemaps, "fetch_stream", fake_stream)
+    monkeypatch.setattr(sitemaps, "is_live_page", lambda url: True)
+    url = "https://example.org/index.xml"
+
+    links = sitemaps.sitemap_search(url, sleep_time=0)
+    assert len(links) == 9 and len(fetched) == 4
+    fetched.clear()
+    links = sitemaps.sitemap_search(url, sleep_time=0, since=datetime(2024, 1, 1))
+    assert sorted(links) == [f"https://example.org/{name}/{i}" for name in ("new", "undated") for i in (2, 3)]
+    assert "https://example.org/old.xml" not in fetched
+
+    # state file: everything the first time, the date of the run is then stored
+    state_file = str(tmp_path / "state.json")
+    assert len(sitemaps.sitemap_search(url, sleep_time=0, state_file=state_file)) == 9
+    with open(state_file, encoding="utf-8") as f:
+        last_run = datetime.fromisoformat(json.load(f)["https://example.org"])
+    assert datetime.now(timezone.utc) - last_run < timedelta(minutes=1)
+    assert sorted(sitemaps.sitemap_search(url, sleep_time=0, state_file=state_file)) == sorted(links)
+    results = dict(sitemaps.sitemap_discovery([url], sleep_time=0, state_file=state_file))
+    assert sorted(results[url]) == sorted(links)
+    # the date is only stored for successful searches
+    monkeypatch.setattr(sitemaps, "is_live_page", lambda url: False)
+    assert not sitemaps.sitemap_search("https://example.com/", state_file=state_file)
+    with open(state_file, encoding="utf-8") as f:
+        assert list(json.load(f)) == ["https://example.org"]
+
+    # incomplete searches are not recorded: failed download, limit reached, error
+    monkeypatch.setattr(sitemaps, "is_live_page", lambda url: True)
+    state_file = str(tmp_path / "incomplete.json")
+    monkeypatch.setattr(sitemaps, "fetch_stream", lambda url: iter([]) if "new" in url else fake_stream(url))
+    assert len(sitemaps.sitemap_search(url, sleep_time=0, state_file=state_file)) == 6
+    monkeypatch.setattr(sitemaps, "fetch_stream", fake_stream)
+    assert len(sitemaps.sitemap_search(url, sleep_time=0, max_sitemaps=2, state_file=state_file)) == 3
+
+    def broken_stream(url):
+        if "old" in url:
+            raise ValueError("broken connection")
+        return fake_stream(url)
+
+    monkeypatch.setattr(sitemaps, "fetch_stream", broken_stream)
+    results = dict(sitemaps.sitemap_discovery([url], sleep_time=0, state_file=state_file))
+    assert len(results[url]) == 6
+    with open(state_file, encoding="utf-8") as f:
+        assert json.load(f) == {}
+    monkeypatch.setattr(sitemaps, "fetch_stream", fake_stream)
+    assert len(dict(sitemaps.sitemap_discovery([url], sleep_time=0, state_file=state_file))[url]) == 9
+    with open(state_file, encoding="utf-8") as f:
+        assert list(json.load(f)) == ["https://example.org"]
+
+
 def test_whole():
     "Test whole process."
     results = sitemaps.sitemap_search("https://www.sitemaps.org", target_lang="de", max_sitemaps=1)
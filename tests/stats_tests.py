@@ -0,0 +1,91 @@
+"""
+Unit tests for the statistics of command-line runs.
+"""
+
+import json
+import logging
+import sys
+
+import pytest
+
+from trafilatura import cli, cli_utils, settings
+from trafilatura.downloads import add_to_compressed_dict
+from trafilatura.stats import RunStats, StatsReporter, format_summary, percentile, prometheus_text
+
+logging.basicConfig(stream=sys.stdout, level=logging.DEBUG)
+
+
+def test_run_stats():
+    "Figures are aggregated per host, per stage and per reason."
+    assert percentile([], 0.5) == 0.0
+    assert percentile([1.0, 2.0, 3.0, 4.0], 0.5) == 2.0 and percentile([1.0, 2.0], 0.99) == 2.0
+
+    stats = RunStats()
+    stats.record_download("https://example.org/1", 200, 1000, 0.2)
+    stats.record_download("https://example.org/2", 404, 100, 0.4)
+    stats.record_download("https://slow.example.com/", None, 0, 3.0)
+    for seconds in (0.01, 0.02, 0.03):
+        stats.record_stage("extraction", seconds)
+    stats.record_document(500)
+    stats.record_failure("HTTP 404")
+    stats.set_queue("write", 3)
+
+    summary = stats.summary()
+    assert summary["documents"] == 1 and summary["input_bytes"] == 1100 and summary["output_bytes"] == 500
+    assert summary["status"] == {"200": 1, "404": 1, "none": 1}
+    assert summary["failures"] == {"HTTP 404": 1} and summary["queues"] == {"write": 3}
+    assert summary["stages"]["extraction"] == {"p50": 0.02, "p90": 0.03, "p99": 0.03, "max": 0.03}
+    assert summary["stages"]["download"]["max"] == 3.0
+    # slowest hosts first
+    assert list(summary["hosts"]) == ["slow.example.com", "example.org"]
+    assert summary["hosts"]["example.org"] == {"count": 2, "mean": 0.3, "max": 0.4}
+
+    line = format_summary(summary)
+    assert line.startswith("1 docs") and "extraction p50 0.02s" in line and "HTTP 404=1" in line
+    text = prometheus_text(summary)
+    assert "# TYPE trafilatura_documents_total counter\ntrafilatura_documents_total 1\n" in text
+    assert 'trafilatura_status_total{code="404"} 1' in text
+    assert 'trafilatura_stage_latency_seconds{stage="extraction",quantile="0.5"} 0.02' in text
+    assert 'trafilatura_queue_depth{queue="write"} 3' in text
+
+
+def test_stats_reporter(tmp_path, capsys):
+    "Summaries are printed and written as JSON lines or Prometheus textfile."
+    stats = RunStats()
+    stats.record_document(10)
+    for filename in ("stats.jsonl", "stats.prom"):
+        reporter = StatsReporter(stats, 60, str(tmp_path / filename))
+        reporter.start()
+        reporter.report()
+        reporter.stop()
+    lines = (tmp_path / "stats.jsonl").read_text().splitlines()
+    assert len(lines) == 2 and json.loads(lines[1])["documents"] == 1
+    # replaced, not appended
+    assert (tmp_path / "stats.prom").read_text().count("trafilatura_documents_total 1") == 1
+    assert capsys.readouterr().err.count("1 docs") == 4
+
+
+@pytest.mark.usefixtures("mock_network")
+def test_cli_stats(tmp_path):
+    "Downloads, extraction and output are measured on the command-line."
+    with pytest.raises(SystemExit):
+        cli.parse_args(["-i", "list.txt", "--stats-file", "stats.prom"])
+    urls = ["https://example.org/", "https://httpbun.com/html", "https://example.com/missing"]
+    filename = str(tmp_path / "stats.jsonl")
+    args = cli.parse_args(["-o", str(tmp_path / "out"), "--stats", "--stats-file", filename])
+    options = settings.args_to_extractor(args)
+    for parallel in (1, 2):
+        args.parallel = parallel
+        cli_utils.use_stats(args)
+        try:
+            errors, _ = cli_utils.download_queue_processing(add_to_compressed_dict(urls), args, -1, options)
+        finally:
+            cli_utils.close_stats()
+        assert errors == ["https://example.com/missing"] and cli_utils.RUN_STATS is None
+    summaries = [json.loads(line) for line in (tmp_path / "stats.jsonl").read_text().splitlines()]
+    assert len(summaries) == 2
+    for summary in summaries:
+        assert summary["documents"] == 2 and summary["input_bytes"] > 0
+        assert set(summary["stages"]) == {"download", "extraction", "write"}
+        assert summary["queues"]["download"] > 0 and len(summary["failures"]) == 1
+        assert sum(summary["status"].values()) == 3
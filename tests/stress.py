@@ -0,0 +1,254 @@
+"""
+Generate synthetic stress cases and measure how the processing steps scale
+with the size of the input, in order to find super-linear code paths.
+
+python3 stress.py generate --output stress/
+python3 stress.py run --output stress.json --plot stress/
+"""
+
+import argparse
+import json
+import logging
+import math
+import os
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from copy import copy
+
+from trafilatura.external import try_readability
+from trafilatura.htmlprocessing import convert_tags, tree_cleaning
+from trafilatura.main_extractor import extract_content, handle_table, prune_unwanted_sections
+from trafilatura.metadata import extract_metadata
+from trafilatura.settings import TAG_CATALOG, Extractor
+from trafilatura.utils import load_html
+from trafilatura.xml import xmltotxt
+
+try:
+    import matplotlib
+
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+except ImportError:
+    plt = None
+
+logging.basicConfig(stream=sys.stderr, level=logging.ERROR)
+
+OPTIONS = Extractor(tables=True)
+POTENTIAL_TAGS = set(TAG_CATALOG) | {"table", "td", "th", "tr"}
+SENTENCE = "This sentence is part of a synthetic document used to measure the extraction. "
+
+# growth exponent between two sizes above which a step is reported
+SUPERLINEAR = 1.4
+# shorter durations are too noisy to estimate the growth
+MIN_TIME = 0.001
+
+
+def nested_divs(size):
+    """Divs nested size levels deep around a paragraph, the HTML parser of libxml2
+    stops nesting at 256 levels (see the number of elements parsed)."""
+    return "<html><body>" + '<div class="wrapper">' * size + f"<p>{SENTENCE * 20}</p>" + "</div>" * size + "</body></html>"
+
+
+def paragraphs(size):
+    "An article made of size paragraphs."
+    body = "".join(f"<p>{i}. {SENTENCE}</p>" for i in range(size))
+    return f'<html><body><article class="post-content"><h1>Title</h1>{body}</article></body></html>'
+
+
+def table_rowspans(size):
+    "A table of size rows whose cells span several rows and columns."
+    rows = []
+    for i in range(size):
+        cells = f'<td rowspan="{i % 7 + 1}">{SENTENCE}</td>' if i % 3 == 0 else ""
+        cells += f'<td colspan="2">{i}</td><th>{i}</th><td><p>{SENTENCE}</p></td>'
+        rows.append(f"<tr>{cells}</tr>")
+    return (
+        '<html><body><article class="post-content"><p>'
+        + SENTENCE * 5
+        + "</p><table><thead><tr><th>A</th><th>B</th><th>C</th></tr></thead><tbody>"
+        + "".join(rows)
+        + "</tbody></table></article></body></html>"
+    )
+
+
+def link_farm(size):
+    "Lists of size links in divs of various link densities."
+    links = "".join(f'<li><a href="https://example.org/page-{i}">Link number {i}</a></li>' for i in range(size))
+    blocks = "".join(f'<div class="related"><a href="/{i}">Read more</a> {SENTENCE}</div>' for i in range(size // 10))
+    return f'<html><body><nav><ul>{links}</ul></nav><div class="content">{blocks}<p>{SENTENCE * 10}</p></div></body></html>'
+
+
+def json_ld(size):
+    "A giant JSON-LD block with size items before a short article."
+    graph = [
+        {
+            "@type": "NewsArticle",
+            "@id": f"https://example.org/article-{i}",
+            "headline": f"Headline {i}",
+            "author": {"@type": "Person", "name": f"Author {i}"},
+            "articleBody": SENTENCE * 3,
+        }
+        for i in range(size)
+    ]
+    script = json.dumps({"@context": "https://schema.org", "@graph": graph})
+    return (
+        f'<html><head><script type="application/ld+json">{script}</script></head>'
+        f"<body><article><p>{SENTENCE * 10}</p></article></body></html>"
+    )
+
+
+def pathological_attributes(size):
+    """Attribute values of size characters repeating near-matches of the tokens
+    used in the re:test() expressions, on a series of nested elements."""
+    value = ("post-conten article-bod entry-conten comment-lis " * (size // 48 + 1))[:size]
+    elements = "".join(f'<div id="{value}{i}" class="{value}"><p class="{value}">{SENTENCE}</p></div>' for i in range(20))
+    return f"<html><body>{elements}<p>{SENTENCE * 10}</p></body></html>"
+
+
+# generator and default sizes
+CASES = {
+    "nested_divs": (nested_divs, [100, 1000, 10000]),
+    "paragraphs": (paragraphs, [1000, 10000, 100000]),
+    "table_rowspans": (table_rowspans, [100, 1000, 10000]),
+    "link_farm": (link_farm, [1000, 10000, 100000]),
+    "json_ld": (json_ld, [100, 1000, 10000]),
+    "pathological_attributes": (pathological_attributes, [1000, 10000, 100000]),
+}
+
+# the metadata step is the one affected by the JSON-LD case
+STEPS = ["load_html", "tree_cleaning", "prune_unwanted_sections", "handle_table", "readability", "xmltotxt", "metadata"]
+
+
+def _prepare(case, size):
+    "Build the inputs of each step."
+    htmlstring = CASES[case][0](size)
+    tree = load_html(htmlstring)
+    converted = convert_tags(tree_cleaning(copy(tree), OPTIONS), OPTIONS)
+    body = extract_content(copy(converted), OPTIONS)[0]
+    return (
+        {
+            "load_html": (load_html, (htmlstring,)),
+            "tree_cleaning": (tree_cleaning, (copy(tree), OPTIONS)),
+            "prune_unwanted_sections": (prune_unwanted_sections, (copy(converted), POTENTIAL_TAGS, OPTIONS)),
+            "handle_table": (
+                lambda tables: [handle_table(t, POTENTIAL_TAGS, OPTIONS) for t in tables],
+                ([copy(t) for t in converted.iter("table")],),
+            ),
+            "readability": (try_readability, (copy(tree),)),
+            "xmltotxt": (xmltotxt, (body, False)),
+            "metadata": (extract_metadata, (copy(tree),)),
+        },
+        len(htmlstring),
+        sum(1 for _ in tree.iter()),
+    )
+
+
+def _measure(case, size, step):
+    "Run a step in a fresh process: time and growth of the maximum resident memory (in KB)."
+    functions, length, elements = _prepare(case, size)
+    func, args = functions[step]
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    func(*args)
+    elapsed = time.perf_counter() - start
+    memory = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before
+    return {"time": elapsed, "memory": memory, "length": length, "elements": elements}
+
+
+def run(args):
+    "Measure each step on each case and size."
+    results = {}
+    for case in args.cases:
+        sizes = [max(int(s * args.scale), 1) for s in CASES[case][1]]
+        results[case] = {"sizes": sizes, "steps": {step: [] for step in args.steps}, "length": [], "elements": []}
+        for size in sizes:
+            for step in args.steps:
+                # a new process for each measurement so that the memory figures are independent
+                with ProcessPoolExecutor(max_workers=1) as executor:
+                    figures = executor.submit(_measure, case, size, step).result()
+                results[case]["steps"][step].append({"time": figures["time"], "memory": figures["memory"]})
+            results[case]["length"].append(figures["length"])
+            results[case]["elements"].append(figures["elements"])
+        report(case, results[case])
+
+    with open(args.output, "w", encoding="utf-8") as outputf:
+        json.dump(results, outputf, indent=1)
+    if args.plot:
+        plot(results, args.plot)
+
+
+def growth(sizes, values):
+    "Exponent of the growth between the last two sizes, 1 meaning linear."
+    if len(sizes) < 2 or min(values[-2:]) < MIN_TIME or sizes[-1] == sizes[-2]:
+        return 0.0
+    return math.log(values[-1] / values[-2]) / math.log(sizes[-1] / sizes[-2])
+
+
+def report(case, figures):
+    "Print the figures of a case and flag super-linear steps."
+    sizes = figures["sizes"]
+    print(f"\n{case} (elements parsed: {figures['elements']})")
+    print(f"{'step':<25}" + "".join(f"{size:>16}" for size in sizes) + "  growth")
+    for step, values in figures["steps"].items():
+        times = [v["time"] for v in values]
+        exponent = growth(sizes, times)
+        flag = " !" if exponent > SUPERLINEAR else ""
+        cells = "".join(f"{v['time']:>9.3f}s{v['memory']:>5}KB" for v in values)
+        print(f"{step:<25}{cells}  {exponent:.2f}{flag}")
+
+
+def plot(results, directory):
+    "Draw time and memory against size for each case."
+    if plt is None:
+        print("matplotlib is not installed, no plots", file=sys.stderr)
+        return
+    os.makedirs(directory, exist_ok=True)
+    for case, figures in results.items():
+        fig, (time_axis, memory_axis) = plt.subplots(1, 2, figsize=(12, 5))
+        for step, values in figures["steps"].items():
+            time_axis.plot(figures["sizes"], [v["time"] for v in values], marker="o", label=step)
+            memory_axis.plot(figures["sizes"], [max(v["memory"], 1) for v in values], marker="o", label=step)
+        for axis, label in ((time_axis, "time (s)"), (memory_axis, "memory growth (KB)")):
+            axis.set_xscale("log")
+            axis.set_yscale("log")
+            axis.set_xlabel("size")
+            axis.set_ylabel(label)
+        time_axis.legend()
+        fig.suptitle(case)
+        fig.savefig(os.path.join(directory, f"{case}.png"))
+        plt.close(fig)
+
+
+def generate(args):
+    "Write the stress cases to HTML files."
+    os.makedirs(args.output, exist_ok=True)
+    for case in args.cases:
+        for size in CASES[case][1]:
+            size = max(int(size * args.scale), 1)
+            with open(os.path.join(args.output, f"{case}-{size}.html"), "w", encoding="utf-8") as outputf:
+                outputf.write(CASES[case][0](size))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Synthetic stress cases for Trafilatura")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    for name, helptext in (("generate", "write the cases to HTML files"), ("run", "measure how the steps scale")):
+        subparser = subparsers.add_parser(name, help=helptext)
+        subparser.add_argument("--cases", nargs="+", choices=list(CASES), default=list(CASES), help="cases to use")
+        subparser.add_argument("--scale", type=float, default=1.0, help="multiply the default sizes")
+    subparsers.choices["generate"].add_argument("--output", default="stress", help="directory")
+    subparsers.choices["run"].add_argument("--output", default="stress.json", help="JSON file to write")
+    subparsers.choices["run"].add_argument("--steps", nargs="+", choices=STEPS, default=STEPS, help="steps to measure")
+    subparsers.choices["run"].add_argument("--plot", help="directory for the plots (requires matplotlib)")
+    args = parser.parse_args()
+
+    if args.command == "generate":
+        generate(args)
+    else:
+        run(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,7 @@ Unit tests for the trafilatura library.
 """
 
 import logging
+import pickle
 import sys
 import time
 
@@ -36,11 +37,11 @@ from trafilatura.main_extractor import (
     handle_textelem,
     prune_unwanted_sections,
 )
-from trafilatura.meta import reset_caches
+from trafilatura.meta import CACHES, _register_external_cache, cache_report, register_cache, reset_caches, trim_caches
 from trafilatura.metadata import Document
 from trafilatura.readability_lxml import is_probably_readerable
-from trafilatura.settings import TAG_CATALOG, use_config
-from trafilatura.deduplication import LRU_TEST
+from trafilatura.settings import DEFAULT_CONFIG, TAG_CATALOG, get_extractor, load_config, use_config
+from trafilatura.deduplication import LRU_TEST, LRUCache
 from trafilatura.utils import (
     LANGID_FLAG,
     detect_encoding,
@@ -166,6 +167,46 @@ def test_reset_caches():
     assert not any(fn.cache_info().currsize for fn in caches) and not LRU_TEST.cache
 
 
+def test_cache_budget():
+    "Caches are reported and evicted gradually under a memory budget."
+    reset_caches()
+    cache = LRUCache(maxsize=1000)
+    register_cache("test_cache", lambda: cache)
+    try:
+        for i in range(200):
+            trim(f"x {i}")
+            cache.put(f"key {i}", "value" * i)
+            LRU_TEST.put(f"key {i}", 1)
+        cache.get("key 199")
+        cache.get("missing")
+        report = cache_report()
+        # the deduplication state is not a cache which can be evicted
+        assert {"trim", "test_cache", "define_stoplist"} <= set(report) and "LRU_TEST" not in report
+        assert report["trim"]["size"] == 200 and report["trim"]["misses"] == 200 and report["trim"]["memory"] > 0
+        assert report["test_cache"]["size"] == 200 and report["test_cache"]["hits"] == 1
+        assert report["test_cache"]["misses"] == 1 and report["test_cache"]["memory"] > 200 * 5 * 100
+
+        # within budget
+        assert trim_caches(10**9) == 0 and trim.cache_info().currsize == 200
+        # the cache without hits goes first, the other one is halved and keeps the recent entries
+        total = sum(figures["memory"] for figures in report.values())
+        assert trim_caches(total - report["trim"]["memory"] // 2) > 0
+        assert trim.cache_info().currsize == 0 and len(cache) == 200
+        assert trim_caches(0) > 0 and len(cache) == 100 and cache.get("key 199") is not None
+        assert cache.get("key 0") == -1 and len(LRU_TEST) == 200
+    finally:
+        del CACHES["test_cache"]
+        reset_caches()
+
+
+def test_external_caches():
+    "The caches of the dependencies are optional since they are not part of their API."
+    assert "htmldate.try_date_expr" in CACHES
+    assert _register_external_cache("htmldate.validators", "renamed_function") is False
+    assert _register_external_cache("htmldate.renamed_module", "is_valid_format") is False
+    assert "htmldate.renamed_function" not in CACHES and "htmldate.is_valid_format" in CACHES
+
+
 def test_input(options):
     """test if loaded strings/trees are handled properly"""
     teststring = "高山云雾出好茶".encode("utf-8")
@@ -285,6 +326,9 @@ def test_xmltocsv():
     mystring = "<html><body><p>ÄÄÄÄÄÄÄÄÄÄÄÄÄÄ</p></body></html>"
     assert extract(mystring, output_format="csv", config=ZERO_CONFIG) is not None
     assert extract(mystring, output_format="csv", include_comments=False, config=ZERO_CONFIG).endswith("\tnull\r\n")
+    # the fingerprint column is filled without metadata, as in XML
+    assert extract(mystring, output_format="csv", config=ZERO_CONFIG).split("\t")[2] != "null"
+    assert "fingerprint=" in extract(mystring, output_format="xml", config=ZERO_CONFIG)
 
 
 def test_tojson():
@@ -3507,12 +3551,14 @@ def test_deprecations():
     # regression: no_fallback=True must reach Extractor.fast via both entry points
     captured = []
 
-    class _SpyExtractor(core.Extractor):
-        def __init__(self, *args, **kwargs):
-            super().__init__(*args, **kwargs)
-            captured.append(self.fast)
+    get_extractor = core.get_extractor
 
-    with patch.object(core, "Extractor", _SpyExtractor):
+    def _spy_get_extractor(**kwargs):
+        options = get_extractor(**kwargs)
+        captured.append(options.fast)
+        return options
+
+    with patch.object(core, "get_extractor", _spy_get_extractor):
         extract(htmlstring, no_fallback=True, config=ZERO_CONFIG)
         bare_extraction(htmlstring, no_fallback=True, config=ZERO_CONFIG)
     assert captured and all(captured)
@@ -3542,3 +3588,227 @@ def test_incompatible_options(caplog):
         core.Extractor(formatting=True, output_format="html")
         core.Extractor(formatting=True, output_format="markdown")
         assert caplog.text == ""
+
+
+def test_frozen_options():
+    "Frozen options are shared, hashed and pickled, the fields of a document are set on copies."
+    options = get_extractor(output_format="xml", with_metadata=True)
+    assert options.frozen and get_extractor(with_metadata=True, output_format="xml") is options
+    assert options == core.Extractor(output_format="xml", with_metadata=True)
+    assert options.fingerprint == core.Extractor(output_format="xml", with_metadata=True).fingerprint
+    assert options.fingerprint != get_extractor(output_format="xml").fingerprint
+    config = use_config()
+    config["DEFAULT"]["MIN_OUTPUT_SIZE"] = "12345"
+    assert get_extractor(config=config, output_format="xml", with_metadata=True).min_output_size == 12345
+    # the configuration is read once per object
+    with patch("trafilatura.settings._config_items") as config_items:
+        get_extractor(config=config, output_format="xml")
+        get_extractor(config=config, output_format="txt")
+    config_items.assert_not_called()
+    assert len({options, get_extractor(output_format="xml", with_metadata=True)}) == 1
+    with pytest.raises(AttributeError):
+        options.url = "https://example.org"
+    # equal options hash alike, which requires them to be frozen
+    unfrozen = core.Extractor(output_format="xml", with_metadata=True)
+    assert unfrozen == options and hash(unfrozen.freeze()) == hash(options)
+    with pytest.raises(TypeError):
+        hash(core.Extractor(output_format="xml", with_metadata=True))
+    # the containers cannot be changed either
+    with pytest.raises(TypeError):
+        options.date_params["max_date"] = "2020-01-01"
+    with pytest.raises(AttributeError):
+        options.author_blacklist.add("Jane Doe")
+
+    # per-document fields on a copy, same settings
+    document = options.for_document(url="https://example.org/1", max_date="2020-01-01")
+    assert not document.frozen and document != options and options.for_document(url="https://example.org/1") == options
+    assert document.source == document.url == "https://example.org/1"
+    assert document.date_params["max_date"] == "2020-01-01" != options.date_params["max_date"]
+    assert get_extractor(url="https://example.org/2").url == "https://example.org/2"
+    assert get_extractor().url is None
+
+    # the configuration is passed by value
+    restored = pickle.loads(pickle.dumps(options))
+    assert restored == options and restored.frozen and restored.fingerprint == options.fingerprint
+    assert isinstance(restored.url_blacklist, frozenset) and restored.date_params == options.date_params
+    assert pickle.loads(pickle.dumps(options)).config is restored.config
+    assert restored.config.getint("DEFAULT", "MIN_OUTPUT_SIZE") == options.min_output_size
+
+    # the shared options are not modified during extraction
+    htmlstring = "<html><body><article><p>" + "Text of the article. " * 50 + "</p></article></body></html>"
+    assert extract(htmlstring, url="https://example.org/3", output_format="xml", with_metadata=True)
+    assert options.url is None and options.source is None
+
+    # settings files are only read once
+    filename = path.join(RESOURCES_DIR, "newsettings.cfg")
+    assert load_config(filename) is load_config(filename) and load_config() is DEFAULT_CONFIG
+
+
+def test_site_shortcuts():
+    "Extraction decisions are learned per host and reused."
+    from trafilatura.sites import MIN_OBSERVATIONS, SITE_SHORTCUTS, HostShortcuts, Tally
+    from trafilatura.xpaths import BODY_XPATH
+
+    tally = Tally()
+    for _ in range(MIN_OBSERVATIONS - 1):
+        tally.record(3)
+    assert tally.favorite(0.8) is None
+    tally.record(3)
+    assert tally.favorite(0.8) == 3
+    for _ in range(MIN_OBSERVATIONS):
+        tally.record(None)
+    assert tally.confidence(3) == 0.5 and tally.favorite(0.8) is None
+
+    site = HostShortcuts()
+    assert site.body_order(4) == [0, 1, 2, 3]
+    for _ in range(MIN_OBSERVATIONS):
+        site.body.record(2)
+        site.comparison.record(1)
+    assert site.body_order(4) == [2, 0, 1, 3]
+    assert sum(site.skip_comparison() for _ in range(40)) == 38
+
+    SITE_SHORTCUTS.clear()
+    assert SITE_SHORTCUTS.get(None) is None and SITE_SHORTCUTS.get("not a url") is None
+    assert SITE_SHORTCUTS.get("https://example.org/1") is SITE_SHORTCUTS.get("https://example.org/2")
+
+    paragraphs = "".join(
+        f"<p>Paragraph {i} of a long article with enough words to be kept in the output.</p>" for i in range(10)
+    )
+    template = '<html><body><nav><a href="/">Home</a></nav><main>{}{}</main><footer>Footer</footer></body></html>'
+    options = core.Extractor(config=use_config(), adaptive=True, comments=False)
+    reference = core.Extractor(config=use_config(), comments=False)
+    for i in range(MIN_OBSERVATIONS + 2):
+        doc = template.format(f"<p>Document {i}.</p>", paragraphs)
+        options.url = reference.url = f"https://www.example.com/post/{i}"
+        assert extract(doc, options=options) == extract(doc, options=reference)
+    site = SITE_SHORTCUTS.get("https://www.example.com/")
+    assert site.body.total == MIN_OBSERVATIONS + 2
+    favorite = site.body.favorite(0.8)
+    assert favorite not in (None, 0) and site.body_order(len(BODY_XPATH))[0] == favorite
+    # pages with a different layout fall back to the full sequence
+    options.url = reference.url = "https://www.example.com/other"
+    for doc in (
+        f"<html><body><article>{paragraphs}</article></body></html>",
+        f"<html><body><main><p>Short.</p><p>Teaser.</p></main><article>{paragraphs}</article></body></html>",
+    ):
+        assert extract(doc, options=options) == extract(doc, options=reference)
+    assert site.body.total == MIN_OBSERVATIONS + 4 and site.body.counts[favorite] == MIN_OBSERVATIONS + 2
+    SITE_SHORTCUTS.clear()
+
+
+def test_site_templates():
+    "Blocks repeated across pages of a website are removed."
+    from trafilatura.sites import MAX_TEMPLATE_ENTRIES, SITE_SHORTCUTS, TEMPLATE_MIN_PAGES, block_fingerprints
+
+    tree = html.fromstring(
+        '<html><body><!-- c --><div class="a">x<div>y</div></div><div class="a">x<div>y</div></div><div class="a"><img src="a.jpg"/></div></body></html>'
+    )
+    blocks = block_fingerprints(tree)
+    # two identical blocks and their children, no empty block
+    assert len(blocks) == 2 and all(len(elems) == 2 for elems in blocks.values())
+
+    SITE_SHORTCUTS.clear()
+    paragraphs = "".join(
+        f"<p>Paragraph {i} of a long article with enough words to be kept in the output.</p>" for i in range(10)
+    )
+    options = core.Extractor(config=use_config(), adaptive=True)
+    for i in range(TEMPLATE_MIN_PAGES + 1):
+        options.url = f"https://example.net/{i}"
+        doc = f'<html><body><main><p>Story {i}</p>{paragraphs}<div class="promo"><p>Subscribe to our newsletter for more stories.</p></div></main></body></html>'
+        result = extract(doc, options=options)
+        assert f"Story {i}" in result
+        assert ("Subscribe" in result) is (i < TEMPLATE_MIN_PAGES - 1)
+    # other host
+    options.url = "https://example.org/"
+    assert "Subscribe" in extract(doc, options=options)
+
+    # pages are only counted once
+    SITE_SHORTCUTS.clear()
+    options = core.Extractor(adaptive=True, precision=True, fast=True, url="https://example.net/page")
+    doc = f'<html><body><div class="content">{paragraphs}<div class="promo"><p>Subscribe now.</p></div></div></body></html>'
+    assert all("Subscribe" in extract(doc, options=options) for _ in range(TEMPLATE_MIN_PAGES + 1))
+    # the container of the main text is never pruned, even if it is the same on several pages
+    for i in range(TEMPLATE_MIN_PAGES + 1):
+        options.url = f"https://example.net/{i}"
+        assert "Paragraph 9" in extract(doc, options=options)
+
+    # the blocks seen least recently are forgotten first, the template stays
+    SITE_SHORTCUTS.clear()
+    shortcuts = SITE_SHORTCUTS.get("https://example.net/")
+
+    def template_page(i):
+        return html.fromstring(
+            f'<html><body><div class="menu">Menu</div><div>Page {i}</div><div>Other {i}</div></body></html>'
+        )
+
+    first_page = set(block_fingerprints(template_page(0)))
+    for i in range(MAX_TEMPLATE_ENTRIES):
+        page = shortcuts.prune_templates(template_page(i), f"https://example.net/{i}")
+        assert len(shortcuts.templates) <= MAX_TEMPLATE_ENTRIES
+        assert (page.find(".//div[@class='menu']") is None) is (i >= TEMPLATE_MIN_PAGES - 1)
+    assert len(shortcuts.templates) == MAX_TEMPLATE_ENTRIES
+    assert [fingerprint in shortcuts.templates for fingerprint in first_page].count(True) == 1
+    SITE_SHORTCUTS.clear()
+
+
+def test_site_profiles(tmp_path):
+    "Settings defined per website are found and applied."
+    from trafilatura.sites import SITE_PROFILES, SiteProfiles, compile_xpaths
+
+    assert compile_xpaths(("//div",)) is compile_xpaths(("//div",))
+
+    profiles = SiteProfiles()
+    assert profiles.get("https://example.org/") is None
+    with pytest.raises(ValueError):
+        profiles.add("example.org", {"unknown": 1})
+    with pytest.raises(ValueError):
+        profiles.add("example.org", {"options": {"output_format": "xml"}})
+    with pytest.raises(ValueError):
+        profiles.add("example.org", {"options": {"focus": "everything"}})
+    profiles.add("example.org", {"options": {"fast": True}})
+    profiles.add("example.org/blog/*", {"prune_xpath": "//aside"})
+    assert profiles.get("https://www.example.org/news/1").name == "example.org"
+    assert profiles.get("https://example.org/blog/1").name == "example.org/blog/*"
+    assert profiles.get("https://example.com/") is None and profiles.get("not a url") is None
+    assert len(profiles) == 2
+
+    filepath = tmp_path / "profiles.json"
+    filepath.write_text(
+        """{"example.net": {
+            "prune_xpath": ["//div[@class='promo']"],
+            "body_xpath": "//div[@class='story']",
+            "options": {"comments": false},
+            "metadata": {"sitename": "Example News", "license": "CC BY-SA"}
+        }}""",
+        encoding="utf-8",
+    )
+    paragraphs = "".join(
+        f"<p>Paragraph {i} of a long article with enough words to be kept in the output.</p>" for i in range(10)
+    )
+    doc = f"""<html><head><meta name="author" content="Jane Doe"/></head><body><article><p>Teaser text which should not be there.</p><p>Another teaser text.</p>
+    <div class="story">{paragraphs}<div class="promo"><p>Subscribe to our newsletter for more stories.</p></div></div></article>
+    <div class="comments"><p>This is a reader comment about the article.</p></div></body></html>"""
+    reference = bare_extraction(doc, url="https://example.net/1", with_metadata=True)
+    assert "Subscribe" in reference.text and "Teaser" in reference.text and reference.sitename != "Example News"
+
+    SITE_PROFILES.load(str(filepath))
+    try:
+        result = bare_extraction(doc, url="https://www.example.net/1", with_metadata=True)
+        assert "Subscribe" not in result.text and "Teaser" not in result.text and "Paragraph 9" in result.text
+        assert not result.comments
+        assert result.sitename == "Example News" and result.license == "CC BY-SA" and result.author == "Jane Doe"
+        # other websites are not affected
+        assert "Subscribe" in bare_extraction(doc, url="https://example.com/1").text
+        # the options of the profile hold for the output as well
+        SITE_PROFILES.add("example.net/formatted/*", {"options": {"formatting": True}})
+        formatted = doc.replace("Paragraph 9", "<b>Paragraph 9</b>")
+        assert "**Paragraph 9**" in extract(formatted, url="https://example.net/formatted/1")
+        assert "**Paragraph 9**" not in extract(formatted, url="https://example.net/1")
+    finally:
+        SITE_PROFILES.clear()
+
+    filepath = tmp_path / "profiles.toml"
+    filepath.write_text('["example.net"]\nprune_xpath = ["//aside"]\n', encoding="utf-8")
+    if sys.version_info >= (3, 11):
+        profiles.load(str(filepath))
+        assert profiles.get("https://example.net/").prune_xpath
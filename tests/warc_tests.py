@@ -0,0 +1,139 @@
+"""
+Unit tests for the reading of web archives.
+"""
+
+import gzip
+import io
+import json
+import logging
+import sys
+from datetime import datetime, timezone
+
+import pytest
+
+from trafilatura import cli, cli_utils, settings
+from trafilatura.downloads import Response, add_to_compressed_dict
+from trafilatura.sinks import read_record
+from trafilatura.warc import WarcWriter, iter_html_responses, iter_warc_records, parse_http_response
+
+logging.basicConfig(stream=sys.stdout, level=logging.DEBUG)
+
+HTML = b"<html><body><article><p>" + b"Archived text of a page. " * 20 + b"</p></article></body></html>"
+
+
+def _record(warc_type, url, block, content_type="application/http; msgtype=response"):
+    "Build a WARC record."
+    headers = (
+        "WARC/1.0\r\n"
+        f"WARC-Type: {warc_type}\r\n"
+        f"WARC-Target-URI: {url}\r\n"
+        "WARC-Date: 2024-03-05T10:00:00Z\r\n"
+        f"Content-Type: {content_type}\r\n"
+        f"Content-Length: {len(block)}\r\n\r\n"
+    )
+    return headers.encode() + block + b"\r\n\r\n"
+
+
+def _response(body, content_type="text/html; charset=utf-8", status="200 OK", chunked=False):
+    "Build the block of a response record."
+    if chunked:
+        body = b"%x\r\n%s\r\n0\r\n\r\n" % (len(body), body)
+    encoding = "Transfer-Encoding: chunked\r\n" if chunked else ""
+    return f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n{encoding}\r\n".encode() + body
+
+
+RECORDS = [
+    _record("warcinfo", "", b"software: test\r\n", "application/warc-fields"),
+    _record("request", "https://example.org/1", b"GET /1 HTTP/1.1\r\n\r\n", "application/http; msgtype=request"),
+    _record("response", "https://example.org/1", _response(HTML)),
+    _record("response", "https://example.org/2", _response(HTML, chunked=True)),
+    _record("response", "https://example.org/3", _response(b"{}", content_type="application/json")),
+    _record("response", "https://example.org/4", _response(HTML, status="404 Not Found")),
+    _record("response", "<https://example.org/5>", _response(HTML)),
+]
+
+
+def test_warc_reading(tmp_path):
+    "Records are read from plain and gzipped files, only HTML responses are kept."
+    plain = tmp_path / "test.warc"
+    plain.write_bytes(b"".join(RECORDS))
+    # one gzip member per record
+    compressed = tmp_path / "test.warc.gz"
+    compressed.write_bytes(b"".join(gzip.compress(r) for r in RECORDS))
+
+    for source in (str(plain), str(compressed), io.BytesIO(compressed.read_bytes())):
+        records = list(iter_warc_records(source))
+        assert [r.type for r in records] == ["warcinfo", "request"] + ["response"] * 5
+        assert records[2].date == "2024-03-05"
+        pages = list(iter_html_responses(source if isinstance(source, str) else io.BytesIO(compressed.read_bytes())))
+        assert [url for url, _, _ in pages] == ["https://example.org/1", "https://example.org/2", "https://example.org/5"]
+        assert all(payload == HTML and date == "2024-03-05" for _, payload, date in pages)
+
+    # malformed input
+    assert list(iter_warc_records(io.BytesIO(b"not a WARC file\r\n"))) == []
+    assert parse_http_response(b"no headers") == (0, {}, b"no headers")
+
+
+def test_cli_warc(tmp_path):
+    "Archived pages are extracted with their URL."
+    source = tmp_path / "test.warc.gz"
+    source.write_bytes(b"".join(gzip.compress(r) for r in RECORDS))
+    output = tmp_path / "output"
+    args = cli.parse_args(["--input-warc", str(source), "-o", str(output), "--json", "--with-metadata", "--shard-size", "1"])
+    cli.process_args(args)
+    index = [line.split("\t") for line in (output / "shard-index.tsv").read_text().splitlines()]
+    assert sorted(key for key, _, _, _ in index) == ["https://example.org/1", "https://example.org/2", "https://example.org/5"]
+    _, shard, offset, length = index[0]
+    document = json.loads(read_record(str(output / shard), int(offset), int(length)))
+    assert document["source"].startswith("https://example.org/") and "Archived text" in document["text"]
+
+
+def test_warc_writing(tmp_path):
+    "Responses are stored as request and response records in rotating files."
+    response = Response(HTML, 200, "https://example.org/page?id=1")
+    response.store_headers({"Content-Type": "text/html", "Content-Encoding": "gzip", "Server": "test"})
+    date = datetime(2024, 3, 5, 10, tzinfo=timezone.utc)
+    with WarcWriter(str(tmp_path), max_size=200) as writer:
+        writer.write_response(response, {"User-Agent": "test"}, date)
+        writer.write_response(Response(b"", 404, "https://example.org/missing"))
+    files = sorted(f.name for f in tmp_path.iterdir())
+    assert files == ["backup-00000.warc.gz", "backup-00001.warc.gz"]
+
+    records = list(iter_warc_records(str(tmp_path / files[0])))
+    assert [r.type for r in records] == ["warcinfo", "response", "request"]
+    assert records[2].headers["warc-concurrent-to"] == records[1].headers["warc-record-id"]
+    assert records[2].content.startswith(b"GET /page?id=1 HTTP/1.1\r\nHost: example.org\r\nUser-Agent: test")
+    status, headers, payload = parse_http_response(records[1].content)
+    # the data is stored decoded
+    assert status == 200 and payload == HTML and "content-encoding" not in headers
+    assert headers["content-length"] == str(len(HTML)) and headers["server"] == "test"
+    assert list(iter_html_responses(str(tmp_path / files[0]))) == [("https://example.org/page?id=1", HTML, "2024-03-05")]
+    assert list(iter_html_responses(str(tmp_path / files[1]))) == []
+
+    # no overwriting
+    with WarcWriter(str(tmp_path)) as writer:
+        writer.write_record("resource", "https://example.org/", b"text", "text/plain")
+        assert writer.filename == "backup-00002.warc.gz"
+
+
+@pytest.mark.usefixtures("mock_network")
+def test_warc_backup(tmp_path):
+    "Downloaded pages are archived in WARC format and can be processed again."
+    urls = ["https://example.org/", "https://httpbun.com/html", "https://example.com/missing"]
+    with pytest.raises(SystemExit):
+        cli.parse_args(["-i", "list.txt", "--backup-format", "warc"])
+    args = cli.parse_args(["-o", str(tmp_path / "out"), "--backup-dir", str(tmp_path / "backup"), "--backup-format", "warc"])
+    options = settings.args_to_extractor(args)
+    for parallel in (1, 2):
+        args.parallel = parallel
+        cli_utils.use_warc_backup(args)
+        try:
+            errors, _ = cli_utils.download_queue_processing(add_to_compressed_dict(urls), args, 0, options)
+        finally:
+            cli_utils.close_warc_backup()
+        assert errors == ["https://example.com/missing"]
+    # no single backup files
+    backups = sorted(f.name for f in (tmp_path / "backup").iterdir())
+    assert backups == ["backup-00000.warc.gz", "backup-00001.warc.gz"]
+    pages = list(iter_html_responses(str(tmp_path / "backup" / backups[1])))
+    assert sorted(url for url, _, _ in pages) == ["https://example.org/", "https://httpbun.com/html"]
@@ -0,0 +1,123 @@
+"""
+Reading web pages stored in archives and in JSON lines files.
+"""
+
+import gzip
+import io
+import json
+import logging
+import re
+import tarfile
+import zipfile
+from collections.abc import Generator
+from datetime import datetime
+from typing import Any
+
+from .core import extract
+from .settings import Extractor, get_extractor
+from .utils import HAS_ZSTD
+from .warc import iter_html_responses
+
+if HAS_ZSTD:
+    import zstandard
+
+LOGGER = logging.getLogger(__name__)
+
+# members which are not web pages
+SKIPPED_MEMBERS = re.compile(
+    r"\.(?:css|js|json|png|jpe?g|gif|svg|webp|ico|bmp|pdf|woff2?|ttf|eot|mp[34]|webm|zip)$", re.IGNORECASE
+)
+
+# source (file or URL), URL if known, HTML document and fetch date (YYYY-MM-DD)
+Record = tuple[str, str | None, bytes | str, str | None]
+
+
+def _format_timestamp(timestamp: float) -> str:
+    "Convert a timestamp to a date string."
+    return datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d")
+
+
+def iter_tar(filename: str) -> Generator[Record, None, None]:
+    "Read the members of a tar file (possibly compressed) one after the other."
+    with tarfile.open(filename, "r|*") as archive:
+        for member in archive:
+            if not member.isfile() or SKIPPED_MEMBERS.search(member.name):
+                continue
+            filehandle = archive.extractfile(member)
+            if filehandle is not None:
+                yield member.name, None, filehandle.read(), _format_timestamp(member.mtime)
+
+
+def iter_zip(filename: str) -> Generator[Record, None, None]:
+    "Read the members of a zip file one after the other."
+    with zipfile.ZipFile(filename) as archive:
+        for info in archive.infolist():
+            if info.is_dir() or SKIPPED_MEMBERS.search(info.filename):
+                continue
+            date = "{:04d}-{:02d}-{:02d}".format(*info.date_time[:3])
+            with archive.open(info) as filehandle:
+                yield info.filename, None, filehandle.read(), date
+
+
+def _open_lines(filename: str) -> Any:
+    "Open a plain or compressed text file."
+    if filename.endswith(".gz"):
+        return gzip.open(filename, "rt", encoding="utf-8")
+    if filename.endswith(".zst"):
+        if not HAS_ZSTD:
+            raise ValueError("zstd compression requires the zstandard package")
+        reader = zstandard.ZstdDecompressor().stream_reader(open(filename, "rb"), closefd=True)  # noqa: SIM115  # closed by the caller
+        return io.TextIOWrapper(reader, encoding="utf-8")
+    return open(filename, "r", encoding="utf-8")
+
+
+def iter_jsonl(filename: str) -> Generator[Record, None, None]:
+    """Read JSON lines with "url" and "html" keys and an optional "date",
+    lines which cannot be used are skipped."""
+    with _open_lines(filename) as filehandle:
+        for number, line in enumerate(filehandle, 1):
+            try:
+                record = json.loads(line)
+                html = record["html"]
+            except (KeyError, TypeError, ValueError):
+                LOGGER.warning("invalid record: %s line %s", filename, number)
+                continue
+            url = record.get("url")
+            date = record.get("date")
+            yield url or f"{filename}:{number}", url, html, date[:10] if isinstance(date, str) else None
+
+
+def iter_warc(filename: str) -> Generator[Record, None, None]:
+    "Read the HTML pages of a WARC file (see warc.iter_html_responses)."
+    for url, payload, date in iter_html_responses(filename):
+        yield url, url, payload, date
+
+
+def iter_records(filename: str) -> Generator[Record, None, None]:
+    """Stream the web pages stored in a tar, zip, JSON lines or WARC file,
+    nothing is unpacked to disk. The file type is determined by its extension."""
+    name = filename.lower()
+    if re.search(r"\.warc(?:\.gz)?$", name):
+        yield from iter_warc(filename)
+    elif re.search(r"\.jsonl?(?:\.gz|\.zst)?$", name):
+        yield from iter_jsonl(filename)
+    elif name.endswith(".zip"):
+        yield from iter_zip(filename)
+    elif re.search(r"\.(?:tar(?:\.\w+)?|tgz)$", name):
+        yield from iter_tar(filename)
+    else:
+        raise ValueError(f"unknown archive type: {filename}")
+
+
+def record_options(options: Extractor, record: Record) -> Extractor:
+    "Return a copy of the extraction options with the URL and the fetch date of the record."
+    source, url, _, date = record
+    return options.for_document(url, source, date or datetime.now().strftime("%Y-%m-%d"))
+
+
+def extract_records(filename: str, options: Extractor | None = None) -> Generator[tuple[str, str | None], None, None]:
+    """Extract the content of all the web pages stored in a file (see iter_records)
+    and yield the source of each page along with the result."""
+    options = options or get_extractor()
+    for record in iter_records(filename):
+        yield record[0], extract(record[2], options=record_options(options, record))
@@ -8,18 +8,29 @@ import sys
 from importlib.metadata import version
 from platform import python_version
 
+from .archives import iter_warc
 from .cli_utils import (
+    archive_processing_pipeline,
     cli_crawler,
     cli_discovery,
+    close_output_shards,
+    close_stats,
+    close_warc_backup,
     examine,
     file_processing_pipeline,
     load_blacklist,
     load_input_dict,
     probe_homepage,
     url_processing_pipeline,
+    use_output_shards,
+    use_stats,
+    use_warc_backup,
     write_result,
 )
+from .deduplication import use_shared_store
 from .settings import PARALLEL_CORES, SUPPORTED_FMT_CLI
+from .sinks import SHARD_FORMATS
+from .sites import SITE_PROFILES
 
 # options that --list neither downloads nor extracts, hence ignores
 _LIST_IGNORED_OPTS = {
@@ -34,9 +45,14 @@ _LIST_IGNORED_OPTS = {
     "comments",
     "tables",
     "deduplicate",
+    "dedup_store",
+    "near_dedup",
+    "adaptive",
+    "profiles",
     "output_format",
     "archived",
     "backup_dir",
+    "backup_format",
 }
 
 # fix output encoding on some systems
@@ -60,6 +76,13 @@ def add_args(parser: argparse.ArgumentParser) -> argparse.ArgumentParser:
 
     group1_ex.add_argument("-i", "--input-file", help="name of input file for batch processing", type=str)
     group1_ex.add_argument("--input-dir", help="read files from a specified directory (relative path)", type=str)
+    group1_ex.add_argument("--input-warc", help="read HTML pages from WARC files (plain or gzipped)", nargs="+", type=str)
+    group1_ex.add_argument(
+        "--input-archive",
+        help="read HTML pages from tar or zip archives and from JSON lines files with url and html keys",
+        nargs="+",
+        type=str,
+    )
     group1_ex.add_argument("-u", "--URL", help="custom URL download", type=str)
 
     group1.add_argument(
@@ -73,7 +96,28 @@ def add_args(parser: argparse.ArgumentParser) -> argparse.ArgumentParser:
     group2.add_argument("--list", help="display a list of URLs without downloading them", action="store_true")
     group2.add_argument("-o", "--output-dir", help="write results in a specified directory (relative path)", type=str)
     group2.add_argument("--backup-dir", help="preserve a copy of downloaded files in a backup directory", type=str)
+    group2.add_argument(
+        "--backup-format",
+        help="store backups as single HTML files or as WARC files with HTTP headers",
+        choices=["html", "warc"],
+        default="html",
+    )
     group2.add_argument("--keep-dirs", help="keep input directory structure and file names", action="store_true")
+    group2.add_argument(
+        "--shard-size",
+        help="gather the results in files of this size (in MB) along with an index (JSON, CSV or XML output)",
+        type=float,
+    )
+    group2.add_argument("--compression", help="compress the shards", choices=["gzip", "zstd"])
+    group2.add_argument("--checkpoint", help="regularly save the progress of downloads and crawls in this file", type=str)
+    group2.add_argument("--resume", help="go on from the last checkpoint (with --checkpoint)", action="store_true")
+    group2.add_argument("--failure-report", help="list files which could not be processed in this JSON lines file", type=str)
+    group2.add_argument(
+        "--stats", help="print throughput and latency figures at regular intervals (on STDERR)", action="store_true"
+    )
+    group2.add_argument(
+        "--stats-file", help="also write the figures to a Prometheus textfile (.prom) or as JSON lines", type=str
+    )
 
     group3_ex.add_argument(
         "--feed", help="look for feeds and/or pass a feed URL as input", nargs="?", const=True, default=False
@@ -107,6 +151,11 @@ def add_args(parser: argparse.ArgumentParser) -> argparse.ArgumentParser:
         nargs="+",
         type=str,
     )
+    group3.add_argument(
+        "--sitemap-state",
+        help="only return links modified since the last run, whose date is stored for each website in this JSON file",
+        type=str,
+    )
     # group3.add_argument('--no-ssl',
     #                    help="Disable secure connections (to prevent SSLError)",
     #                    action="store_true")
@@ -123,6 +172,18 @@ def add_args(parser: argparse.ArgumentParser) -> argparse.ArgumentParser:
     group4.add_argument("--with-metadata", help="extract and add metadata to the output", action="store_true")
     group4.add_argument("--target-language", help="select a target language (ISO 639-1 codes)", type=str)
     group4.add_argument("--deduplicate", help="filter out duplicate documents and sections", action="store_true")
+    group4.add_argument(
+        "--near-dedup", help="filter out documents which are near-duplicates of already processed ones", action="store_true"
+    )
+    group4.add_argument(
+        "--dedup-store",
+        help="share deduplication data across processes and runs using this SQLite file (with --deduplicate)",
+        type=str,
+    )
+    group4.add_argument(
+        "--adaptive", help="reuse extraction decisions taken on other pages of the same website", action="store_true"
+    )
+    group4.add_argument("--profiles", help="apply per-website settings defined in this JSON or TOML file", type=str)
     group4.add_argument("--config-file", help="override standard extraction parameters with a custom config file", type=str)
     group4.add_argument("--precision", help="favor extraction precision (less noise, possibly less text)", action="store_true")
     group4.add_argument("--recall", help="favor extraction recall (more text, possibly more noise)", action="store_true")
@@ -158,6 +219,27 @@ def _validate_args(parser: argparse.ArgumentParser, args: argparse.Namespace) ->
     "Catch cross-group incompatibilities that argparse cannot express."
     if args.keep_dirs and not args.output_dir:
         parser.error("--keep-dirs requires an output directory (-o/--output-dir)")
+    if args.shard_size:
+        if not args.output_dir:
+            parser.error("--shard-size requires an output directory (-o/--output-dir)")
+        if args.output_format not in SHARD_FORMATS:
+            parser.error("--shard-size requires CSV, JSON, XML or XML-TEI output")
+        if args.keep_dirs:
+            parser.error("--shard-size and --keep-dirs are incompatible")
+    if args.backup_format == "warc" and not args.backup_dir:
+        parser.error("--backup-format warc requires --backup-dir")
+    if args.compression and not args.shard_size:
+        parser.error("--compression requires --shard-size")
+    if args.sitemap_state and not (args.sitemap or args.explore):
+        parser.error("--sitemap-state requires --sitemap or --explore")
+    if args.resume and not args.checkpoint:
+        parser.error("--resume requires --checkpoint")
+    if args.failure_report and not (args.input_dir or args.input_warc or args.input_archive):
+        parser.error("--failure-report requires --input-dir, --input-warc or --input-archive")
+    if args.stats_file and not args.stats:
+        parser.error("--stats-file requires --stats")
+    if args.dedup_store and not args.deduplicate:
+        parser.error("--dedup-store requires --deduplicate")
     if args.list:
         ignored = sorted(o for o in _LIST_IGNORED_OPTS if getattr(args, o) != parser.get_default(o))
         if ignored:
@@ -200,33 +282,56 @@ def process_args(args: argparse.Namespace) -> None:
     if args.blacklist:
         args.blacklist = load_blacklist(args.blacklist)
 
-    # processing according to mutually exclusive options
-
-    # fetch urls from a feed or a sitemap
-    if args.explore or args.feed or args.sitemap:
-        exit_code = cli_discovery(args)
-
-    # activate crawler/spider
-    elif args.crawl:
-        cli_crawler(args)
+    if args.dedup_store:
+        use_shared_store(args.dedup_store)
 
-    # probe and print only
-    elif args.probe:
-        probe_homepage(args)
+    if args.profiles:
+        SITE_PROFILES.load(args.profiles)
 
-    # read files from an input directory
-    elif args.input_dir:
-        file_processing_pipeline(args)
+    if args.shard_size:
+        use_output_shards(args)
+    if args.backup_dir and args.backup_format == "warc":
+        use_warc_backup(args)
+    if args.stats:
+        use_stats(args)
 
-    # read url list from input file or process input URL
-    elif args.input_file or args.URL:
-        url_store = load_input_dict(args)
-        exit_code = url_processing_pipeline(args, url_store)
-
-    # read input on STDIN directly
-    else:
-        result = examine(sys.stdin.buffer.read(), args, url=args.URL)
-        write_result(result, args)
+    # processing according to mutually exclusive options
+    try:
+        # fetch urls from a feed or a sitemap
+        if args.explore or args.feed or args.sitemap:
+            exit_code = cli_discovery(args)
+
+        # activate crawler/spider
+        elif args.crawl:
+            cli_crawler(args)
+
+        # probe and print only
+        elif args.probe:
+            probe_homepage(args)
+
+        # read files from an input directory
+        elif args.input_dir:
+            file_processing_pipeline(args)
+
+        # read pages from WARC files and other archives
+        elif args.input_warc:
+            archive_processing_pipeline(args, args.input_warc, iter_warc)
+        elif args.input_archive:
+            archive_processing_pipeline(args, args.input_archive)
+
+        # read url list from input file or process input URL
+        elif args.input_file or args.URL:
+            url_store = load_input_dict(args)
+            exit_code = url_processing_pipeline(args, url_store)
+
+        # read input on STDIN directly
+        else:
+            result = examine(sys.stdin.buffer.read(), args, url=args.URL)
+            write_result(result, args)
+    finally:
+        close_output_shards()
+        close_warc_backup()
+        close_stats()
 
     # change exit code if there are errors
     if exit_code != 0:
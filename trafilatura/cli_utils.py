@@ -10,55 +10,97 @@ except ImportError:
     HAS_GZIP = False
 
 import argparse
+import json
 import logging
+import pickle
 import random
 import re
 import string
 import sys
 import traceback
 from base64 import urlsafe_b64encode
-from collections.abc import Generator
-from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from collections.abc import Callable, Generator, Iterable
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed, wait
 from datetime import datetime
 from functools import partial
-from os import makedirs, path, stat, walk
-from threading import RLock
+from itertools import chain
+from multiprocessing import Pipe, Process
+from multiprocessing.connection import Connection
+from multiprocessing.connection import wait as wait_connections
+from multiprocessing.process import BaseProcess
+from os import makedirs, path, replace, stat, walk
+from queue import Queue
+from threading import Thread
+from time import monotonic
+from typing import Any
 
 from courlan import UrlStore, extract_domain, get_base_url  # validate_url
 
 from trafilatura import spider
 
+from .archives import Record, iter_records, record_options
 from .baseline import html2txt
 from .core import extract
-from .deduplication import generate_bow_hash
-from .downloads import Response, add_to_compressed_dict, buffered_downloads, buffered_response_downloads, load_download_buffer
+from .deduplication import SIMHASH_INDEX, generate_bow_hash, near_duplicate_test, use_shared_store
+from .downloads import (
+    Response,
+    _buffered_downloads,
+    _determine_headers,
+    _is_suitable_response,
+    add_to_compressed_dict,
+    buffered_downloads,
+    buffered_response_downloads,
+    fetch_response,
+    load_download_buffer,
+)
 from .feeds import find_feed_urls
-from .meta import reset_caches
+from .meta import reset_caches, trim_caches
 from .settings import (
     FILENAME_LEN,
     MAX_FILES_PER_DIRECTORY,
     Extractor,
     args_to_extractor,
+    use_config,
 )
-from .sitemaps import sitemap_search
+from .sinks import ShardWriter
+from .sitemaps import sitemap_discovery
+from .sites import SITE_PROFILES
+from .stats import RunStats, StatsReporter
 from .utils import (
     LANGID_FLAG,
     URL_BLACKLIST_REGEX,
+    decode_file,
     is_acceptable_length,
     language_classifier,
     make_chunks,
 )
+from .warc import WarcWriter
 
 LOGGER = logging.getLogger(__name__)
 
 random.seed(345)  # make generated file names reproducible
 CHAR_CLASS = string.ascii_letters + string.digits
 
+# documents waiting for extraction per worker process
+PENDING_PER_WORKER = 2
+
 STRIP_DIR = re.compile(r"[^/]+$")
 STRIP_EXTENSION = re.compile(r"\.[a-z]{2,5}$")
 
 CLEAN_XML = re.compile(r"<[^<]+?>")
 
+# documents examined between two checks of the cache memory budget
+CACHE_CHECK_INTERVAL = 100
+EXAMINED = 0
+
+# sink gathering the results in shards, see use_output_shards()
+OUTPUT_SHARDS: ShardWriter | None = None
+# web archive storing the downloaded pages, see use_warc_backup()
+BACKUP_WARC: WarcWriter | None = None
+# throughput and latency figures, see use_stats()
+RUN_STATS: RunStats | None = None
+STATS_REPORTER: StatsReporter | None = None
+
 INPUT_URLS_ARGS = ["URL", "crawl", "explore", "probe", "feed", "sitemap"]
 
 EXTENSION_MAPPING = {
@@ -190,17 +232,114 @@ def archive_html(htmlstring: str, args: argparse.Namespace, counter: int = -1) -
     return filename
 
 
+def use_output_shards(args: argparse.Namespace) -> None:
+    "Gather the results in compressed shards of the output directory instead of single files."
+    global OUTPUT_SHARDS
+    OUTPUT_SHARDS = ShardWriter(
+        args.output_dir,
+        args.output_format,
+        shard_size=int(args.shard_size * 2**20),
+        compression=args.compression,
+    )
+
+
+def close_output_shards() -> None:
+    "Finish the current shard and the index."
+    global OUTPUT_SHARDS
+    if OUTPUT_SHARDS is not None:
+        OUTPUT_SHARDS.close()
+        OUTPUT_SHARDS = None
+
+
+def use_warc_backup(args: argparse.Namespace) -> None:
+    "Store the downloaded pages along with HTTP headers in WARC files of the backup directory."
+    global BACKUP_WARC
+    BACKUP_WARC = WarcWriter(args.backup_dir)
+
+
+def close_warc_backup() -> None:
+    "Close the current WARC file."
+    global BACKUP_WARC
+    if BACKUP_WARC is not None:
+        BACKUP_WARC.close()
+        BACKUP_WARC = None
+
+
+def use_stats(args: argparse.Namespace) -> None:
+    "Record throughput and latency figures and report on them at regular intervals."
+    global RUN_STATS, STATS_REPORTER
+    config = use_config(filename=args.config_file)
+    RUN_STATS = RunStats()
+    STATS_REPORTER = StatsReporter(RUN_STATS, config.getfloat("DEFAULT", "STATS_INTERVAL", fallback=10), args.stats_file)
+    STATS_REPORTER.start()
+
+
+def close_stats() -> None:
+    "Report the final figures."
+    global RUN_STATS, STATS_REPORTER
+    if STATS_REPORTER is not None:
+        STATS_REPORTER.stop()
+    RUN_STATS = STATS_REPORTER = None
+
+
+def _timed_fetch(url: str, options: Extractor, with_headers: bool) -> tuple[Response | None, float]:
+    "Download a page and measure the time it takes."
+    start = monotonic()
+    response = fetch_response(url, decode=True, with_headers=with_headers, config=options.config)
+    return response, monotonic() - start
+
+
+def download_pages(
+    bufferlist: list[str], args: argparse.Namespace, options: Extractor
+) -> Generator[tuple[str, str | None], None, None]:
+    """Download a series of pages and yield their HTML code,
+    eventually archive the responses in WARC format and record statistics."""
+    if BACKUP_WARC is None and RUN_STATS is None:
+        yield from buffered_downloads(bufferlist, args.parallel, options=options)
+        return
+    request_headers = dict(_determine_headers(options.config))
+    worker = partial(_timed_fetch, options=options, with_headers=BACKUP_WARC is not None)
+    for url, (response, seconds) in _buffered_downloads(bufferlist, args.parallel, worker):
+        suitable = response is not None and _is_suitable_response(url, response, options)
+        if RUN_STATS is not None:
+            if not response:
+                RUN_STATS.record_download(url, None, 0, seconds)
+                RUN_STATS.record_failure("no response")
+            else:
+                RUN_STATS.record_download(url, response.status, len(response.data), seconds)
+                if not suitable:
+                    RUN_STATS.record_failure(f"HTTP {response.status}" if response.status != 200 else "invalid length")
+        if not response:
+            yield url, None
+            continue
+        if BACKUP_WARC is not None:
+            BACKUP_WARC.write_response(response, request_headers)
+        yield url, response.html if suitable else None
+
+
 def write_result(
     result: str | None,
     args: argparse.Namespace,
     orig_filename: str = "",
     counter: int = -1,
     new_filename: str | None = None,
-) -> None:
-    """Deal with result (write to STDOUT or to file)"""
+    key: str = "",
+) -> bool:
+    """Deal with result (write to STDOUT, to a shard or to file),
+    the key (URL or file name) identifies the record in the shard index.
+    Return True if the result has been written out."""
+    # document-level near-duplicates, checked here as all results go through the main process
+    if result and args.near_dedup and near_duplicate_test(CLEAN_XML.sub("", result)):
+        LOGGER.debug("discarding near-duplicate document: %s", key or orig_filename)
+        result = None
     if result is None:
-        return
-    if args.output_dir is None:
+        if RUN_STATS is not None:
+            RUN_STATS.record_failure("no result")
+        return False
+    start = monotonic()
+    if OUTPUT_SHARDS is not None:
+        OUTPUT_SHARDS.write(result, key or orig_filename)
+    elif args.output_dir is None:
         sys.stdout.write(result + "\n")
     else:
         destination_path, destination_dir = determine_output_path(args, orig_filename, result, counter, new_filename)
@@ -208,6 +347,10 @@ def write_result(
         if check_outputdir_status(destination_dir) is True:
             with open(destination_path, mode="w", encoding="utf-8") as outputfile:
                 outputfile.write(result)
+    if RUN_STATS is not None:
+        RUN_STATS.record_stage("write", monotonic() - start)
+        RUN_STATS.record_document(len(result))
+    return True
 
 
 def generate_filelist(inputdir: str) -> Generator[str, None, None]:
@@ -217,57 +360,244 @@ def generate_filelist(inputdir: str) -> Generator[str, None, None]:
             yield path.join(root, fname)
 
 
-def file_processing(filename: str, args: argparse.Namespace, counter: int = -1, options: Extractor | None = None) -> None:
-    "Aggregated functions to process a file in a list."
-    if not options:
-        options = args_to_extractor(args)
-    options.source = filename
-
+def extract_file(filename: str, args: argparse.Namespace, options: Extractor | None = None) -> str | None:
+    "Read a file and extract its content."
     with open(filename, "rb") as inputf:
         htmlstring = inputf.read()
 
     file_stat = stat(filename)
     ref_timestamp = min(file_stat.st_ctime, file_stat.st_mtime)
-    options.date_params["max_date"] = datetime.fromtimestamp(ref_timestamp).strftime("%Y-%m-%d")
+    options = (options or args_to_extractor(args)).for_document(
+        source=filename, max_date=datetime.fromtimestamp(ref_timestamp).strftime("%Y-%m-%d")
+    )
 
-    result = examine(htmlstring, args, options=options)
+    return examine(htmlstring, args, options=options)
+
+
+def file_processing(filename: str, args: argparse.Namespace, counter: int = -1, options: Extractor | None = None) -> None:
+    "Aggregated functions to process a file in a list."
+    result = extract_file(filename, args, options)
     write_result(result, args, filename, counter, new_filename=None)
 
 
-def process_result(htmlstring: str, args: argparse.Namespace, counter: int, options: Extractor | None) -> int:
-    "Extract text and metadata from a download webpage and eventually write out the result."
-    # backup option
-    fileslug = archive_html(htmlstring, args, counter) if args.backup_dir else ""
-    # process
-    result = examine(htmlstring, args, options=options)
-    write_result(result, args, orig_filename=fileslug, counter=counter, new_filename=fileslug)
+def store_result(htmlstring: str, result: str | None, args: argparse.Namespace, counter: int, url: str = "") -> int:
+    "Write out the result and eventually a backup of the webpage, return the updated file counter."
+    # backup option, unless the pages are archived in WARC format when downloaded
+    fileslug = archive_html(htmlstring, args, counter) if args.backup_dir and BACKUP_WARC is None else ""
+    written = write_result(result, args, orig_filename=fileslug, counter=counter, new_filename=fileslug, key=url)
     # increment written file counter
-    if counter >= 0 and result:
+    if counter >= 0 and result and written:
         counter += 1
     return counter
 
 
+def process_result(htmlstring: str, args: argparse.Namespace, counter: int, options: Extractor | None) -> int:
+    "Extract text and metadata from a download webpage and eventually write out the result."
+    start = monotonic()
+    result = examine(htmlstring, args, options=options)
+    if RUN_STATS is not None:
+        RUN_STATS.record_stage("extraction", monotonic() - start)
+    return store_result(htmlstring, result, args, counter, options.url or "" if options else "")
+
+
+class ResultWriter(Thread):
+    "Write out results in a separate thread, fed through a bounded queue."
+
+    def __init__(self, args: argparse.Namespace, counter: int, maxsize: int) -> None:
+        super().__init__(daemon=True)
+        self.args = args
+        self.counter = counter
+        self.queue: Queue[tuple[str, str | None, str] | None] = Queue(maxsize=maxsize)
+
+    def run(self) -> None:
+        while (item := self.queue.get()) is not None:
+            try:
+                htmlstring, result, url = item
+                self.counter = store_result(htmlstring, result, self.args, self.counter, url)
+            except Exception as err:  # noqa: BLE001  # keep the queue flowing
+                LOGGER.error("writing result failed: %s", err)
+            finally:
+                self.queue.task_done()
+
+    def put(self, htmlstring: str, result: str | None, url: str = "") -> None:
+        "Queue a result, blocks if the writer lags behind."
+        self.queue.put((htmlstring, result, url))
+
+    def flush(self) -> int:
+        "Wait until the queued results are written and return the file counter."
+        self.queue.join()
+        return self.counter
+
+    def close(self) -> int:
+        "Write the remaining results and return the file counter."
+        self.queue.put(None)
+        self.join()
+        return self.counter
+
+
+def _extract_download(htmlstring: str, url: str, args: argparse.Namespace, options: Extractor) -> tuple[str | None, float]:
+    "Process a downloaded webpage in a worker process, return the result and the time taken."
+    start = monotonic()
+    return examine(htmlstring, args, options=options.for_document(url)), monotonic() - start
+
+
+def _collect_extractions(
+    pending: dict[Future[tuple[str | None, float]], tuple[str, str]], writer: ResultWriter, block: bool
+) -> None:
+    "Pass finished extractions on to the writer, wait for at least one of them if required."
+    done = wait(pending, return_when=FIRST_COMPLETED)[0] if block else [f for f in pending if f.done()]
+    for future in done:
+        url, htmlstring = pending.pop(future)
+        try:
+            result, seconds = future.result()
+        except Exception as err:  # noqa: BLE001  # e.g. broken process pool
+            LOGGER.error("extraction failed: %s %s", url, err)
+            if RUN_STATS is not None:
+                RUN_STATS.record_failure("extraction error")
+        else:
+            if RUN_STATS is not None:
+                RUN_STATS.record_stage("extraction", seconds)
+            writer.put(htmlstring, result, url)
+    if RUN_STATS is not None:
+        RUN_STATS.set_queue("extraction", len(pending))
+        RUN_STATS.set_queue("write", writer.queue.qsize())
+
+
+class Checkpoint:
+    """Save the state of a long run to a file at regular intervals so that it
+    can be resumed: data passed by the caller (URL store, errors, counter),
+    position of the output shards and hashes used for near-duplicate detection.
+    The file is replaced atomically, a run stopped at any moment can thus go on
+    from the last checkpoint, at which all the URLs taken had been processed."""
+
+    __slots__ = ["errors", "filename", "interval", "last"]
+
+    def __init__(self, filename: str, interval: float) -> None:
+        self.filename = filename
+        self.interval = interval
+        self.last = monotonic()
+        # errors of the previous runs
+        self.errors: list[str] = []
+
+    def due(self) -> bool:
+        "Tell if the next checkpoint is to be written."
+        return monotonic() - self.last >= self.interval
+
+    def save(self, **state: Any) -> None:
+        "Write the state of the run to the checkpoint file."
+        state["shards"] = OUTPUT_SHARDS.checkpoint() if OUTPUT_SHARDS is not None else None
+        state["simhash"] = list(SIMHASH_INDEX.hashes)
+        temp_file = self.filename + ".tmp"
+        with open(temp_file, "wb") as outputfile:
+            pickle.dump(state, outputfile)
+        replace(temp_file, self.filename)
+        self.last = monotonic()
+        LOGGER.debug("checkpoint written: %s", self.filename)
+
+    def load(self) -> dict[str, Any] | None:
+        "Read the last checkpoint if there is one and restore the output shards and the hashes."
+        if not path.isfile(self.filename):
+            return None
+        with open(self.filename, "rb") as inputfile:
+            state: dict[str, Any] = pickle.load(inputfile)
+        if OUTPUT_SHARDS is not None and state["shards"] is not None:
+            OUTPUT_SHARDS.rollback(state["shards"])
+        for value in state["simhash"]:
+            SIMHASH_INDEX.add(value)
+        self.errors = state.get("errors", [])
+        LOGGER.info("resuming from checkpoint: %s", self.filename)
+        return state
+
+
+def open_checkpoint(args: argparse.Namespace, options: Extractor) -> tuple[Checkpoint | None, dict[str, Any] | None]:
+    "Set up checkpoints if required and return the state to resume from if any."
+    if not args.checkpoint:
+        return None, None
+    checkpoint = Checkpoint(args.checkpoint, options.config.getfloat("DEFAULT", "CHECKPOINT_INTERVAL", fallback=300))
+    return checkpoint, checkpoint.load() if args.resume else None
+
+
 def download_queue_processing(
-    url_store: UrlStore, args: argparse.Namespace, counter: int, options: Extractor
+    url_store: UrlStore,
+    args: argparse.Namespace,
+    counter: int,
+    options: Extractor,
+    checkpoint: Checkpoint | None = None,
 ) -> tuple[list[str], int]:
-    "Implement a download queue consumer, single- or multi-threaded."
-    errors = []
+    """Implement a download queue consumer, single- or multi-threaded.
+    With several cores, downloads, extraction and output are handled by
+    separate stages: download threads, a pool of extraction processes and
+    a writer thread. Each stage only accepts a bounded number of documents
+    so that a slower stage throttles the previous ones. Deduplication
+    without a shared store keeps the extraction in the main process.
+    The progress is saved between two buffers if a checkpoint is given."""
+    errors: list[str] = []
     sleep_time = options.config.getfloat("DEFAULT", "SLEEP_TIME")
 
+    # segments are counted in a single process unless the deduplication data is shared
+    if args.parallel > 1 and (args.dedup_store or not args.deduplicate):
+        return _pipelined_queue_processing(url_store, args, counter, options, sleep_time, checkpoint)
+
     while not url_store.done:
         bufferlist, url_store = load_download_buffer(url_store, sleep_time)
+        if RUN_STATS is not None:
+            RUN_STATS.set_queue("download", len(bufferlist))
         # process downloads
-        for url, result in buffered_downloads(bufferlist, args.parallel, options=options):
+        for url, result in download_pages(bufferlist, args, options):
             # handle result
             if result and isinstance(result, str):
-                options.url = url
-                counter = process_result(result, args, counter, options)
+                counter = process_result(result, args, counter, options.for_document(url))
             else:
                 LOGGER.warning("No result for URL: %s", url)
                 errors.append(url)
+        if checkpoint and checkpoint.due():
+            checkpoint.save(url_store=url_store, errors=checkpoint.errors + errors, counter=counter)
     return errors, counter
 
 
+def _pipelined_queue_processing(
+    url_store: UrlStore,
+    args: argparse.Namespace,
+    counter: int,
+    options: Extractor,
+    sleep_time: float,
+    checkpoint: Checkpoint | None = None,
+) -> tuple[list[str], int]:
+    "Overlap downloads, extraction in several processes and output."
+    errors: list[str] = []
+    max_pending = args.parallel * PENDING_PER_WORKER
+    pending: dict[Future[tuple[str | None, float]], tuple[str, str]] = {}
+    writer = ResultWriter(args, counter, max_pending)
+    writer.start()
+
+    with ProcessPoolExecutor(
+        max_workers=args.parallel, initializer=_init_worker, initargs=(args.dedup_store, args.profiles)
+    ) as executor:
+        while not url_store.done:
+            bufferlist, url_store = load_download_buffer(url_store, sleep_time)
+            if RUN_STATS is not None:
+                RUN_STATS.set_queue("download", len(bufferlist))
+            for url, result in download_pages(bufferlist, args, options):
+                if not result or not isinstance(result, str):
+                    LOGGER.warning("No result for URL: %s", url)
+                    errors.append(url)
+                    continue
+                # backpressure: wait for the workers if too many documents are pending
+                _collect_extractions(pending, writer, block=len(pending) >= max_pending)
+                # the HTML code is only kept for backups
+                future = executor.submit(_extract_download, result, url, args, options)
+                pending[future] = (url, result if args.backup_dir and BACKUP_WARC is None else "")
+            if checkpoint and checkpoint.due():
+                # the pipeline is drained so that all the URLs taken are processed
+                while pending:
+                    _collect_extractions(pending, writer, block=True)
+                checkpoint.save(url_store=url_store, errors=checkpoint.errors + errors, counter=writer.flush())
+        while pending:
+            _collect_extractions(pending, writer, block=True)
+
+    return errors, writer.close()
+
+
 def cli_discovery(args: argparse.Namespace) -> int:
     "Group CLI functions dedicated to URL discovery."
     url_store = load_input_dict(args)
@@ -276,28 +606,24 @@ def cli_discovery(args: argparse.Namespace) -> int:
         url_store.reset()
 
     options = args_to_extractor(args)
-    func = partial(
-        find_feed_urls if args.feed else sitemap_search,
-        target_lang=args.target_language,
-        external=options.config.getboolean("DEFAULT", "EXTERNAL_URLS"),
-        sleep_time=options.config.getfloat("DEFAULT", "SLEEP_TIME"),
-    )
-    lock = RLock()
+    settings = {
+        "target_lang": args.target_language,
+        "external": options.config.getboolean("DEFAULT", "EXTERNAL_URLS"),
+        "sleep_time": options.config.getfloat("DEFAULT", "SLEEP_TIME"),
+    }
 
     # link discovery and storage
-    with ThreadPoolExecutor(max_workers=args.parallel) as executor:
-        futures = (executor.submit(func, url) for url in input_urls)
-        # process results from the parallel threads and add them
-        # to the compressed URL dictionary for further processing
-        for future in as_completed(futures):
-            if future.result() is not None:
-                url_store.add_urls(future.result())
-                # empty buffer in order to spare memory
-                if args.list and len(url_store.get_known_domains()) >= args.parallel:
-                    with lock:
-                        url_store.print_unvisited_urls()
-                        url_store.reset()
-                        reset_caches()
+    # process results as they come and add them
+    # to the compressed URL dictionary for further processing
+    for links in _discover_links(input_urls, args, settings):
+        if links is not None:
+            url_store.add_urls(links)
+            # empty buffer in order to spare memory
+            if args.list and len(url_store.get_known_domains()) >= args.parallel:
+                url_store.print_unvisited_urls()
+                url_store.reset()
+                if not check_caches(options, force=True):
+                    reset_caches()
 
     # process the (rest of the) links found
     exit_code = url_processing_pipeline(args, url_store)
@@ -311,6 +637,21 @@ def cli_discovery(args: argparse.Namespace) -> int:
     return exit_code
 
 
+def _discover_links(
+    input_urls: list[str], args: argparse.Namespace, settings: dict[str, Any]
+) -> Generator[list[str] | None, None, None]:
+    """Find links in feeds with one thread per website or in sitemaps,
+    where the requests to all websites are interleaved."""
+    if not args.feed:
+        for _, links in sitemap_discovery(input_urls, max_workers=args.parallel, state_file=args.sitemap_state, **settings):
+            yield links
+        return
+    with ThreadPoolExecutor(max_workers=args.parallel) as executor:
+        futures = (executor.submit(find_feed_urls, url, **settings) for url in input_urls)
+        for future in as_completed(futures):
+            yield future.result()
+
+
 def build_exploration_dict(url_store: UrlStore, input_urls: list[str], args: argparse.Namespace) -> UrlStore:
     "Find domains for which nothing has been found and add info to the crawl dict."
     input_domains = {extract_domain(u) for u in input_urls}
@@ -335,16 +676,21 @@ def cli_crawler(
     options = options or args_to_extractor(args)
     sleep_time = options.config.getfloat("DEFAULT", "SLEEP_TIME")
     param_dict = {}
+    checkpoint, state = open_checkpoint(args, options)
+
+    # skip the work done before the last checkpoint
+    if state is not None:
+        spider.URL_STORE, param_dict = state["url_store"], state["params"]
 
     # load input URLs
-    if url_store is None:
+    elif url_store is None:
         spider.URL_STORE.add_urls(load_input_urls(args))
     else:
         spider.URL_STORE = url_store
 
     # load crawl data
     for hostname in spider.URL_STORE.get_known_domains():
-        if spider.URL_STORE.urldict[hostname].tuples:
+        if hostname not in param_dict and spider.URL_STORE.urldict[hostname].tuples:
             startpage = spider.URL_STORE.get_url(hostname, as_visited=False)
             if startpage:
                 param_dict[hostname] = spider.init_crawl(startpage, lang=args.target_language)
@@ -359,10 +705,15 @@ def cli_crawler(
         for url, result in buffered_response_downloads(bufferlist, args.parallel, options=options):
             if result and isinstance(result, Response):
                 spider.process_response(result, param_dict[get_base_url(url)])
+        if checkpoint and checkpoint.due():
+            checkpoint.save(url_store=spider.URL_STORE, params=param_dict)
         # early exit if maximum count is reached
         if any(c >= n for c in spider.URL_STORE.get_all_counts()):
             break
 
+    if checkpoint:
+        checkpoint.save(url_store=spider.URL_STORE, params=param_dict)
+
     print("\n".join(u for u in spider.URL_STORE.dump_urls()))
 
 
@@ -401,8 +752,16 @@ def url_processing_pipeline(args: argparse.Namespace, url_store: UrlStore) -> in
     url_count = url_store.total_url_number()
     counter = 0 if url_count > MAX_FILES_PER_DIRECTORY else -1
 
+    # skip the work done before the last checkpoint
+    checkpoint, state = open_checkpoint(args, options)
+    if state is not None:
+        url_store, counter = state["url_store"], state["counter"]
+
     # download strategy
-    errors, counter = download_queue_processing(url_store, args, counter, options)
+    errors, counter = download_queue_processing(url_store, args, counter, options, checkpoint)
+    if checkpoint:
+        errors = checkpoint.errors + errors
+        checkpoint.save(url_store=url_store, errors=errors, counter=counter)
     LOGGER.debug("%s / %s URLs could not be found", len(errors), url_count)
 
     if args.archived is True:
@@ -421,23 +780,251 @@ def url_processing_pipeline(args: argparse.Namespace, url_store: UrlStore) -> in
     return _define_exit_code(errors, url_count)
 
 
-def file_processing_pipeline(args: argparse.Namespace) -> None:
-    "Define batches for parallel file processing and perform the extraction."
+def _init_worker(dedup_store: str | None, profiles: str | None) -> None:
+    "Set up a worker process, i.e. (re)open shared deduplication data and load site profiles."
+    if dedup_store:
+        use_shared_store(dedup_store)
+    if profiles and not SITE_PROFILES:
+        SITE_PROFILES.load(profiles)
+
+
+def _supervised_worker(
+    conn: Connection, func: Callable[[Any], Any], initializer: Callable[..., None] | None, initargs: tuple[Any, ...]
+) -> None:
+    "Run tasks received through the connection and report on them."
+    if initializer is not None:
+        initializer(*initargs)
+    while (task := conn.recv()) is not None:
+        try:
+            result = func(task)
+        except Exception as err:  # noqa: BLE001  # reported as a failure of the task
+            conn.send((f"{err.__class__.__name__}: {err}", None))
+        else:
+            conn.send((None, result))
+
+
+class _Worker:
+    "Worker process along with its connection and current task."
+
+    __slots__ = ["conn", "process", "started", "task", "tasks"]
+
+    def __init__(self, process: BaseProcess, conn: Connection) -> None:
+        self.process = process
+        self.conn = conn
+        self.started = 0.0
+        self.task: Any = None
+        self.tasks = 0
+
+    def stop(self, kill: bool = False) -> None:
+        "End the process, forcefully if required."
+        if kill:
+            self.process.kill()
+        else:
+            try:
+                self.conn.send(None)
+            except OSError:  # process already gone
+                pass
+        self.process.join(timeout=None if kill else 5)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+
+class SupervisedPool:
+    """Pool of worker processes running a function on a series of tasks.
+    A worker exceeding the timeout on a task is killed and replaced,
+    workers are recycled after max_tasks tasks (0 to disable both).
+    Results are passed on to the callback in the main process,
+    errors, crashes and timeouts are stored in the failures list."""
+
+    def __init__(
+        self,
+        func: Callable[[Any], Any],
+        processes: int,
+        timeout: float = 0,
+        max_tasks: int = 0,
+        initializer: Callable[..., None] | None = None,
+        initargs: tuple[Any, ...] = (),
+    ) -> None:
+        self.func = func
+        self.processes = max(processes, 1)
+        self.timeout = timeout
+        self.max_tasks = max_tasks
+        self.initializer = initializer
+        self.initargs = initargs
+        self.failures: list[tuple[Any, str, str]] = []
+        self.spawned = 0
+
+    def _spawn(self) -> _Worker:
+        "Start a new worker process."
+        parent_conn, child_conn = Pipe()
+        process = Process(
+            target=_supervised_worker, args=(child_conn, self.func, self.initializer, self.initargs), daemon=True
+        )
+        process.start()
+        child_conn.close()
+        self.spawned += 1
+        return _Worker(process, parent_conn)
+
+    def _fail(self, task: Any, status: str, message: str) -> None:
+        "Register a failed task."
+        LOGGER.warning("%s: %s %s", status, task, message)
+        self.failures.append((task, status, message))
+        if RUN_STATS is not None:
+            RUN_STATS.record_failure(status)
+
+    def _wait_time(self, busy: dict[Connection, _Worker]) -> float | None:
+        "Time until the next task may exceed the timeout."
+        if not self.timeout:
+            return None
+        deadline = min(w.started for w in busy.values()) + self.timeout
+        return max(deadline - monotonic(), 0.01)
+
+    def run(self, tasks: Iterable[Any], callback: Callable[[Any, Any], None] | None = None) -> None:
+        "Process all tasks, pass the task and its result to the callback and wait for the workers."
+        tasks = iter(tasks)
+        # free slots, None if no process is running in it
+        free: list[_Worker | None] = [None] * self.processes
+        busy: dict[Connection, _Worker] = {}
+        exhausted = False
+        try:
+            while True:
+                # hand out tasks
+                while free and not exhausted:
+                    task = next(tasks, None)
+                    if task is None:
+                        exhausted = True
+                        break
+                    worker = free.pop() or self._spawn()
+                    worker.task, worker.started = task, monotonic()
+                    worker.conn.send(task)
+                    busy[worker.conn] = worker
+                if not busy:
+                    break
+                # collect results
+                for conn in wait_connections(list(busy), timeout=self._wait_time(busy)):
+                    worker = busy.pop(conn)  # type: ignore[call-overload]
+                    try:
+                        message, result = worker.conn.recv()
+                    except EOFError:
+                        worker.process.join()
+                        self._fail(worker.task, "crash", f"exit code {worker.process.exitcode}")
+                        worker.conn.close()
+                        free.append(None)
+                        continue
+                    if RUN_STATS is not None:
+                        RUN_STATS.record_stage("extraction", monotonic() - worker.started)
+                        RUN_STATS.set_queue("extraction", len(busy))
+                    if message is not None:
+                        self._fail(worker.task, "error", message)
+                    elif callback is not None:
+                        callback(worker.task, result)
+                    worker.tasks += 1
+                    if self.max_tasks and worker.tasks >= self.max_tasks:
+                        worker.stop()
+                        free.append(None)
+                    else:
+                        free.append(worker)
+                # enforce the timeout
+                if self.timeout:
+                    now = monotonic()
+                    for conn, worker in list(busy.items()):
+                        if now - worker.started > self.timeout:
+                            del busy[conn]
+                            worker.stop(kill=True)
+                            self._fail(worker.task, "timeout", f"more than {self.timeout} seconds")
+                            free.append(None)
+        finally:
+            for remaining in chain(free, busy.values()):
+                if remaining is not None:
+                    remaining.stop(kill=remaining in busy.values())
+
+
+def _process_file_task(task: tuple[str, int], args: argparse.Namespace, options: Extractor) -> str | None:
+    "Extract the content of a file in a worker process."
+    return extract_file(task[0], args, options)
+
+
+def _file_tasks(inputdir: str) -> Generator[tuple[str, int], None, None]:
+    "List files to process along with their output counter."
     filecounter = -1
+    for filebatch in make_chunks(generate_filelist(inputdir), MAX_FILES_PER_DIRECTORY):
+        if filecounter < 0 and len(filebatch) >= MAX_FILES_PER_DIRECTORY:
+            filecounter = 0
+        for filename in filebatch:
+            yield filename, filecounter
+        # update counter
+        if filecounter >= 0:
+            filecounter += len(filebatch)
+
+
+def _process_record(task: Record, args: argparse.Namespace, options: Extractor) -> str | None:
+    "Extract the content of an archived page in a worker process."
+    return examine(task[2], args, options=record_options(options, task))
+
+
+def archive_processing_pipeline(
+    args: argparse.Namespace, filenames: list[str], reader: Callable[[str], Iterable[Record]] = iter_records
+) -> None:
+    """Stream the pages stored in archives, JSON lines or WARC files to a supervised pool
+    of workers, the files are read and decompressed on the fly and never unpacked to disk."""
+    options = args_to_extractor(args)
+    pool = SupervisedPool(
+        partial(_process_record, args=args, options=options),
+        args.parallel,
+        timeout=options.config.getint("DEFAULT", "EXTRACTION_TIMEOUT"),
+        max_tasks=options.config.getint("DEFAULT", "MAX_TASKS_PER_CHILD", fallback=0),
+        initializer=_init_worker,
+        initargs=(args.dedup_store, args.profiles),
+    )
+    # the number of documents is unknown in advance, use subdirectories from the start
+    counter = 0
+
+    def write(task: Record, result: str | None) -> None:
+        nonlocal counter
+        # the HTML code is only decoded for backups
+        htmlstring = decode_file(task[2]) if args.backup_dir else ""
+        counter = store_result(htmlstring, result, args, counter, task[0])
+
+    pool.run(chain.from_iterable(reader(f) for f in filenames), write)
+    if pool.failures:
+        LOGGER.warning("%s records could not be processed", len(pool.failures))
+    if args.failure_report:
+        write_failure_report(pool.failures, args.failure_report)
+
+
+def write_failure_report(failures: list[tuple[Any, str, str]], filename: str) -> None:
+    "Write failed files as JSON lines."
+    with open(filename, "w", encoding="utf-8") as outputfile:
+        outputfile.writelines(
+            json.dumps({"file": task[0], "status": status, "message": message}) + "\n" for task, status, message in failures
+        )
+
+
+def file_processing_pipeline(args: argparse.Namespace) -> None:
+    """Process the files of the input directory with a supervised pool of workers:
+    files exceeding the extraction timeout are abandoned and their worker replaced,
+    workers are recycled after MAX_TASKS_PER_CHILD files."""
     options = args_to_extractor(args)
-    timeout = options.config.getint("DEFAULT", "EXTRACTION_TIMEOUT")
+    pool = SupervisedPool(
+        partial(_process_file_task, args=args, options=options),
+        args.parallel,
+        timeout=options.config.getint("DEFAULT", "EXTRACTION_TIMEOUT"),
+        max_tasks=options.config.getint("DEFAULT", "MAX_TASKS_PER_CHILD", fallback=0),
+        initializer=_init_worker,
+        initargs=(args.dedup_store, args.profiles),
+    )
+
+    # results are written out by the main process
+    def write(task: tuple[str, int], result: str | None) -> None:
+        write_result(result, args, task[0], task[1])
 
-    # max_tasks_per_child available in Python >= 3.11
-    with ProcessPoolExecutor(max_workers=args.parallel) as executor:
-        # chunk input: https://github.com/python/cpython/issues/74028
-        for filebatch in make_chunks(generate_filelist(args.input_dir), MAX_FILES_PER_DIRECTORY):
-            if filecounter < 0 and len(filebatch) >= MAX_FILES_PER_DIRECTORY:
-                filecounter = 0
-            worker = partial(file_processing, args=args, counter=filecounter, options=options)
-            executor.map(worker, filebatch, chunksize=10, timeout=timeout)
-            # update counter
-            if filecounter >= 0:
-                filecounter += len(filebatch)
+    pool.run(_file_tasks(args.input_dir), write)
+    if pool.failures:
+        LOGGER.warning("%s files could not be processed", len(pool.failures))
+    if args.failure_report:
+        write_failure_report(pool.failures, args.failure_report)
 
 
 def examine(
@@ -462,4 +1049,20 @@ def examine(
         # ugly but efficient
         except Exception as err:
             sys.stderr.write(f"ERROR: {str(err)}\n{traceback.format_exc()}\n")
+    check_caches(options)
     return result
+
+
+def check_caches(options: Extractor, force: bool = False) -> bool:
+    """Evict the least useful caches if their estimated memory exceeds the budget,
+    checked every few documents. Return False if no budget is set."""
+    global EXAMINED
+    budget = options.config.getint("DEFAULT", "CACHE_MEMORY_BUDGET", fallback=0)
+    if budget <= 0:
+        return False
+    EXAMINED += 1
+    if force or EXAMINED % CACHE_CHECK_INTERVAL == 0:
+        freed = trim_caches(budget * 2**20)
+        if freed:
+            LOGGER.debug("caches trimmed: %s bytes", freed)
+    return True
@@ -26,7 +26,8 @@ from .htmlprocessing import (
 )
 from .main_extractor import _elem_text, extract_comments, extract_content
 from .metadata import Document, extract_metadata
-from .settings import DEFAULT_CONFIG, Extractor, use_config
+from .settings import DEFAULT_CONFIG, Extractor, get_extractor, load_config
+from .sites import SITE_PROFILES, SITE_SHORTCUTS, HostShortcuts, compile_xpaths
 from .utils import (
     LANGID_FLAG,
     check_html_lang,
@@ -51,6 +52,8 @@ ESCALATION_ACCEPT_RATIO = 1.5  # accept the retry if it is this much longer
 ESCALATION_JUSTEXT_RATIO = 2.0
 
 TXT_FORMATS = {"markdown", "txt"}
+# formats which always carry the document fingerprint, the others only along with metadata
+FINGERPRINT_FORMATS = {"csv", "xml", "xmltei"}
 
 # Metadata is emitted as a YAML-style Markdown header; values such as a title
 # containing ": " (or a leading indicator, or a reserved word) otherwise produce
@@ -154,9 +157,11 @@ def _forum_thread_page(tree: HtmlElement) -> bool:
     )
 
 
-def _prepare_tree(tree: HtmlElement, options: Extractor, url: str | None) -> tuple[HtmlElement, HtmlElement]:
+def _prepare_tree(
+    tree: HtmlElement, options: Extractor, url: str | None, site: HostShortcuts | None = None
+) -> tuple[HtmlElement, HtmlElement]:
     "Clean and convert a raw tree, returning (converted, pre-conversion backup)."
-    cleaned = tree_cleaning(copy(tree), options)
+    cleaned = tree_cleaning(copy(tree), options, site, url or options.url)
     backup = copy(cleaned)
     cleaned = convert_tags(cleaned, options, url)
     return cleaned, backup
@@ -180,6 +185,7 @@ def trafilatura_sequence(
     tree: HtmlElement,
     options: Extractor,
     url: str | None = None,
+    preferred: list[XPath] | None = None,
 ) -> tuple[_Element, str, int, _Element, str, int]:
     """Prepare the raw tree (cleaning, tag conversion, comment handling), then execute the
     standard cascade of extractors used by Trafilatura, each stage only engaging if the
@@ -190,6 +196,7 @@ def trafilatura_sequence(
     4. recall escalation, if the result still covers little of the page: stages 1-2 re-run
        in recall mode (_recall_retry), plus a justext candidate tried alongside (a different
        algorithm, not just stricter rules, so it reaches content the rule-based retry cannot)
+    The ``preferred`` expressions are tried first by the main extractor.
     Returns the body triple and the comments triple.
 
     Internal helper: its signature and 6-tuple return are not a stable API — call
@@ -199,12 +206,14 @@ def trafilatura_sequence(
     # comments off: prune on the raw tree so all stages inherit it (only precision did before)
     if not options.comments and (options.focus == "precision" or not is_forum):
         tree = prune_unwanted_nodes(copy(tree), REMOVE_COMMENTS_XPATH)
-    cleaned_tree, cleaned_tree_backup = _prepare_tree(tree, options, url)
+    # decisions taken on other pages of the same website
+    site = SITE_SHORTCUTS.get(url or options.url) if options.adaptive else None
+    cleaned_tree, cleaned_tree_backup = _prepare_tree(tree, options, url, site)
 
     commentsbody, temp_comments, len_comments = Element("body"), "", 0
     forum_posts = None
     if options.comments:
-        commentsbody, temp_comments, len_comments, cleaned_tree = extract_comments(cleaned_tree, options)
+        commentsbody, temp_comments, len_comments, cleaned_tree = extract_comments(cleaned_tree, options, site)
         if len_comments > 0 and is_forum:
             # thread-forum: the "comments" are the posts -> route into the body (backup predates
             # capture); keep the capture aside, salvaged below if the cascade drops the posts
@@ -217,18 +226,24 @@ def trafilatura_sequence(
         cleaned_tree = prune_unwanted_nodes(cleaned_tree, REMOVE_COMMENTS_XPATH)
 
     # 1. Trafilatura's main extractor
-    postbody, temp_text, len_text = extract_content(cleaned_tree, options)
+    postbody, temp_text, len_text = extract_content(cleaned_tree, options, site, preferred or [])
 
-    # 2. comparison with external extractors
+    # 2. comparison with external extractors, skipped if the own extraction is reliable on this website
     if not options.fast:
-        postbody, temp_text, len_text = compare_extraction(
-            cleaned_tree_backup,
-            copy(tree),  # lxml copy() is already a deep, independent copy
-            postbody,
-            temp_text,
-            len_text,
-            options,
-        )
+        if site is not None and len_text >= options.min_extracted_size and site.skip_comparison():
+            LOGGER.debug("skipping external extractors: %s", options.source)
+        else:
+            ownbody = postbody
+            postbody, temp_text, len_text = compare_extraction(
+                cleaned_tree_backup,
+                copy(tree),  # lxml copy() is already a deep, independent copy
+                postbody,
+                temp_text,
+                len_text,
+                options,
+            )
+            if site is not None:
+                site.comparison.record(int(postbody is ownbody))
 
     # 3. rescue: baseline on the original tree
     if len_text < options.min_extracted_size and options.focus != "precision":
@@ -367,7 +382,7 @@ def bare_extraction(
 
     # regroup extraction options
     if not options or not isinstance(options, Extractor):
-        options = Extractor(
+        options = get_extractor(
             config=config,
             output_format=output_format,
             fast=fast,
@@ -424,15 +439,25 @@ def bare_extraction(
         else:
             document = Document()
 
+        # settings defined for the website
+        profile = SITE_PROFILES.get(options.url or document.url)
+        if profile is not None:
+            LOGGER.debug("using site profile %s: %s", profile.name, options.source)
+            options = profile.apply(options)
+            if options.with_metadata:
+                profile.complete(document)
+
         # prune all xpath expressions that user specified
         # no backup as this is unetre full control of the user
         if prune_xpath is not None:
             if isinstance(prune_xpath, str):
                 prune_xpath = [prune_xpath]
-            tree = prune_unwanted_nodes(tree, [XPath(x) for x in prune_xpath])
+            tree = prune_unwanted_nodes(tree, compile_xpaths(tuple(prune_xpath)))
+        if profile is not None and profile.prune_xpath:
+            tree = prune_unwanted_nodes(tree, profile.prune_xpath)
 
         postbody, temp_text, len_text, commentsbody, temp_comments, len_comments = trafilatura_sequence(
-            tree, options, options.url or document.url
+            tree, options, options.url or document.url, profile.body_xpath if profile is not None else []
         )
 
         # tree size sanity check
@@ -740,8 +765,8 @@ def _internal_extraction(
 
     # regroup extraction options
     if not options or not isinstance(options, Extractor):
-        options = Extractor(
-            config=use_config(settingsfile) if settingsfile else config,
+        options = get_extractor(
+            config=load_config(settingsfile) if settingsfile else config,
             output_format=output_format,
             fast=fast,
             precision=favor_precision,
@@ -774,14 +799,19 @@ def _internal_extraction(
     if not document or not isinstance(document, Document):
         return None
 
+    # the settings of the website also hold for the output
+    profile = SITE_PROFILES.get(options.url or document.url)
+    if profile is not None:
+        options = profile.apply(options)
+
     if options.format not in TXT_FORMATS:
         # control output
         if options.format == "python":
             raise ValueError("'python' format only usable in bare_extraction() function")
         # add record ID to metadata
         document.id = record_id
-        # calculate fingerprint
-        if document.raw_text is not None:
+        # calculate fingerprint if the output includes it
+        if document.raw_text is not None and (options.with_metadata or options.format in FINGERPRINT_FORMATS):
             document.fingerprint = content_fingerprint(str(document.title) + " " + str(document.raw_text))
 
     # return
@@ -1,14 +1,33 @@
 "Code parts dedicated to duplicate removal and text similarity."
 
+import json
+import math
+import mmap
 import re
+import sqlite3
 import string
+import struct
 import unicodedata
+from array import array
+from collections.abc import Iterable
+from contextlib import AbstractContextManager, nullcontext
 from difflib import SequenceMatcher
 from functools import lru_cache
 from hashlib import blake2b
-from operator import add
-from threading import RLock
-from typing import Any
+from itertools import chain
+from os import getpid, path
+from threading import RLock, local
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:  # pragma: no cover
+    from typing_extensions import Self
+
+try:
+    import numpy as np
+
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
 
 from lxml.etree import _Element
 
@@ -77,10 +96,62 @@ def generate_bow_hash(inputstring: str, length: int = 24) -> bytes:
 
 
 @lru_cache(maxsize=2**14)
-def _vector_to_add(token: str, length: int) -> list[int]:
-    "Token's contribution to a Simhash vector, cached across all instances."
-    token_hash = int.from_bytes(blake2b(token.encode(), digest_size=8).digest(), "big")
-    return [1 if token_hash & (1 << i) else -1 for i in range(length)]
+def _token_hash(token: str) -> int:
+    "Token's 64-bit hash, cached across all instances."
+    return int.from_bytes(blake2b(token.encode(), digest_size=8).digest(), "big")
+
+
+def _bitwise_majority(hashes: list[int], length: int) -> int:
+    """Set each bit of the result if it is set in at least half of the hashes.
+    Bits are counted in parallel with bit-sliced counters (one integer per
+    binary digit of the counts) instead of one list entry per bit position."""
+    mask = (1 << length) - 1
+    counters: list[int] = []
+    for token_hash in hashes:
+        carry = token_hash & mask
+        for i, counter in enumerate(counters):
+            if not carry:
+                break
+            counters[i], carry = counter ^ carry, counter & carry
+        if carry:
+            counters.append(carry)
+    # Charikar vector: +1 per set bit, -1 otherwise, kept if >= 0,
+    # i.e. the count has to reach half of the hashes: compare from the highest digit
+    threshold = (len(hashes) + 1) // 2
+    greater, equal = 0, mask
+    for i in reversed(range(max(len(counters), threshold.bit_length()))):
+        counter = counters[i] if i < len(counters) else 0
+        if (threshold >> i) & 1:
+            equal &= counter
+        else:
+            greater |= equal & counter
+            equal &= ~counter
+    return greater | equal
+
+
+def _simhash_numpy(samples: list[list[int]], length: int) -> list[int]:
+    "Vectorized computation of Simhash values for batches of hashed tokens."
+    sizes = np.fromiter(map(len, samples), dtype=np.int64, count=len(samples))
+    counts = np.zeros((len(samples), length), dtype=np.int64)
+    if sizes.any():
+        flat = np.fromiter(chain.from_iterable(samples), dtype=np.uint64, count=int(sizes.sum()))
+        # one row per token, one column per bit
+        bits = ((flat[:, None] >> np.arange(length, dtype=np.uint64)) & np.uint64(1)).astype(np.uint8)
+        nonempty = sizes > 0
+        offsets = (np.cumsum(sizes) - sizes)[nonempty]
+        counts[nonempty] = np.add.reduceat(bits, offsets, axis=0, dtype=np.int64)
+    weights = np.left_shift(np.uint64(1), np.arange(length, dtype=np.uint64))
+    values = ((2 * counts >= sizes[:, None]) * weights).sum(axis=1, dtype=np.uint64)
+    return [int(value) for value in values]
+
+
+def simhash_many(texts: Iterable[str], length: int = 64) -> list[int]:
+    """Calculate the Simhash values of several texts at once.
+    Uses NumPy if it is installed and a pure-Python fallback otherwise."""
+    samples = [[_token_hash(token) for token in sample_tokens(text, length)] for text in texts]
+    if HAS_NUMPY and length <= 64:
+        return _simhash_numpy(samples, length)
+    return [_bitwise_majority(hashes, length) for hashes in samples]
 
 
 class Simhash:
@@ -104,12 +175,8 @@ class Simhash:
         https://github.com/sean-public/python-hashes/blob/master/hashes/simhash.py
         Optimized for Python by @adbar.
         """
-        vector = [0] * self.length
-
-        for token in sample_tokens(inputstring, self.length):
-            vector = list(map(add, vector, _vector_to_add(token, self.length)))
-
-        return sum(1 << i for i in range(self.length) if vector[i] >= 0)
+        hashes = [_token_hash(token) for token in sample_tokens(inputstring, self.length)]
+        return _bitwise_majority(hashes, self.length)
 
     def to_hex(self) -> str:
         "Convert the numerical hash to a hexadecimal string."
@@ -149,6 +216,104 @@ def content_fingerprint(content: str) -> str:
     return Simhash(content).to_hex()
 
 
+class SimhashIndex:
+    """
+    Index of Simhash values to find near-duplicates without pairwise comparisons.
+    The hashes are split into distance + 1 bands: two hashes differing by at most
+    distance bits are identical on at least one band (pigeonhole principle), so
+    only the hashes sharing a band with the query are compared.
+    """
+
+    __slots__ = ["bands", "distance", "hashes", "length", "tables"]
+
+    def __init__(self, distance: int = 3, length: int = 64) -> None:
+        if not 0 <= distance < length:
+            raise ValueError("distance has to be positive and smaller than the hash length")
+        self.distance = distance
+        self.length = length
+        # (shift, mask) for each band, spreading the remainder over the first bands
+        width, extra = divmod(length, distance + 1)
+        self.bands: list[tuple[int, int]] = []
+        shift = 0
+        for i in range(distance + 1):
+            band_width = width + (1 if i < extra else 0)
+            self.bands.append((shift, (1 << band_width) - 1))
+            shift += band_width
+        self.tables: list[dict[int, set[int]]] = [{} for _ in self.bands]
+        self.hashes: set[int] = set()
+
+    def __len__(self) -> int:
+        return len(self.hashes)
+
+    def __contains__(self, value: int) -> bool:
+        return value in self.hashes
+
+    def _keys(self, value: int) -> list[int]:
+        return [(value >> shift) & mask for shift, mask in self.bands]
+
+    def add(self, value: int) -> None:
+        "Insert a hash value in the index."
+        if value in self.hashes:
+            return
+        self.hashes.add(value)
+        for table, key in zip(self.tables, self._keys(value)):
+            table.setdefault(key, set()).add(value)
+
+    def remove(self, value: int) -> None:
+        "Delete a hash value from the index if it is present."
+        if value not in self.hashes:
+            return
+        self.hashes.discard(value)
+        for table, key in zip(self.tables, self._keys(value)):
+            table[key].discard(value)
+            if not table[key]:
+                del table[key]
+
+    def query(self, value: int) -> list[int]:
+        "Return all indexed hashes within the Hamming distance of the given value."
+        candidates: set[int] = set()
+        for table, key in zip(self.tables, self._keys(value)):
+            candidates.update(table.get(key, ()))
+        return [c for c in candidates if BIN_COUNT_FUNC(c ^ value) <= self.distance]
+
+    def clear(self) -> None:
+        "Delete all index content."
+        self.hashes.clear()
+        for table in self.tables:
+            table.clear()
+
+    def save(self, filename: str) -> None:
+        "Write the index parameters and hashes to a JSON file."
+        with open(filename, "w", encoding="utf-8") as outputfile:
+            json.dump(
+                {"distance": self.distance, "length": self.length, "hashes": [hex(h)[2:] for h in self.hashes]},
+                outputfile,
+            )
+
+    @classmethod
+    def load(cls, filename: str) -> "SimhashIndex":
+        "Rebuild an index from a JSON file written by save()."
+        with open(filename, encoding="utf-8") as inputfile:
+            data = json.load(inputfile)
+        index = cls(distance=data["distance"], length=data["length"])
+        for value in data["hashes"]:
+            index.add(int(value, 16))
+        return index
+
+
+SIMHASH_INDEX = SimhashIndex()
+
+
+def near_duplicate_test(content: str) -> bool:
+    """Check if a near-duplicate of the content has already been seen
+    using the module-wide Simhash index, and store its hash otherwise."""
+    value = Simhash(content, length=SIMHASH_INDEX.length).hash
+    if SIMHASH_INDEX.query(value):
+        return True
+    SIMHASH_INDEX.add(value)
+    return False
+
+
 PREV, NEXT, KEY, RESULT = 0, 1, 2, 3  # names for the link fields
 
 
@@ -170,6 +335,10 @@ class LRUCache:
         # initialize by pointing to self
         self.root[:] = [self.root, self.root, None, None]
         self.full = False
+        self.hits = self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self.cache)
 
     def _move_link(self, link: Any) -> Any:
         # Move the link to the front of the circular queue
@@ -187,7 +356,9 @@ class LRUCache:
         with self.lock:
             link = self.cache.get(key)
             if link:
+                self.hits += 1
                 return self._move_link(link)
+            self.misses += 1
         return -1
 
     def put(self, key: str, value: Any) -> None:
@@ -227,34 +398,408 @@ class LRUCache:
                     # which could potentially be wrapped in an lru_cache itself.
                     self.full = len(self.cache) >= self.maxsize
 
+    def increment(self, key: str) -> int:
+        "Add one to the count stored for the key and return the new count."
+        with self.lock:
+            value = self.get(key)
+            value = value + 1 if value != -1 else 1
+            self.put(key, value)
+        return value
+
+    def shrink(self, count: int) -> None:
+        "Delete the given number of least recently used entries."
+        with self.lock:
+            for _ in range(min(count, len(self.cache))):
+                oldest = self.root[NEXT]
+                oldest[PREV][NEXT], oldest[NEXT][PREV] = oldest[NEXT], oldest[PREV]
+                del self.cache[oldest[KEY]]
+            self.full = len(self.cache) >= self.maxsize
+
     def clear(self) -> None:
         "Delete all cache content."
         with self.lock:
             self.cache.clear()
             self.root[:] = [self.root, self.root, None, None]
             self.full = False
+            self.hits = self.misses = 0
+
+
+class SQLiteCache:
+    """
+    Deduplication store backed by an SQLite database in WAL mode.
+    Implements the get/put/increment/clear interface of LRUCache so that it can replace it,
+    but keeps all keys (no eviction) and can be shared by several threads and
+    processes as well as persisted between runs. Keys are stored as hashes.
+    """
 
+    def __init__(self, filename: str) -> None:
+        self.filename = filename
+        self._local = local()
+        self._connect()
+
+    def __getstate__(self) -> dict[str, str]:
+        # connections cannot be pickled, they are reopened in each process
+        return {"filename": self.filename}
+
+    def __setstate__(self, state: dict[str, str]) -> None:
+        self.filename = state["filename"]
+        self._local = local()
+
+    def _connect(self) -> sqlite3.Connection:
+        "Return a connection specific to the current thread and process."
+        if getattr(self._local, "pid", None) != getpid():
+            conn = sqlite3.connect(self.filename, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS dedup (key BLOB PRIMARY KEY, value INTEGER NOT NULL) WITHOUT ROWID")
+            self._local.conn, self._local.pid = conn, getpid()
+        return self._local.conn
+
+    @staticmethod
+    def _hash_key(key: str) -> bytes:
+        return blake2b(key.encode("utf-8", "replace"), digest_size=16).digest()
+
+    def get(self, key: str) -> Any:
+        "Retrieve the value stored for the key, -1 if it is absent."
+        row = self._connect().execute("SELECT value FROM dedup WHERE key = ?", (self._hash_key(key),)).fetchone()
+        return row[0] if row else -1
+
+    def put(self, key: str, value: int) -> None:
+        "Store a given key in the database."
+        self._connect().execute(
+            "INSERT INTO dedup (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (self._hash_key(key), value),
+        )
+
+    def increment(self, key: str) -> int:
+        "Add one to the count stored for the key and return the new count, in a single atomic statement."
+        cursor = self._connect().execute(
+            "INSERT INTO dedup (key, value) VALUES (?, 1) ON CONFLICT(key) DO UPDATE SET value = value + 1 RETURNING value",
+            (self._hash_key(key),),
+        )
+        return int(cursor.fetchone()[0])
 
-LRU_TEST = LRUCache(maxsize=LRU_SIZE)
+    def clear(self) -> None:
+        "Delete all stored content."
+        self._connect().execute("DELETE FROM dedup")
+
+    def export_snapshot(self, filename: str) -> None:
+        "Write a consistent copy of the current state to a new database file."
+        self._connect().execute("VACUUM INTO ?", (filename,))
 
+    def import_snapshot(self, filename: str) -> None:
+        "Merge the state of another store, e.g. from a sharded run, by adding up the counts."
+        conn = self._connect()
+        conn.execute("ATTACH DATABASE ? AS snapshot", (filename,))
+        try:
+            conn.execute(
+                "INSERT INTO dedup (key, value) SELECT key, value FROM snapshot.dedup WHERE true "
+                "ON CONFLICT(key) DO UPDATE SET value = value + excluded.value"
+            )
+        finally:
+            conn.execute("DETACH DATABASE snapshot")
 
-def put_in_cache(teststring: str) -> None:
-    "Implement LRU cache."
-    cacheval = LRU_TEST.get(teststring)
-    # if the value is already defined
-    value = cacheval + 1 if cacheval != -1 else 1
-    LRU_TEST.put(teststring, value)
+
+class ClockCache:
+    """
+    Compact cache implementing the get/put/increment/clear interface of LRUCache.
+    Keys are stored as 64-bit hashes in a circular buffer made of arrays
+    (about 20 bytes per entry instead of a linked list node and the whole string)
+    and evicted with the CLOCK algorithm, which approximates LRU by giving a
+    second chance to entries accessed since the last sweep of the clock hand.
+    Set threadsafe to False to skip locking in single-threaded programs.
+    """
+
+    __slots__ = ["hand", "keys", "lock", "mask", "maxsize", "refs", "size", "table", "values"]
+
+    def __init__(self, maxsize: int = LRU_SIZE, threadsafe: bool = True) -> None:
+        self.maxsize = max(1, maxsize)
+        self.lock: AbstractContextManager[Any] = RLock() if threadsafe else nullcontext()
+        self._allocate()
+
+    def _allocate(self) -> None:
+        "Create the empty buffer and its lookup table, which is kept at most half full."
+        capacity = 1 << (2 * self.maxsize - 1).bit_length()
+        self.mask = capacity - 1
+        # circular buffer
+        self.keys = array("Q", bytes(8 * self.maxsize))
+        self.values = array("I", bytes(4 * self.maxsize))
+        self.refs = bytearray(self.maxsize)
+        # open addressing: buffer position + 1, 0 marks an empty slot
+        self.table = array("I", bytes(4 * capacity))
+        self.hand = 0
+        self.size = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    @staticmethod
+    def _hash_key(key: str) -> int:
+        return int.from_bytes(blake2b(key.encode("utf-8", "replace"), digest_size=8).digest(), "big")
+
+    def _find(self, hashed: int) -> int:
+        "Return the table slot pointing to the hash or the empty slot where it belongs (linear probing)."
+        keys, table, mask = self.keys, self.table, self.mask
+        i = hashed & mask
+        while table[i] and keys[table[i] - 1] != hashed:
+            i = (i + 1) & mask
+        return i
+
+    def _unlink(self, i: int) -> None:
+        "Empty a table slot and shift the following entries back so that no probe chain is broken."
+        keys, table, mask = self.keys, self.table, self.mask
+        j = i
+        while True:
+            j = (j + 1) & mask
+            if not table[j]:
+                break
+            home = keys[table[j] - 1] & mask
+            # move the entry if its home slot isn't cyclically within (i, j]
+            if (i < j and (home <= i or home > j)) or (j < i and j < home <= i):
+                table[i] = table[j]
+                i = j
+        table[i] = 0
+
+    def _evict(self) -> int:
+        "Move the clock hand to the first entry not accessed since the last sweep, remove it and return its position."
+        refs = self.refs
+        while True:
+            pos = self.hand
+            self.hand = (pos + 1) % self.maxsize
+            if refs[pos]:
+                refs[pos] = 0
+            else:
+                self._unlink(self._find(self.keys[pos]))
+                return pos
+
+    def get(self, key: str) -> Any:
+        """Tests if the key that is asked for is in the cache
+        and retrieve its value, -1 otherwise."""
+        hashed = self._hash_key(key)
+        with self.lock:
+            i = self._find(hashed)
+            if self.table[i]:
+                pos = self.table[i] - 1
+                self.refs[pos] = 1
+                return self.values[pos]
+        return -1
+
+    def put(self, key: str, value: int) -> None:
+        "Stores a given key in the cache."
+        hashed = self._hash_key(key)
+        with self.lock:
+            i = self._find(hashed)
+            if self.table[i]:
+                pos = self.table[i] - 1
+                self.refs[pos] = 1
+            else:
+                if self.size < self.maxsize:
+                    pos = self.size
+                    self.size += 1
+                else:
+                    pos = self._evict()
+                    i = self._find(hashed)
+                # new entries only get a second chance once they are accessed again
+                self.keys[pos], self.refs[pos], self.table[i] = hashed, 0, pos + 1
+            self.values[pos] = min(value, 0xFFFFFFFF)
+
+    def increment(self, key: str) -> int:
+        "Add one to the count stored for the key and return the new count."
+        with self.lock:
+            value = self.get(key)
+            value = value + 1 if value != -1 else 1
+            self.put(key, value)
+        return min(value, 0xFFFFFFFF)
+
+    def clear(self) -> None:
+        "Delete all cache content."
+        with self.lock:
+            self._allocate()
+
+
+BLOOM_HEADER = struct.Struct("<8sQI")
+BLOOM_MAGIC = b"TRAFBLOM"
+# bytes of counters added at once when merging filters
+BLOOM_CHUNK = 2**20
+
+
+class BloomFilter:
+    """
+    Counting Bloom filter with 4-bit counters implementing the get/put/increment/clear
+    interface of LRUCache. Memory is bounded and nothing is evicted, which suits
+    corpus-wide deduplication. Counts can be overestimated (never underestimated),
+    with a probability given by the error rate for the expected number of keys.
+    If a filename is given the counters are memory-mapped to this file so that
+    they persist between runs and can be shared by several processes; the
+    parameters stored in an existing file take precedence over the arguments.
+    Updates are not atomic across processes: concurrent writers can lose a few
+    increments, which only makes the counts lower. Use SQLiteCache for exact
+    shared counts, and close() or a with statement to release the mapping.
+    """
+
+    def __init__(self, capacity: int = 10**6, error_rate: float = 0.001, filename: str | None = None) -> None:
+        if capacity < 1 or not 0 < error_rate < 1:
+            raise ValueError("capacity has to be positive and error rate between 0 and 1")
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.filename = filename
+        self._open()
+
+    def _open(self) -> None:
+        "Allocate the counters in memory or map them to a file."
+        self.data: bytearray | mmap.mmap
+        if self.filename is None:
+            self.offset = 0
+            self.data = bytearray((self.size + 1) // 2)
+            return
+        if not path.isfile(self.filename) or path.getsize(self.filename) == 0:
+            with open(self.filename, "wb") as outputfile:
+                outputfile.write(BLOOM_HEADER.pack(BLOOM_MAGIC, self.size, self.hashes))
+                outputfile.truncate(BLOOM_HEADER.size + (self.size + 1) // 2)
+        with open(self.filename, "r+b") as inputfile:
+            magic, self.size, self.hashes = BLOOM_HEADER.unpack(inputfile.read(BLOOM_HEADER.size))
+            if magic != BLOOM_MAGIC:
+                raise ValueError(f"not a Bloom filter file: {self.filename}")
+            self.offset = BLOOM_HEADER.size
+            self.data = mmap.mmap(inputfile.fileno(), 0)
+
+    def __getstate__(self) -> dict[str, Any]:
+        # memory maps cannot be pickled, they are reopened in each process
+        state: dict[str, Any] = {"filename": self.filename, "hashes": self.hashes, "size": self.size}
+        if self.filename is None:
+            state["data"] = self.data
+        return state
+
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        self.filename, self.hashes, self.size = state["filename"], state["hashes"], state["size"]
+        self._open()
+        if "data" in state:
+            self.data = state["data"]
+
+    def _positions(self, key: str) -> list[int]:
+        "Derive the counter positions from two 64-bit hashes (double hashing)."
+        digest = blake2b(key.encode("utf-8", "replace"), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], "big"), int.from_bytes(digest[8:], "big") | 1
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+    def _read(self, position: int) -> int:
+        return (self.data[self.offset + (position >> 1)] >> ((position & 1) * 4)) & 15
+
+    def _write(self, position: int, value: int) -> None:
+        index, shift = self.offset + (position >> 1), (position & 1) * 4
+        self.data[index] = (self.data[index] & ~(15 << shift) & 255) | (value << shift)
+
+    def get(self, key: str) -> Any:
+        "Estimate how often the key has been stored, -1 if it is absent."
+        count = min(self._read(position) for position in self._positions(key))
+        return count or -1
+
+    def put(self, key: str, value: int) -> None:
+        "Store a given key and its count (at most 15) with a conservative update."
+        value = max(0, min(value, 15))
+        for position in self._positions(key):
+            if self._read(position) < value:
+                self._write(position, value)
+
+    def increment(self, key: str) -> int:
+        "Add one to the estimated count of the key (at most 15) and return the new count."
+        positions = self._positions(key)
+        value = min(15, min(self._read(position) for position in positions) + 1)
+        for position in positions:
+            if self._read(position) < value:
+                self._write(position, value)
+        return value
+
+    def clear(self) -> None:
+        "Reset all counters."
+        self.data[self.offset :] = bytes(len(self.data) - self.offset)
+
+    def merge(self, other: "BloomFilter") -> None:
+        "Add the counts of another filter with the same parameters, e.g. from a sharded run."
+        if (self.size, self.hashes) != (other.size, other.hashes):
+            raise ValueError("cannot merge Bloom filters with different parameters")
+        length = (self.size + 1) // 2
+        for start in range(0, length, BLOOM_CHUNK):
+            end = min(start + BLOOM_CHUNK, length)
+            mine = self.data[self.offset + start : self.offset + end]
+            theirs = other.data[other.offset + start : other.offset + end]
+            self.data[self.offset + start : self.offset + end] = _add_nibbles(mine, theirs)
+
+    def flush(self) -> None:
+        "Write the changes to disk if the filter is memory-mapped."
+        if isinstance(self.data, mmap.mmap):
+            self.data.flush()
+
+    def close(self) -> None:
+        "Write the changes to disk and release the memory map if there is one."
+        if isinstance(self.data, mmap.mmap) and not self.data.closed:
+            self.data.flush()
+            self.data.close()
+
+    def __enter__(self) -> "Self":
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self.close()
+
+
+def _add_nibbles(first: bytes | bytearray, second: bytes | bytearray) -> bytes:
+    "Add two sequences of 4-bit counters pairwise and saturate the sums at 15."
+    length = len(first)
+    low_mask, carry_mask = int.from_bytes(b"\x0f" * length, "little"), int.from_bytes(b"\x10" * length, "little")
+    mine, theirs = int.from_bytes(first, "little"), int.from_bytes(second, "little")
+    result = 0
+    # low and high halves of each byte are added separately in 8-bit lanes,
+    # a sum above 15 sets the fifth bit of its lane and is replaced by 15
+    for shift in (0, 4):
+        total = ((mine >> shift) & low_mask) + ((theirs >> shift) & low_mask)
+        total = (total | ((total & carry_mask) >> 4) * 15) & low_mask
+        result |= total << shift
+    return result.to_bytes(length, "little")
+
+
+LRU_TEST: LRUCache | SQLiteCache | ClockCache | BloomFilter = LRUCache(maxsize=LRU_SIZE)
+
+
+def clear_dedup_cache() -> None:
+    """Empty the deduplication cache if it is held in memory, stores
+    which persist on disk are kept (SQLite database or mapped Bloom filter)."""
+    if isinstance(LRU_TEST, SQLiteCache) or (isinstance(LRU_TEST, BloomFilter) and LRU_TEST.filename):
+        return
+    LRU_TEST.clear()
+
+
+def use_compact_cache(maxsize: int = LRU_SIZE, threadsafe: bool = True) -> None:
+    """Replace the LRU cache by a compact hash-keyed cache, which allows for
+    much larger capacities (e.g. millions of segments) with bounded memory."""
+    global LRU_TEST
+    LRU_TEST = ClockCache(maxsize, threadsafe)
+
+
+def use_bloom_filter(capacity: int = 10**6, error_rate: float = 0.001, filename: str | None = None) -> None:
+    """Replace the LRU cache by a Bloom filter which keeps track of all segments
+    seen in a corpus with bounded memory, persisted in a file if given."""
+    global LRU_TEST
+    LRU_TEST = BloomFilter(capacity, error_rate, filename)
+
+
+def use_shared_store(filename: str) -> None:
+    """Replace the per-process LRU cache by a store which persists on disk
+    and is shared by all processes using the same file."""
+    global LRU_TEST
+    LRU_TEST = SQLiteCache(filename)
+
+
+def put_in_cache(teststring: str) -> int:
+    "Implement LRU cache, return how often the string has been seen including this time."
+    # a single call so that shared stores count concurrent updates
+    return LRU_TEST.increment(teststring)
 
 
 def duplicate_test(element: _Element, options: Extractor) -> bool:
     "Check for duplicate text with LRU cache."
     teststring = trim(" ".join(element.itertext()))
     # teststring = element.text
-    if len(teststring) > options.min_duplcheck_size:
-        # retrieve value from cache
-        cacheval = LRU_TEST.get(teststring)
-        if cacheval > options.max_repetitions:  # non-existent key will return -1
-            LRU_TEST.put(teststring, cacheval + 1)
-            return True
-    put_in_cache(teststring)
-    return False
+    count = put_in_cache(teststring)
+    # compare the number of previous occurrences
+    return len(teststring) > options.min_duplcheck_size and count - 1 > options.max_repetitions
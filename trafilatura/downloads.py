@@ -7,11 +7,12 @@ import logging
 import os
 import random
 from collections.abc import Callable, Generator
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from configparser import ConfigParser
 from functools import partial
 from importlib.metadata import version
 from io import BytesIO
+from itertools import islice
 from time import sleep
 from typing import (
     Any,
@@ -28,7 +29,6 @@ from .utils import (
     URL_BLACKLIST_REGEX,
     decode_file,
     is_acceptable_length,
-    make_chunks,
 )
 
 try:
@@ -60,6 +60,9 @@ HTTP_POOL = None
 NO_CERT_POOL = None
 RETRY_STRATEGY = None
 
+# downloads in flight per thread in buffered downloads
+DOWNLOADS_PER_THREAD = 4
+
 
 def create_pool(**args: Any) -> urllib3.PoolManager | Any:
     "Configure urllib3 download pool according to user-defined settings."
@@ -238,6 +241,61 @@ def _send_urllib_request(url: str, no_ssl: bool, with_headers: bool, config: Con
     return None
 
 
+def _stream_urllib_request(url: str, no_ssl: bool, config: ConfigParser) -> Generator[bytes, None, None]:
+    "Internal function to send a request and yield the data as it comes (decoded transfer encoding)."
+    try:
+        response = _initiate_pool(config, no_ssl=no_ssl).request(
+            "GET",
+            url,
+            headers=_determine_headers(config),
+            retries=_get_retry_strategy(config),
+            preload_content=False,
+        )
+    except urllib3.exceptions.SSLError:
+        if no_ssl:
+            return
+        LOGGER.warning("retrying after SSLError: %s", url)
+        yield from _stream_urllib_request(url, True, config)
+        return
+    except (urllib3.exceptions.HTTPError, OSError) as err:
+        LOGGER.error("download error: %s %s", url, err)
+        return
+
+    try:
+        if response.status != 200:
+            LOGGER.error("not a 200 response: %s for URL %s", response.status, url)
+            return
+        size, max_file_size = 0, config.getint("DEFAULT", "MAX_FILE_SIZE")
+        for chunk in response.stream(2**17):
+            size += len(chunk)
+            if size > max_file_size:
+                LOGGER.error("MAX_FILE_SIZE exceeded: %s", url)
+                return
+            yield chunk
+    except (urllib3.exceptions.HTTPError, OSError) as err:
+        LOGGER.error("download error: %s %s", url, err)
+    finally:
+        response.release_conn()
+
+
+def fetch_stream(url: str, no_ssl: bool = False, config: ConfigParser = DEFAULT_CONFIG) -> Generator[bytes, None, None]:
+    """Download a resource chunk by chunk so that it can be processed on the fly
+    without keeping it in memory. Only uses urllib3.
+
+    Args:
+        url: URL of the resource to fetch.
+        no_ssl: Do not try to establish a secure connection (to prevent SSLError).
+        config: Pass configuration values for output control.
+
+    Returns:
+        Chunks of data as bytes, nothing in case of failed downloads and non-200 responses.
+        The download stops at MAX_FILE_SIZE.
+
+    """
+    LOGGER.debug("sending request: %s", url)
+    yield from _stream_urllib_request(url, no_ssl, config)
+
+
 def _is_suitable_response(url: str, response: Response, options: Extractor) -> bool:
     "Check if the response conforms to formal criteria."
     lentest = len(response.html or response.data or "")
@@ -401,14 +459,22 @@ def _buffered_downloads(
     bufferlist: list[str],
     download_threads: int,
     worker: Callable[[str], Any],
-    chunksize: int = 10000,  # max URLs materialized per batch (bounds in-flight futures)
+    chunksize: int | None = None,  # max URLs in flight, defaults to DOWNLOADS_PER_THREAD per thread
 ) -> Generator[tuple[str, Any], None, None]:
-    "Use a thread pool to perform a series of downloads."
+    """Use a thread pool to perform a series of downloads. New downloads are
+    only started as results are consumed, which bounds memory use and lets
+    slow consumers throttle the downloads."""
+    urls = iter(bufferlist)
     with ThreadPoolExecutor(max_workers=download_threads) as executor:
-        for chunk in make_chunks(bufferlist, chunksize):
-            future_to_url = {executor.submit(worker, url): url for url in chunk}
-            for future in as_completed(future_to_url):
-                yield future_to_url[future], future.result()
+        future_to_url = {
+            executor.submit(worker, url): url for url in islice(urls, chunksize or download_threads * DOWNLOADS_PER_THREAD)
+        }
+        while future_to_url:
+            done, _ = wait(future_to_url, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future_to_url.pop(future), future.result()
+            for url in islice(urls, len(done)):
+                future_to_url[executor.submit(worker, url)] = url
 
 
 def buffered_downloads(
@@ -426,10 +492,12 @@ def buffered_response_downloads(
     bufferlist: list[str],
     download_threads: int,
     options: Extractor | None = None,
+    decode: bool = False,
+    with_headers: bool = False,
 ) -> Generator[tuple[str, Response], None, None]:
     "Download queue consumer, returns full Response objects."
     config = options.config if options else DEFAULT_CONFIG
-    worker = partial(fetch_response, config=config)
+    worker = partial(fetch_response, decode=decode, with_headers=with_headers, config=config)
 
     return _buffered_downloads(bufferlist, download_threads, worker)
 
@@ -18,6 +18,7 @@ from .settings import (
     Document,
     Extractor,
 )
+from .sites import HostShortcuts
 from .utils import LINK_FARM_RATIO, is_image_element, textfilter, trim
 from .xml import META_ATTRIBUTES, delete_element
 
@@ -44,8 +45,11 @@ PRESERVE_IMG_CLEANING = {"figure", "picture", "source"}
 CODE_INDICATORS = ["{", '("', "('", "\n    "]
 
 
-def tree_cleaning(tree: HtmlElement, options: Extractor) -> HtmlElement:
-    "Prune the tree by discarding unwanted elements."
+def tree_cleaning(
+    tree: HtmlElement, options: Extractor, site: HostShortcuts | None = None, url: str | None = None
+) -> HtmlElement:
+    """Prune the tree by discarding unwanted elements, including the
+    blocks of the website template if information on the host and the URL are given."""
     # determine cleaning strategy, use lists to keep it deterministic
     cleaning_list, stripping_list = MANUALLY_CLEANED.copy(), MANUALLY_STRIPPED.copy()
     if not options.tables:
@@ -79,6 +83,9 @@ def tree_cleaning(tree: HtmlElement, options: Extractor) -> HtmlElement:
             for element in tree.iter(expression):
                 delete_element(element)
 
+    if site is not None and url:
+        tree = site.prune_templates(tree, url)
+
     return prune_html(tree, options.focus)
 
 
@@ -5,11 +5,12 @@ Functions related to the main Trafilatura extractor.
 
 import logging
 import re  # import regex as re
+from collections.abc import Sequence
 from copy import deepcopy
 from typing import Any
 from urllib.parse import urljoin
 
-from lxml.etree import Element, SubElement, _Element, strip_elements, strip_tags, tostring
+from lxml.etree import Element, SubElement, XPath, _Element, strip_elements, strip_tags, tostring
 from lxml.html import HtmlElement
 
 # own
@@ -21,6 +22,7 @@ from .htmlprocessing import (
     prune_unwanted_nodes,
 )
 from .settings import DEDUPE_SCAN_CAP, INLINE_CARRIED, MIN_DUPLICATE_LENGTH, TAG_CATALOG, Extractor
+from .sites import HostShortcuts
 from .utils import FORMATTING_PROTECTED, is_image_file, text_chars_test, trim
 from .xml import delete_element
 from .xpaths import (
@@ -740,7 +742,11 @@ def prune_unwanted_sections(
     return tree
 
 
-def _extract(tree: HtmlElement, options: Extractor) -> tuple[_Element, str, set[str]]:
+def _extract(
+    tree: HtmlElement, options: Extractor, expressions: Sequence[XPath] = BODY_XPATH
+) -> tuple[_Element, str, set[str], XPath | None]:
+    """Try the main text expressions in the given order and return the result
+    along with the expression which found it."""
     # init
     potential_tags = set(TAG_CATALOG)
     if options.tables is True:
@@ -750,8 +756,9 @@ def _extract(tree: HtmlElement, options: Extractor) -> tuple[_Element, str, set[
     if options.links is True:
         potential_tags.add("ref")
     result_body = Element("body")
+    winner = None
     # iterate
-    for expr in BODY_XPATH:
+    for expr in expressions:
         # select tree if the expression has been found
         subtree = next((s for s in expr(tree) if s is not None), None)
         if subtree is None:
@@ -785,19 +792,36 @@ def _extract(tree: HtmlElement, options: Extractor) -> tuple[_Element, str, set[
         # exit once there is real content, not just a lone image
         if sum(e.tag != "graphic" for e in result_body) > 1:
             LOGGER.debug(trim(str(expr)))
+            winner = expr
             break
     temp_text = " ".join(result_body.itertext()).strip()
-    return result_body, temp_text, potential_tags
+    return result_body, temp_text, potential_tags, winner
 
 
-def extract_content(cleaned_tree: HtmlElement, options: Extractor) -> tuple[_Element, str, int]:
+def extract_content(
+    cleaned_tree: HtmlElement,
+    options: Extractor,
+    site: HostShortcuts | None = None,
+    preferred: Sequence[XPath] = (),
+) -> tuple[_Element, str, int]:
     """Find the main content of a page using a set of XPath expressions,
     then extract relevant elements, strip them of unwanted subparts and
-    convert them"""
+    convert them. Expressions defined for the website and decisions taken
+    on its other pages are tried first if available."""
     # backup
     backup_tree = deepcopy(cleaned_tree)
 
-    result_body, temp_text, potential_tags = _extract(cleaned_tree, options)
+    order = site.body_order(len(BODY_XPATH)) if site is not None else range(len(BODY_XPATH))
+    expressions = [*preferred, *(BODY_XPATH[i] for i in order)]
+    result_body, temp_text, potential_tags, winner = _extract(cleaned_tree, options, expressions)
+    # shortcut taken: fall back to the whole sequence if the result is too short
+    if winner is expressions[0] is not BODY_XPATH[0] and len(temp_text) < options.min_extracted_size:
+        LOGGER.debug("site shortcut discarded: %s", options.source)
+        result_body, temp_text, potential_tags, _ = _extract(deepcopy(backup_tree), options)
+        # count as a failure of the learned expression
+        winner = None if winner not in preferred else winner
+    if site is not None and winner not in preferred:
+        site.body.record(BODY_XPATH.index(winner) if winner is not None else None)
 
     # try parsing wild <p> elements if nothing found or text too short
     # todo: test precision and recall settings here
@@ -831,13 +855,18 @@ def process_comments_node(elem: _Element, potential_tags: set[str], options: Ext
     return None
 
 
-def extract_comments(tree: HtmlElement, options: Extractor) -> tuple[_Element, str, int, HtmlElement]:
+def extract_comments(
+    tree: HtmlElement, options: Extractor, site: HostShortcuts | None = None
+) -> tuple[_Element, str, int, HtmlElement]:
     "Try to extract comments out of potential sections in the HTML."
     comments_body = Element("body")
+    winner = None
     # define iteration strategy
     potential_tags = set(TAG_CATALOG)  # 'span'
     # potential_tags.add('div') trouble with <div class="comment-author meta">
-    for expr in COMMENTS_XPATH:
+    order = site.comments_order(len(COMMENTS_XPATH)) if site is not None else range(len(COMMENTS_XPATH))
+    for index in order:
+        expr = COMMENTS_XPATH[index]
         # select tree if the expression has been found
         subtree = next((s for s in expr(tree) if s is not None), None)
         if subtree is None:
@@ -861,7 +890,10 @@ def extract_comments(tree: HtmlElement, options: Extractor) -> tuple[_Element, s
             LOGGER.debug(expr)
             # remove corresponding subtree
             delete_element(subtree, keep_tail=False)
+            winner = index
             break
+    if site is not None:
+        site.comments.record(winner)
     # lengths
     temp_comments = " ".join(comments_body.itertext()).strip()
     return comments_body, temp_comments, len(temp_comments), tree
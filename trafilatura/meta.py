@@ -3,30 +3,208 @@ Meta-functions to be applied module-wide.
 """
 
 import gc
+import logging
+import sys
+from collections.abc import Callable
+from importlib import import_module
+from itertools import islice
+from typing import Any
 
 from courlan.meta import clear_caches as reset_caches_courlan
 from htmldate.meta import reset_caches as reset_caches_htmldate
 from justext.core import define_stoplist
 
-from .deduplication import LRU_TEST, _vector_to_add, is_similar_domain
+from .deduplication import LRUCache, _token_hash, clear_dedup_cache, is_similar_domain
+from .settings import CONFIG_VALUES
+from .sites import compile_xpaths
 from .utils import line_processing, return_printables_and_spaces, trim
 
+LOGGER = logging.getLogger(__name__)
+
+# cached functions of the dependencies, not part of their API and thus optional
+EXTERNAL_CACHES = (
+    ("courlan.filters", "langcodes_score"),
+    ("htmldate.extractors", "try_date_expr"),
+    ("htmldate.validators", "_parse_and_validate"),
+    ("htmldate.validators", "filter_ymd_candidate"),
+    ("htmldate.validators", "is_valid_format"),
+)
+
+# entries measured to estimate the memory used by a cache
+SAMPLE_SIZE = 16
+# list storing an entry of LRUCache
+LINK_SIZE = sys.getsizeof([None] * 4)
+
+
+def _sample(values: Any, size: int) -> list[Any]:
+    "Take entries spread over the whole cache."
+    return list(islice(values, 0, None, max(size // SAMPLE_SIZE, 1)))
+
+
+class CacheInfo:
+    "Cache known to the registry: function decorated with lru_cache or getter of a cache object."
+
+    __slots__ = ["name", "target"]
+
+    def __init__(self, name: str, target: Callable[..., Any]) -> None:
+        self.name = name
+        self.target = target
+
+    @property
+    def is_function(self) -> bool:
+        return hasattr(self.target, "cache_info")
+
+    def stats(self) -> dict[str, Any]:
+        "Number of entries, maximum size, hits and misses (None if unknown) and estimated memory in bytes."
+        if self.is_function:
+            info = self.target.cache_info()  # type: ignore[attr-defined]
+            return {
+                "size": info.currsize,
+                "maxsize": info.maxsize,
+                "hits": info.hits,
+                "misses": info.misses,
+                "memory": _function_memory(self.target, info.currsize),
+            }
+        cache = self.target()
+        return {
+            "size": len(cache) if hasattr(cache, "__len__") else None,
+            "maxsize": getattr(cache, "maxsize", None),
+            "hits": getattr(cache, "hits", None),
+            "misses": getattr(cache, "misses", None),
+            "memory": _object_memory(cache),
+        }
+
+    def evict(self) -> None:
+        "Free memory: half of the entries for caches which allow it, all of them otherwise."
+        if self.is_function:
+            self.target.cache_clear()  # type: ignore[attr-defined]
+            return
+        cache = self.target()
+        if isinstance(cache, LRUCache) and len(cache) > 1:
+            cache.shrink(len(cache) // 2)
+        else:
+            cache.clear()
+
+    def clear(self) -> None:
+        "Delete all entries."
+        if self.is_function:
+            self.target.cache_clear()  # type: ignore[attr-defined]
+        else:
+            self.target().clear()
+
+
+CACHES: dict[str, CacheInfo] = {}
+
+
+def register_cache(name: str, target: Callable[..., Any]) -> None:
+    """Make a cache known to the registry: either a function decorated with lru_cache
+    or a function returning an object with a clear() method (e.g. a module global
+    which may be replaced)."""
+    CACHES[name] = CacheInfo(name, target)
+
+
+def _register_external_cache(module_name: str, name: str) -> bool:
+    "Register a cached function of another package if it can be found, return False otherwise."
+    try:
+        func = getattr(import_module(module_name), name, None)
+    except ImportError:
+        func = None
+    if func is None or not hasattr(func, "cache_info"):
+        LOGGER.debug("cache not found: %s.%s", module_name, name)
+        return False
+    register_cache(f"{module_name.split('.')[0]}.{name}", func)
+    return True
+
+
+def _entries_memory(entries: list[Any]) -> float:
+    "Mean size of the sampled entries and of the objects they reference."
+    if not entries:
+        return 0.0
+    return sum(sys.getsizeof(e) + sum(sys.getsizeof(r) for r in gc.get_referents(e)) for e in entries) / len(entries)
+
+
+def _function_memory(func: Callable[..., Any], size: int) -> int:
+    "Estimate the memory used by the cache of a function decorated with lru_cache."
+    # the cache dictionary of the C implementation is only reachable this way
+    tables = [r for r in gc.get_referents(func) if isinstance(r, dict) and r is not getattr(func, "__dict__", None)]
+    if not tables:
+        return 0
+    try:
+        sample = _sample(tables[0].values(), size)
+    except RuntimeError:  # changed by another thread
+        return sys.getsizeof(tables[0])
+    return int(sys.getsizeof(tables[0]) + size * _entries_memory(sample))
+
+
+def _object_memory(cache: Any) -> int:
+    "Estimate the memory used by a cache object."
+    if isinstance(cache, LRUCache):
+        with cache.lock:
+            size = len(cache)
+            sample = [link[2:] for link in _sample(cache.cache.values(), size)]
+        return int(sys.getsizeof(cache.cache) + size * (_entries_memory(sample) + LINK_SIZE))
+    # arrays and tables of fixed-size caches
+    slots = getattr(type(cache), "__slots__", ())
+    return sum(sys.getsizeof(getattr(cache, s)) for s in slots if hasattr(cache, s)) or sys.getsizeof(cache)
+
+
+def cache_report() -> dict[str, dict[str, Any]]:
+    "Return the figures of all registered caches."
+    return {name: cache.stats() for name, cache in CACHES.items()}
+
+
+def _value(stats: dict[str, Any]) -> float:
+    "Hits per byte: caches which save little work for their size are evicted first."
+    return (stats["hits"] or 0) / max(stats["memory"], 1)
+
+
+def trim_caches(budget: int) -> int:
+    """Keep the estimated memory used by the caches under the budget (in bytes)
+    by evicting the least valuable caches first, one after the other, instead of
+    emptying all of them. Return the estimated number of bytes freed."""
+    report = cache_report()
+    total = sum(stats["memory"] for stats in report.values())
+    freed = 0
+    for name in sorted(report, key=lambda n: _value(report[n])):
+        if total - freed <= budget:
+            break
+        if not report[name]["size"]:
+            continue
+        CACHES[name].evict()
+        after = CACHES[name].stats()["memory"]
+        freed += report[name]["memory"] - after
+        LOGGER.debug("cache evicted: %s (%s bytes)", name, report[name]["memory"] - after)
+    return freed
+
 
 def reset_caches() -> None:
     """Reset all known LRU caches used to speed up processing.
     This may release some memory."""
-    # justext
-    define_stoplist.cache_clear()
+    for cache in CACHES.values():
+        cache.clear()
+    # deduplication state, not part of the registry so that it is never evicted
+    clear_dedup_cache()
     # handles htmldate and charset_normalizer
     reset_caches_htmldate()
     # courlan
     reset_caches_courlan()
-    # own
-    is_similar_domain.cache_clear()
-    line_processing.cache_clear()
-    return_printables_and_spaces.cache_clear()
-    trim.cache_clear()
-    LRU_TEST.clear()
-    _vector_to_add.cache_clear()
     # garbage collection
     gc.collect()
+
+
+# justext
+register_cache("define_stoplist", define_stoplist)
+# htmldate and courlan
+for _module_name, _name in EXTERNAL_CACHES:
+    _register_external_cache(_module_name, _name)
+# own
+for _cached in (
+    is_similar_domain,
+    line_processing,
+    return_printables_and_spaces,
+    trim,
+    _token_hash,
+    compile_xpaths,
+):
+    register_cache(_cached.__name__, _cached)
+register_cache("config_values", lambda: CONFIG_VALUES)
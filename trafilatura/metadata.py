@@ -5,6 +5,8 @@ Module bundling all functions needed to scrape metadata from webpages.
 import json
 import logging
 import re
+from collections.abc import Mapping
+from collections.abc import Set as AbstractSet
 from copy import deepcopy
 from html import unescape
 from typing import Any
@@ -28,7 +30,7 @@ from .json_metadata import (
     normalize_json,
 )
 from .settings import Document, set_date_params
-from .utils import HTML_STRIP_TAGS, line_processing, load_html, trim
+from .utils import HTML_STRIP_TAGS, line_processing, load_html, load_html_head, trim
 from .xpaths import (
     AUTHOR_DISCARD_XPATHS,
     AUTHOR_XPATHS,
@@ -145,6 +147,9 @@ OG_PROPERTIES = {
 
 OG_AUTHOR = {"og:author", "og:article:author"}
 
+# fields that have to be found in the <head> for a head-only extraction to be complete
+HEAD_REQUIRED_FIELDS = ("title", "url", "date")
+
 URL_SELECTORS = ['.//head//link[@rel="canonical"]', ".//head//base", './/head//link[@rel="alternate"][@hreflang="x-default"]']
 
 
@@ -157,7 +162,7 @@ def normalize_tags(tags: str) -> str:
     return ", ".join(filter(None, tags.split(", ")))
 
 
-def check_authors(authors: str, author_blacklist: set[str]) -> str | None:
+def check_authors(authors: str, author_blacklist: AbstractSet[str]) -> str | None:
     "Check if the authors string correspond to expected values."
     author_blacklist = {a.lower() for a in author_blacklist}
     new_authors = [author.strip() for author in authors.split(";") if author.strip().lower() not in author_blacklist]
@@ -456,35 +461,13 @@ def extract_license(tree: HtmlElement) -> str | None:
     return None
 
 
-def extract_metadata(
-    filecontent: HtmlElement | str,
-    default_url: str | None = None,
-    date_config: dict[str, Any] | None = None,
-    extensive: bool = True,
-    author_blacklist: set[str] | None = None,
+def _extract_metadata_from_tree(
+    tree: HtmlElement,
+    default_url: str | None,
+    date_config: dict[str, Any],
+    author_blacklist: AbstractSet[str],
 ) -> Document:
-    """Main process for metadata extraction.
-
-    Args:
-        filecontent: HTML code as string or parsed tree.
-        default_url: Previously known URL of the downloaded document.
-        date_config: Provide extraction parameters to htmldate as dict().
-        extensive: Use extensive search for date extraction.
-        author_blacklist: Provide a blacklist of Author Names as set() to filter out authors.
-
-    Returns:
-        A trafilatura.settings.Document containing the extracted metadata information.
-        The Document class has .as_dict() method that will return a copy as a dict.
-    """
-    # init
-    author_blacklist = author_blacklist or set()
-    date_config = {**date_config} if date_config else set_date_params(extensive)
-
-    # load contents
-    tree = load_html(filecontent)
-    if tree is None:
-        return Document()
-
+    "Run the metadata extraction cascade on a parsed tree."
     # initialize dict and try to strip meta tags
     metadata = examine_meta(tree)
 
@@ -561,3 +544,49 @@ def extract_metadata(
     metadata.clean_and_trim()
 
     return metadata
+
+
+def extract_metadata(
+    filecontent: HtmlElement | str,
+    default_url: str | None = None,
+    date_config: Mapping[str, Any] | None = None,
+    extensive: bool = True,
+    author_blacklist: AbstractSet[str] | None = None,
+    head_only: bool = False,
+) -> Document:
+    """Main process for metadata extraction.
+
+    Args:
+        filecontent: HTML code as string or parsed tree.
+        default_url: Previously known URL of the downloaded document.
+        date_config: Provide extraction parameters to htmldate as dict().
+        extensive: Use extensive search for date extraction.
+        author_blacklist: Provide a blacklist of Author Names as set() to filter out authors.
+        head_only: Only parse the <head> section of the document and resort to
+            the whole document if one of the essential fields (title, URL, date) is missing.
+            Faster for metadata-only workloads, results can differ slightly
+            since body-level markup (e.g. <h1> titles) is not considered first.
+
+    Returns:
+        A trafilatura.settings.Document containing the extracted metadata information.
+        The Document class has .as_dict() method that will return a copy as a dict.
+    """
+    # init
+    author_blacklist = author_blacklist or set()
+    date_config = {**date_config} if date_config else set_date_params(extensive)
+
+    # try a cheap prefix parse first
+    if head_only:
+        head_tree = load_html_head(filecontent)
+        if head_tree is not None:
+            metadata = _extract_metadata_from_tree(head_tree, default_url, {**date_config}, author_blacklist)
+            if all(getattr(metadata, field) for field in HEAD_REQUIRED_FIELDS):
+                return metadata
+            LOGGER.debug("incomplete metadata in head, parsing the whole document: %s", default_url)
+
+    # load contents
+    tree = load_html(filecontent)
+    if tree is None:
+        return Document()
+
+    return _extract_metadata_from_tree(tree, default_url, date_config, author_blacklist)
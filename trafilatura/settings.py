@@ -6,10 +6,16 @@ Listing a series of settings that are applied module-wide.
 import argparse
 import logging
 import os
+from collections.abc import Mapping
+from collections.abc import Set as AbstractSet
 from configparser import ConfigParser
+from copy import copy
 from datetime import datetime
+from functools import lru_cache
+from hashlib import blake2b
 from html import unescape
 from pathlib import Path
+from types import MappingProxyType
 from typing import Any
 
 from lxml.etree import Element, XPath, _Element
@@ -66,9 +72,64 @@ def _get_optional_int(config: ConfigParser, option: str) -> int | None:
     return int(value) if value.isdigit() else None
 
 
+def _config_items(config: ConfigParser) -> tuple[tuple[str, tuple[tuple[str, str], ...]], ...]:
+    "Raw values of all sections of a configuration, as a hashable tuple."
+    return ((config.default_section, tuple(sorted(config.defaults().items()))),) + tuple(
+        (section, tuple(sorted(config.items(section, raw=True)))) for section in config.sections()
+    )
+
+
+# values of the configurations passed to get_extractor(), by object
+CONFIG_VALUES: dict[int, tuple[ConfigParser, tuple[tuple[str, tuple[tuple[str, str], ...]], ...]]] = {}
+CONFIG_VALUES_SIZE = 16
+
+
+def _config_values(config: ConfigParser) -> tuple[tuple[str, tuple[tuple[str, str], ...]], ...]:
+    "Raw values of a configuration, only read the first time this object is used."
+    entry = CONFIG_VALUES.get(id(config))
+    # the reference kept in the entry prevents the identifier from being reused
+    if entry is None or entry[0] is not config:
+        if len(CONFIG_VALUES) >= CONFIG_VALUES_SIZE:
+            CONFIG_VALUES.clear()
+        entry = CONFIG_VALUES[id(config)] = (config, _config_items(config))
+    return entry[1]
+
+
+@lru_cache(maxsize=16)
+def _config_from_items(items: tuple[tuple[str, tuple[tuple[str, str], ...]], ...]) -> ConfigParser:
+    "Rebuild a configuration from its values, shared by all the options using it."
+    config = ConfigParser()
+    config.read_dict({section: dict(values) for section, values in items})
+    return config
+
+
+@lru_cache(maxsize=16)
+def _read_config(filename: str, mtime: float) -> ConfigParser:
+    "Read a settings file once as long as it is not modified."
+    return use_config(filename=filename)
+
+
+def load_config(filename: str | None = None) -> ConfigParser:
+    """Return the configuration of a settings file without parsing it again on each call.
+    The object is shared and must not be modified, see use_config() for a new one."""
+    if filename is None:
+        return DEFAULT_CONFIG
+    try:
+        mtime = os.stat(filename).st_mtime
+    except OSError:
+        mtime = 0.0
+    return _read_config(filename, mtime)
+
+
+# per-document fields, not part of the shared options
+DOCUMENT_FIELDS = {"source", "url"}
+
+
 # todo Python >= 3.10: use dataclass with slots=True
 class Extractor:
-    "Defines a class to store all extraction options."
+    """Defines a class to store all extraction options.
+    Frozen instances (see freeze() and get_extractor()) can be shared and used as keys,
+    the fields of each document are then set on a copy with for_document()."""
 
     __slots__ = [
         "config",
@@ -83,6 +144,7 @@ class Extractor:
         "tables",
         "dedup",
         "lang",
+        "adaptive",
         # extraction size
         "min_extracted_size",
         "min_output_size",
@@ -104,6 +166,9 @@ class Extractor:
         "date_params",
         "author_blacklist",
         "url_blacklist",
+        # state
+        "_fingerprint",
+        "_frozen",
     ]
 
     # set by _add_config via CONFIG_MAPPING
@@ -131,6 +196,7 @@ class Extractor:
         tables: bool = True,
         dedup: bool = False,
         lang: str | None = None,
+        adaptive: bool = False,
         url: str | None = None,
         source: str | None = None,
         with_metadata: bool = False,
@@ -160,18 +226,118 @@ class Extractor:
         self.tables: bool = tables
         self.dedup: bool = dedup
         self.lang: str | None = lang
+        self.adaptive: bool = adaptive
         self.url: str | None = url
         self.only_with_metadata: bool = only_with_metadata
         self.tei_validation: bool = tei_validation
-        self.author_blacklist: set[str] = author_blacklist or set()
-        self.url_blacklist: set[str] = url_blacklist or set()
+        self.author_blacklist: AbstractSet[str] = author_blacklist or set()
+        self.url_blacklist: AbstractSet[str] = url_blacklist or set()
         self.with_metadata: bool = (
             with_metadata or only_with_metadata or bool(url_blacklist) or bool(author_blacklist) or output_format == "xmltei"
         )
-        self.date_params: dict[str, Any] = date_params or set_date_params(
+        self.date_params: Mapping[str, Any] = date_params or set_date_params(
             self.config.getboolean("DEFAULT", "EXTENSIVE_DATE_SEARCH")
         )
         self.max_tree_size: int | None = _get_optional_int(self.config, "MAX_TREE_SIZE")
+        self._fingerprint: str | None = None
+        self._frozen = False
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        if getattr(self, "_frozen", False):
+            raise AttributeError(f"frozen extraction options, use for_document() or a copy to change {name}")
+        object.__setattr__(self, name, value)
+
+    def __copy__(self) -> "Extractor":
+        "Shallow copy which can be modified, the date parameters and blacklists are copied as well."
+        options = Extractor.__new__(Extractor)
+        for slot in OPTION_FIELDS:
+            object.__setattr__(options, slot, getattr(self, slot))
+        options._fingerprint = None
+        options._frozen = False
+        options.date_params = dict(self.date_params)
+        options.author_blacklist = set(self.author_blacklist)
+        options.url_blacklist = set(self.url_blacklist)
+        return options
+
+    def __getstate__(self) -> dict[str, Any]:
+        "Pickle the values of the configuration instead of the parser."
+        state = {slot: getattr(self, slot) for slot in self.__slots__}
+        state["config"] = _config_items(self.config)
+        state["date_params"] = dict(self.date_params)
+        return state
+
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        for slot, value in state.items():
+            object.__setattr__(self, slot, _config_from_items(value) if slot == "config" else value)
+        if self._frozen:
+            self._freeze_values()
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Extractor):
+            return NotImplemented
+        return self is other or self._key() == other._key()
+
+    def __hash__(self) -> int:
+        # equal options have to hash alike, which is only possible once they cannot change
+        if not self._frozen:
+            raise TypeError("unhashable extraction options, use freeze() or get_extractor()")
+        return hash(self.fingerprint)
+
+    def _key(self) -> tuple[Any, ...]:
+        "Values describing the extraction, without the fields of the document."
+        values: list[tuple[str, Any]] = []
+        for slot in OPTION_FIELDS:
+            if slot in DOCUMENT_FIELDS:
+                continue
+            value = getattr(self, slot)
+            if slot == "config":
+                value = _config_items(value)
+            elif isinstance(value, AbstractSet):
+                value = tuple(sorted(value))
+            elif isinstance(value, Mapping):
+                value = tuple(sorted((k, str(v)) for k, v in value.items()))
+            values.append((slot, value))
+        return tuple(values)
+
+    @property
+    def fingerprint(self) -> str:
+        "Digest of the options, identical across processes and runs."
+        if self._fingerprint is not None:
+            return self._fingerprint
+        fingerprint = blake2b(repr(self._key()).encode("utf-8"), digest_size=16).hexdigest()
+        if self._frozen:
+            object.__setattr__(self, "_fingerprint", fingerprint)
+        return fingerprint
+
+    @property
+    def frozen(self) -> bool:
+        "Whether the options can be modified."
+        return self._frozen
+
+    def freeze(self) -> "Extractor":
+        "Prevent further changes so that the options can be shared and hashed, return them."
+        if not self._frozen:
+            self._freeze_values()
+            object.__setattr__(self, "_fingerprint", None)
+            object.__setattr__(self, "_frozen", True)
+        return self
+
+    def _freeze_values(self) -> None:
+        "Replace the mutable containers by read-only ones."
+        object.__setattr__(self, "date_params", MappingProxyType(dict(self.date_params)))
+        object.__setattr__(self, "author_blacklist", frozenset(self.author_blacklist))
+        object.__setattr__(self, "url_blacklist", frozenset(self.url_blacklist))
+
+    def for_document(self, url: str | None = None, source: str | None = None, max_date: str | None = None) -> "Extractor":
+        "Return a copy of the options along with the fields of a single document."
+        options = copy(self)
+        if url is not None:
+            options.url = url
+        if url is not None or source is not None:
+            options._set_source(None, source or url)
+        if max_date is not None:
+            options.date_params = {**options.date_params, "max_date": max_date}
+        return options
 
     def _set_source(self, url: str | None, source: str | None) -> None:
         "Set the source attribute in a robust way."
@@ -191,10 +357,49 @@ class Extractor:
         self.config = config
 
 
+# copied and compared, the other slots hold the state of the object
+OPTION_FIELDS = tuple(slot for slot in Extractor.__slots__ if not slot.startswith("_"))
+
+
+@lru_cache(maxsize=64)
+def _cached_extractor(config: tuple[Any, ...], params: tuple[tuple[str, Any], ...], day: str) -> Extractor:
+    "Build frozen options once per configuration, parameters and day (for the default date parameters)."
+    kwargs = dict(params)
+    for key in ("author_blacklist", "url_blacklist"):
+        if kwargs.get(key) is not None:
+            kwargs[key] = set(kwargs[key])
+    if kwargs.get("date_params") is not None:
+        kwargs["date_params"] = dict(kwargs["date_params"])
+    return Extractor(config=_config_from_items(config), **kwargs).freeze()
+
+
+def get_extractor(
+    *, config: ConfigParser | None = None, url: str | None = None, source: str | None = None, **kwargs: Any
+) -> Extractor:
+    """Return shared and frozen extraction options for the given parameters (see Extractor),
+    only built once. The fields of a document (url, source) are set on a copy.
+    A configuration object is only read the first time it is passed, it must not
+    be modified afterwards (see use_config() for a new one)."""
+    params = []
+    for key, value in sorted(kwargs.items()):
+        if isinstance(value, (set, frozenset)):
+            value = frozenset(value)
+        elif isinstance(value, dict):
+            value = tuple(sorted(value.items()))
+        params.append((key, value))
+    try:
+        options = _cached_extractor(
+            _config_values(config or DEFAULT_CONFIG), tuple(params), datetime.now().strftime("%Y-%m-%d")
+        )
+    except TypeError:  # unhashable values
+        options = Extractor(config=config or DEFAULT_CONFIG, **kwargs).freeze()
+    return options.for_document(url, source) if url or source else options
+
+
 def args_to_extractor(args: argparse.Namespace, url: str | None = None) -> Extractor:
     "Derive extractor configuration from CLI args."
-    return Extractor(
-        config=use_config(filename=args.config_file),
+    return get_extractor(
+        config=load_config(args.config_file),
         output_format=args.output_format,
         fast=args.fast,
         formatting=args.formatting,
@@ -206,11 +411,11 @@ def args_to_extractor(args: argparse.Namespace, url: str | None = None) -> Extra
         links=args.links,
         dedup=args.deduplicate,
         lang=args.target_language,
-        url=url,
+        adaptive=args.adaptive,
         with_metadata=args.with_metadata,
         only_with_metadata=args.only_with_metadata,
         tei_validation=args.validate_tei,
-    )
+    ).for_document(url)
 
 
 def set_date_params(extensive: bool = True) -> dict[str, Any]:
@@ -0,0 +1,181 @@
+"""
+Output sinks gathering many extracted documents in a few files.
+"""
+
+import gzip
+import logging
+import re
+from io import BufferedIOBase
+from os import listdir, makedirs, path, remove, truncate
+from typing import IO, TYPE_CHECKING, Any
+
+from .utils import HAS_ZSTD
+
+if TYPE_CHECKING:  # pragma: no cover
+    from typing_extensions import Self
+
+if HAS_ZSTD:
+    import zstandard
+
+LOGGER = logging.getLogger(__name__)
+
+# file extension, beginning and end of a shard for each output format
+SHARD_FORMATS = {
+    "csv": (
+        ".csv",
+        "url\tid\tfingerprint\thostname\ttitle\timage\tdate\ttext\tcomments\tlicense\tpagetype\r\n",
+        "",
+    ),
+    "json": (".jsonl", "", ""),
+    "xml": (".xml", '<?xml version="1.0" encoding="utf-8"?>\n<collection>\n', "</collection>\n"),
+    "xmltei": (".xml", '<?xml version="1.0" encoding="utf-8"?>\n<collection>\n', "</collection>\n"),
+}
+COMPRESSION_EXTENSIONS = {None: "", "gzip": ".gz", "zstd": ".zst"}
+
+# 100 MB of uncompressed data per shard by default
+SHARD_SIZE = 100 * 2**20
+
+
+class ShardWriter:
+    """Append records to shard files which are rotated once they reach a given
+    size (in uncompressed bytes), optionally with gzip or zstd compression.
+    Each record is listed in a tab-separated index file along with its shard,
+    its offset and its length in the uncompressed stream."""
+
+    __slots__ = [
+        "compression",
+        "directory",
+        "footer",
+        "header",
+        "index",
+        "number",
+        "offset",
+        "output_format",
+        "prefix",
+        "raw",
+        "shard",
+        "shard_size",
+        "stream",
+    ]
+
+    def __init__(
+        self,
+        directory: str,
+        output_format: str = "json",
+        shard_size: int = SHARD_SIZE,
+        compression: str | None = None,
+        prefix: str = "shard",
+    ) -> None:
+        if output_format not in SHARD_FORMATS:
+            raise ValueError(f"unsupported format for shards: {output_format}")
+        if compression not in COMPRESSION_EXTENSIONS:
+            raise ValueError(f"unknown compression: {compression}")
+        if compression == "zstd" and not HAS_ZSTD:
+            raise ValueError("zstd compression requires the zstandard package")
+        self.directory = directory
+        self.output_format = output_format
+        self.shard_size = shard_size
+        self.compression = compression
+        self.prefix = prefix
+        _, self.header, self.footer = SHARD_FORMATS[output_format]
+        makedirs(directory, exist_ok=True)
+        # never overwrite the shards of a previous run
+        self.number = sum(1 for f in listdir(directory) if f.startswith(prefix + "-") and f != self._index_name())
+        self.index = open(path.join(directory, self._index_name()), "a", encoding="utf-8")  # noqa: SIM115  # closed in close()
+        self.raw: IO[bytes] | None = None
+        self.stream: Any = None
+        self.shard = ""
+        self.offset = 0
+
+    def _index_name(self) -> str:
+        return f"{self.prefix}-index.tsv"
+
+    def _open(self) -> None:
+        "Start a new shard."
+        extension = SHARD_FORMATS[self.output_format][0] + COMPRESSION_EXTENSIONS[self.compression]
+        self.shard = f"{self.prefix}-{self.number:05d}{extension}"
+        self.number += 1
+        self.raw = open(path.join(self.directory, self.shard), "wb")  # noqa: SIM115  # closed with the shard
+        if self.compression == "gzip":
+            self.stream = gzip.GzipFile(fileobj=self.raw, mode="wb")
+        elif self.compression == "zstd":
+            self.stream = zstandard.ZstdCompressor().stream_writer(self.raw, closefd=False)
+        else:
+            self.stream = self.raw
+        self.offset = 0
+        self._write(self.header.encode("utf-8"))
+
+    def _write(self, data: bytes) -> None:
+        self.stream.write(data)
+        self.offset += len(data)
+
+    def _close_shard(self) -> None:
+        "Finish the current shard."
+        if self.stream is None:
+            return
+        self._write(self.footer.encode("utf-8"))
+        if self.stream is not self.raw:
+            self.stream.close()
+        if self.raw is not None:
+            self.raw.close()
+        self.stream = self.raw = None
+
+    def write(self, record: str, key: str = "") -> tuple[str, int]:
+        "Append a record and return the shard and the offset where it has been written."
+        if self.stream is None or self.offset >= self.shard_size:
+            self._close_shard()
+            self._open()
+        if not record.endswith("\n"):
+            record += "\n"
+        data = record.encode("utf-8")
+        offset = self.offset
+        self._write(data)
+        key = key.replace("\t", " ").replace("\n", " ")
+        self.index.write(f"{key}\t{self.shard}\t{offset}\t{len(data)}\n")
+        return self.shard, offset
+
+    def checkpoint(self) -> dict[str, int]:
+        "Finish the current shard and return the position to roll back to if the run is resumed."
+        self._close_shard()
+        self.index.flush()
+        return {"number": self.number, "index": self.index.tell()}
+
+    def rollback(self, state: dict[str, int]) -> None:
+        "Delete the shards and index entries written after a checkpoint."
+        self._close_shard()
+        pattern = re.compile(rf"{re.escape(self.prefix)}-(\d+)\.")
+        for filename in listdir(self.directory):
+            if (match := pattern.match(filename)) and int(match[1]) >= state["number"]:
+                remove(path.join(self.directory, filename))
+        self.index.close()
+        index_path = path.join(self.directory, self._index_name())
+        truncate(index_path, state["index"])
+        self.index = open(index_path, "a", encoding="utf-8")  # noqa: SIM115  # closed in close()
+        self.number = state["number"]
+
+    def close(self) -> None:
+        "Finish the current shard and the index."
+        self._close_shard()
+        self.index.close()
+
+    def __enter__(self) -> "Self":
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self.close()
+
+
+def read_record(filename: str, offset: int, length: int) -> str:
+    "Read a record from a shard using the information in the index."
+    if filename.endswith(".gz"):
+        stream: BufferedIOBase | IO[bytes] = gzip.open(filename, "rb")  # noqa: SIM115  # see below
+    elif filename.endswith(".zst"):
+        if not HAS_ZSTD:
+            raise ValueError("zstd compression requires the zstandard package")
+        stream = zstandard.ZstdDecompressor().stream_reader(open(filename, "rb"), closefd=True)  # noqa: SIM115
+    else:
+        stream = open(filename, "rb")  # noqa: SIM115
+    with stream:
+        # forward seeks in compressed streams are performed by decompression
+        stream.seek(offset)
+        return stream.read(length).decode("utf-8")
@@ -2,12 +2,20 @@
 Deriving link info from sitemaps.
 """
 
+import json
 import logging
 import re
-from collections.abc import Callable
-from itertools import islice
+import zlib
+from codecs import getincrementaldecoder, lookup
+from collections import deque
+from collections.abc import Callable, Generator, Iterable, Iterator
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from datetime import datetime, timezone
+from heapq import heappop, heappush
+from itertools import chain, count, islice
+from os import path, replace
 from re import Pattern
-from time import sleep
+from time import monotonic, sleep
 
 from courlan import (
     clean_url,
@@ -17,16 +25,15 @@ from courlan import (
     get_hostinfo,
     lang_filter,
 )
+from lxml.etree import XMLPullParser, XMLSyntaxError
 
 from .deduplication import is_similar_domain
-from .downloads import fetch_url, is_live_page
+from .downloads import fetch_stream, fetch_url, is_live_page
 from .settings import MAX_LINKS, MAX_SITEMAPS_SEEN
+from .utils import detect_encoding
 
 LOGGER = logging.getLogger(__name__)
 
-LINK_REGEX = re.compile(r"<loc>(?:<!\[CDATA\[)?(http.+?)(?:\]\]>)?</loc>")
-XHTML_REGEX = re.compile(r"<xhtml:link.+?>", re.DOTALL)
-HREFLANG_REGEX = re.compile(r'href=["\'](.+?)["\']')
 WHITELISTED_PLATFORMS = re.compile(
     r"(?:blogger|blogpost|ghost|hubspot|livejournal|medium|typepad|squarespace|tumblr|weebly|wix|wordpress)\."
 )
@@ -36,6 +43,17 @@ DETECT_SITEMAP_LINK = re.compile(r"\.xml(\..{2,4})?$|\.xml[?#]")
 DETECT_LINKS = re.compile(r'https?://[^\s<"]+')
 SCRUB_REGEX = re.compile(r"\?.*$|#.*$")
 POTENTIAL_SITEMAP = re.compile(r"\.xml\b")  # |\bsitemap\b
+# W3C datetime: year, month and day are optional
+LASTMOD_PARTIAL = re.compile(r"^\d{4}(?:-\d{2})?$")
+
+# bytes needed to determine the format of a sitemap
+PEEK_SIZE = 512
+# bytes used to guess the encoding of TXT sitemaps
+ENCODING_SAMPLE = 2**16
+# maximum size of a decompressed chunk
+CHUNK_SIZE = 2**17
+# characters ending links in TXT sitemaps, see DETECT_LINKS
+LINK_SEPARATORS = (" ", "\t", "\r", "\n", "<", '"')
 
 GUESSES = [
     "sitemap.xml",
@@ -55,7 +73,9 @@ class SitemapObject:
         "current_url",
         "domain",
         "external",
+        "queued",
         "seen",
+        "since",
         "sitemap_urls",
         "target_lang",
         "urls",
@@ -68,6 +88,7 @@ class SitemapObject:
         sitemapsurls: list[str],
         target_lang: str | None = None,
         external: bool = False,
+        since: datetime | None = None,
     ) -> None:
         self.base_url: str = base_url
         self.content: str = ""
@@ -75,15 +96,33 @@ class SitemapObject:
         self.external: bool = external
         self.current_url: str = ""
         self.seen: set[str] = set()
-        self.sitemap_urls: list[str] = sitemapsurls
+        # skip entries (sitemaps and pages) last modified before this date
+        self.since: datetime | None = _as_utc(since) if since else None
+        # frontier: sitemaps to visit, in a queue and in a set for lookups
+        self.sitemap_urls: deque[str] = deque()
+        self.queued: set[str] = set()
         self.target_lang: str | None = target_lang
         self.urls: list[str] = []
-
-    def fetch(self) -> None:
-        "Fetch a sitemap over the network."
+        for sitemapurl in sitemapsurls:
+            self.add_sitemap(sitemapurl)
+
+    def add_sitemap(self, url: str) -> None:
+        "Add a sitemap URL to the frontier unless it has already been seen or queued."
+        if url not in self.queued and url not in self.seen:
+            self.queued.add(url)
+            self.sitemap_urls.append(url)
+
+    def next_sitemap(self) -> str:
+        "Take the next sitemap URL from the frontier (last in, first out)."
+        url = self.sitemap_urls.pop()
+        self.queued.discard(url)
+        return url
+
+    def fetch(self) -> Iterator[bytes]:
+        "Fetch a sitemap over the network, the data is returned chunk by chunk as it comes."
         LOGGER.debug("fetching sitemap: %s", self.current_url)
-        self.content = fetch_url(self.current_url) or ""
         self.seen.add(self.current_url)
+        return fetch_stream(self.current_url)
 
     def handle_link(self, link: str) -> None:
         """Examine a link and determine if it's valid and if it leads to
@@ -109,10 +148,29 @@ class SitemapObject:
             return
 
         if DETECT_SITEMAP_LINK.search(link):
-            self.sitemap_urls.append(link)
+            self.add_sitemap(link)
         else:
             self.urls.append(link)
 
+    def process(self, chunks: Iterable[bytes | str] | None = None) -> None:
+        """Extract the links contained in a sitemap, either from the downloaded chunks
+        or from the content attribute. The links are handled as they are parsed."""
+        if chunks is None:
+            chunks = (self.content,)
+        self.handle_links(iter_sitemap_links(chunks, self.current_url, self.target_lang))
+
+    def handle_links(self, links: Iterable[tuple[str, str | None]]) -> None:
+        "Examine links along with their lastmod date and skip the ones modified before the since date."
+        for link, lastmod in islice(links, MAX_LINKS):
+            if self.since is None or not is_outdated(lastmod, self.since):
+                self.handle_link(link)
+        LOGGER.debug(
+            "%s sitemaps and %s links found for %s",
+            len(self.sitemap_urls),
+            len(self.urls),
+            self.current_url,
+        )
+
     def extract_links(self, regex: Pattern[str], index: int, handler: Callable[[str], None]) -> None:
         "Extract links from the content using pre-defined regex, index and handler."
         for match in (m[index] for m in islice(regex.finditer(self.content), MAX_LINKS)):
@@ -125,41 +183,129 @@ class SitemapObject:
         )
 
     def extract_sitemap_langlinks(self) -> None:
-        "Extract links corresponding to a given target language."
-        if "hreflang=" not in self.content:
+        "Extract links corresponding to a given target language from the XML content."
+        if self.target_lang is None or "hreflang=" not in self.content:
             return
-
-        lang_regex = re.compile(rf"hreflang=[\"']({self.target_lang}.*?|x-default)[\"']", re.DOTALL)
-
-        def handle_lang_link(attrs: str) -> None:
-            "Examine language code attributes."
-            if lang_regex.search(attrs):
-                lang_match = HREFLANG_REGEX.search(attrs)
-                if lang_match:
-                    self.handle_link(lang_match[1])
-
-        self.extract_links(XHTML_REGEX, 0, handle_lang_link)
+        self.handle_links(_iter_xml_links((self.content,), self.target_lang, main_links=False))
 
     def extract_sitemap_links(self) -> None:
-        "Extract sitemap links and web page links from a sitemap file."
-        self.extract_links(LINK_REGEX, 1, self.handle_link)  # process middle part of the match tuple
-
-    def process(self) -> None:
-        "Download a sitemap and extract the links it contains."
-        plausible = is_plausible_sitemap(self.current_url, self.content)
-        # safeguard
-        if not plausible:
-            return
-        # try to extract links from TXT file
-        if not SITEMAP_FORMAT.match(self.content):
-            self.extract_links(DETECT_LINKS, 0, self.handle_link)
-            return
-        # process XML sitemap
-        if self.target_lang is not None:
-            self.extract_sitemap_langlinks()
-            if self.sitemap_urls or self.urls:
-                return
-        self.extract_sitemap_links()
+        "Extract sitemap links and web page links from the XML content."
+        self.handle_links(_iter_xml_links((self.content,), None))
+
+
+class SitemapSearch:
+    "Search for sitemap links on a website, performed one request at a time."
+
+    __slots__ = ["failed", "guesses", "host", "sitemap", "url", "urlfilter"]
+
+    def __init__(self, url: str) -> None:
+        self.url: str = url
+        self.host: str = get_hostinfo(url)[1] or url
+        self.sitemap: SitemapObject | None = None
+        self.urlfilter: str | None = None
+        # a sitemap could not be downloaded or the search broke off
+        self.failed = False
+        # usual sitemap locations tried in the absence of other information
+        self.guesses: set[str] = set()
+
+    def start(self, target_lang: str | None = None, external: bool = False, since: datetime | None = None) -> bool:
+        "Check if the website is reachable and find the first sitemaps, return False if it is not."
+        domainname, baseurl = get_hostinfo(self.url)
+        if domainname is None:
+            LOGGER.warning("invalid URL: %s", self.url)
+            return False
+
+        if not is_live_page(baseurl):
+            LOGGER.warning("base URL unreachable, dropping sitemap: %s", self.url)
+            return False
+
+        if self.url.endswith((".gz", "sitemap", ".xml")):
+            sitemapurls = [self.url]
+        else:
+            sitemapurls = []
+            # set url filter to target subpages
+            if len(self.url) > len(baseurl) + 2:
+                self.urlfilter = self.url
+
+        self.sitemap = SitemapObject(baseurl, domainname, sitemapurls, target_lang, external, since)
+
+        # try sitemaps in robots.txt file, additional URLs just in case
+        if not self.sitemap.sitemap_urls:
+            sitemapurls = find_robots_sitemaps(baseurl)
+            if not sitemapurls:
+                sitemapurls = [f"{baseurl}/{g}" for g in GUESSES]
+                self.guesses.update(sitemapurls)
+            for sitemapurl in sitemapurls:
+                self.sitemap.add_sitemap(sitemapurl)
+        return True
+
+    def step(self, max_sitemaps: int = MAX_SITEMAPS_SEEN) -> bool:
+        "Fetch and process the next sitemap, return False if there is nothing left to do."
+        sitemap = self.sitemap
+        if sitemap is None or not sitemap.sitemap_urls or len(sitemap.seen) >= max_sitemaps:
+            return False
+        sitemap.current_url = sitemap.next_sitemap()
+        received = False
+
+        def chunks() -> Iterator[bytes]:
+            nonlocal received
+            for chunk in sitemap.fetch():
+                received = True
+                yield chunk
+
+        sitemap.process(chunks())
+        # missing guesses are expected, other sitemaps are known to exist
+        if not received and sitemap.current_url not in self.guesses:
+            LOGGER.warning("sitemap not downloaded: %s", sitemap.current_url)
+            self.failed = True
+        return bool(sitemap.sitemap_urls) and len(sitemap.seen) < max_sitemaps
+
+    def complete(self) -> bool:
+        "Tell if all the sitemaps found on the website have been processed without errors."
+        return not self.failed and self.sitemap is not None and not self.sitemap.sitemap_urls
+
+    def results(self) -> list[str]:
+        "Return the links found on the website."
+        if self.sitemap is None:
+            return []
+        urls = self.sitemap.urls
+        if self.urlfilter:
+            urls = filter_urls(urls, self.urlfilter)
+        LOGGER.debug("%s sitemap links found for %s", len(urls), self.sitemap.domain)
+        return urls
+
+
+class SitemapState:
+    """Keep track of the last harvest of each website in a JSON file, so that
+    the following runs only return the links modified in the meantime."""
+
+    __slots__ = ["filename", "last_runs"]
+
+    def __init__(self, filename: str) -> None:
+        self.filename = filename
+        self.last_runs: dict[str, str] = {}
+        if path.isfile(filename):
+            try:
+                with open(filename, "r", encoding="utf-8") as inputfile:
+                    self.last_runs = json.load(inputfile)
+            except (OSError, ValueError) as err:
+                LOGGER.error("cannot read sitemap state file %s: %s", filename, err)
+
+    def since(self, host: str) -> datetime | None:
+        "Date of the last harvest of the website if there is one."
+        last_run = self.last_runs.get(host)
+        return parse_lastmod(last_run) if isinstance(last_run, str) else None
+
+    def record(self, host: str, date: datetime) -> None:
+        "Store the date of a successful harvest."
+        self.last_runs[host] = _as_utc(date).isoformat()
+
+    def save(self) -> None:
+        "Write the state to the file, which is replaced atomically."
+        temp_file = self.filename + ".tmp"
+        with open(temp_file, "w", encoding="utf-8") as outputfile:
+            json.dump(self.last_runs, outputfile, indent=0, sort_keys=True)
+        replace(temp_file, self.filename)
 
 
 def sitemap_search(
@@ -168,6 +314,8 @@ def sitemap_search(
     external: bool = False,
     sleep_time: float = 2.0,
     max_sitemaps: int = MAX_SITEMAPS_SEEN,
+    since: datetime | None = None,
+    state_file: str | None = None,
 ) -> list[str]:
     """Look for sitemaps for the given URL and gather links.
 
@@ -180,52 +328,321 @@ def sitemap_search(
                   (boolean, defaults to False).
         sleep_time: Wait between requests on the same website.
         max_sitemaps: Maximum number of sitemaps to process.
+        since: Skip sitemaps and links whose lastmod date is older than this date
+               (naive datetimes are taken as UTC).
+        state_file: JSON file storing the date of the last run for each website,
+                    used instead of since if no date is given. Updated after a complete
+                    search without errors.
 
     Returns:
         The extracted links as a list (sorted list of unique links).
 
     """
-    domainname, baseurl = get_hostinfo(url)
-    if domainname is None:
-        LOGGER.warning("invalid URL: %s", url)
+    started = datetime.now(timezone.utc)
+    state = SitemapState(state_file) if state_file else None
+    search = SitemapSearch(url)
+    if not search.start(target_lang, external, since or (state.since(search.host) if state else None)):
         return []
 
-    if not is_live_page(baseurl):
-        LOGGER.warning("base URL unreachable, dropping sitemap: %s", url)
-        return []
+    # iterate through nested sitemaps and results
+    while search.step(max_sitemaps):
+        sleep(sleep_time)
 
-    urlfilter = None
+    if state and search.complete():
+        state.record(search.host, started)
+        state.save()
+    return search.results()
 
-    if url.endswith((".gz", "sitemap", ".xml")):
-        sitemapurls = [url]
-    else:
-        sitemapurls = []
-        # set url filter to target subpages
-        if len(url) > len(baseurl) + 2:
-            urlfilter = url
 
-    sitemap = SitemapObject(baseurl, domainname, sitemapurls, target_lang, external)
+def _search_step(
+    search: SitemapSearch, target_lang: str | None, external: bool, max_sitemaps: int, since: datetime | None
+) -> bool:
+    "Start the search on a website or process its next sitemap, return False once it is over."
+    if search.sitemap is None:
+        return search.start(target_lang, external, since) and search.step(max_sitemaps)
+    return search.step(max_sitemaps)
 
-    # try sitemaps in robots.txt file, additional URLs just in case
-    if not sitemap.sitemap_urls:
-        sitemap.sitemap_urls = find_robots_sitemaps(baseurl) or [f"{baseurl}/{g}" for g in GUESSES]
 
-    # iterate through nested sitemaps and results
-    while sitemap.sitemap_urls and len(sitemap.seen) < max_sitemaps:
-        sitemap.current_url = sitemap.sitemap_urls.pop()
-        sitemap.fetch()
-        sitemap.process()
-        # sanity check: keep track of visited sitemaps and exclude them
-        sitemap.sitemap_urls = [s for s in sitemap.sitemap_urls if s not in sitemap.seen]
+def sitemap_discovery(
+    urls: Iterable[str],
+    target_lang: str | None = None,
+    external: bool = False,
+    sleep_time: float = 2.0,
+    max_sitemaps: int = MAX_SITEMAPS_SEEN,
+    max_workers: int = 8,
+    since: datetime | None = None,
+    state_file: str | None = None,
+) -> Generator[tuple[str, list[str]], None, None]:
+    """Look for sitemaps on several websites at once. The requests are interleaved:
+    each host waits sleep_time between two requests while the others are processed,
+    so that no thread is blocked by the waiting times.
 
-        if len(sitemap.seen) < max_sitemaps:
-            sleep(sleep_time)
+    Args:
+        urls: Webpage or sitemap URLs, see sitemap_search().
+        target_lang: Define a language to filter URLs (ISO 639-1 format).
+        external: Similar hosts only or external URLs.
+        sleep_time: Wait between requests on the same host.
+        max_sitemaps: Maximum number of sitemaps to process per website.
+        max_workers: Number of requests performed at the same time.
+        since: Only return links modified since this date, see sitemap_search().
+        state_file: JSON file storing the date of the last run for each website,
+                    the websites searched completely and without errors are recorded
+                    once the generator is exhausted or closed.
 
-    if urlfilter:
-        sitemap.urls = filter_urls(sitemap.urls, urlfilter)
+    Returns:
+        The input URLs along with the extracted links, as soon as a website is done.
 
-    LOGGER.debug("%s sitemap links found for %s", len(sitemap.urls), domainname)
-    return sitemap.urls
+    """
+    started = datetime.now(timezone.utc)
+    state = SitemapState(state_file) if state_file else None
+    # schedule: time at which the search can go on, insertion order, search
+    ready: list[tuple[float, int, SitemapSearch]] = []
+    order = count()
+    for url in urls:
+        heappush(ready, (0.0, next(order), SitemapSearch(url)))
+    # politeness: next request allowed per host, websites waiting for a request on their host
+    next_time: dict[str, float] = {}
+    waiting: dict[str, list[SitemapSearch]] = {}
+    running: dict[Future[bool], SitemapSearch] = {}
+
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            while ready or running:
+                now = monotonic()
+                busy = {search.host for search in running.values()}
+                while ready and ready[0][0] <= now and len(running) < max_workers:
+                    _, _, search = heappop(ready)
+                    if search.host in busy:
+                        waiting.setdefault(search.host, []).append(search)
+                        continue
+                    if next_time.get(search.host, 0.0) > now:
+                        heappush(ready, (next_time[search.host], next(order), search))
+                        continue
+                    busy.add(search.host)
+                    last_run = since or (state.since(search.host) if state else None)
+                    running[executor.submit(_search_step, search, target_lang, external, max_sitemaps, last_run)] = search
+
+                # wait for a request to finish or for the next host to be ready
+                timeout = max(ready[0][0] - now, 0.0) if ready and len(running) < max_workers else None
+                if not running:
+                    sleep(timeout or 0.0)
+                    continue
+                done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    search = running.pop(future)
+                    next_time[search.host] = monotonic() + sleep_time
+                    try:
+                        go_on = future.result()
+                    except Exception as err:  # noqa: BLE001  # e.g. network errors
+                        LOGGER.error("sitemap search failed for %s: %s", search.url, err)
+                        search.failed = True
+                        go_on = False
+                    # other websites on the same host
+                    for other in waiting.pop(search.host, []):
+                        heappush(ready, (next_time[search.host], next(order), other))
+                    if go_on:
+                        heappush(ready, (next_time[search.host], next(order), search))
+                    else:
+                        yield search.url, search.results()
+                        # recorded once the results have been taken
+                        if state and search.complete():
+                            state.record(search.host, started)
+    finally:
+        if state:
+            state.save()
+
+
+def is_outdated(lastmod: str | None, since: datetime) -> bool:
+    "Tell if a lastmod date is older than the given date (UTC), missing or invalid dates are not."
+    date = parse_lastmod(lastmod)
+    if date is None:
+        return False
+    # without time the page may have been modified later that day
+    if "T" not in lastmod:  # type: ignore[operator]
+        return date.date() < since.date()
+    return date < since
+
+
+def parse_lastmod(lastmod: str | None) -> datetime | None:
+    "Convert a lastmod value (W3C datetime format) to a datetime in UTC, return None if it is invalid."
+    if not lastmod:
+        return None
+    lastmod = lastmod.strip()
+    if LASTMOD_PARTIAL.match(lastmod):
+        lastmod += "-01" * (3 - lastmod.count("-") - 1)
+    try:
+        # Python < 3.11 does not support the Z suffix
+        return _as_utc(datetime.fromisoformat(lastmod.replace("Z", "+00:00")))
+    except ValueError:
+        LOGGER.debug("invalid lastmod date: %s", lastmod)
+        return None
+
+
+def _as_utc(date: datetime) -> datetime:
+    "Make dates comparable: naive datetimes are taken as UTC."
+    return date.replace(tzinfo=timezone.utc) if date.tzinfo is None else date.astimezone(timezone.utc)
+
+
+def _read_at_least(chunks: Iterator[bytes | str], size: int) -> bytes | str:
+    "Concatenate the next chunks until the given size or the end of the data is reached."
+    data = next(chunks, b"")
+    while len(data) < size:
+        more = next(chunks, None)
+        if more is None:
+            break
+        data += more  # type: ignore[operator]
+    return data
+
+
+def _decompress(chunks: Iterable[bytes | str]) -> Iterator[bytes | str]:
+    "Decompress GZip data on the fly if needed, pass other data through."
+    chunks = iter(chunks)
+    first = _read_at_least(chunks, 3)  # magic number
+    if not isinstance(first, bytes) or first[:3] != b"\x1f\x8b\x08":
+        if first:
+            yield first
+        yield from chunks
+        return
+
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    try:
+        for chunk in chain((first,), chunks):
+            data = chunk if isinstance(chunk, bytes) else chunk.encode("utf-8")
+            while data:
+                # bound the memory used by highly compressed data
+                yield decompressor.decompress(data, CHUNK_SIZE)
+                data = decompressor.unconsumed_tail
+                # concatenated GZip members
+                if decompressor.eof and decompressor.unused_data:
+                    data = decompressor.unused_data + data
+                    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        yield decompressor.flush()
+    except zlib.error:
+        LOGGER.warning("invalid GZ file")
+
+
+def _localname(tag: str) -> str:
+    "Strip the namespace from an XML tag."
+    return tag.rpartition("}")[2]
+
+
+def _guess_encoding(sample: bytes) -> str:
+    "Guess the encoding of a TXT sitemap from its beginning, UTF-8 by default."
+    try:
+        # a character cut at the end of the sample is not an error
+        getincrementaldecoder("utf-8")().decode(sample)
+        return "utf-8"
+    except UnicodeDecodeError:
+        pass
+    for guessed_encoding in detect_encoding(sample):
+        try:
+            return lookup(guessed_encoding).name
+        except LookupError:
+            LOGGER.warning("wrong encoding detected: %s", guessed_encoding)
+    return "utf-8"
+
+
+def _iter_text_links(chunks: Iterable[bytes | str]) -> Iterator[str]:
+    "Find links in a TXT sitemap, the text is examined up to the last separator of each chunk."
+    chunks = iter(chunks)
+    sample = _read_at_least(chunks, ENCODING_SAMPLE)
+    encoding = _guess_encoding(sample) if isinstance(sample, bytes) else "utf-8"
+    decoder = getincrementaldecoder(encoding)(errors="replace")
+    rest = ""
+    for chunk in chain((sample,), chunks):
+        text = rest + (decoder.decode(chunk) if isinstance(chunk, bytes) else chunk)
+        cut = max(text.rfind(sep) for sep in LINK_SEPARATORS) + 1
+        yield from DETECT_LINKS.findall(text, 0, cut)
+        rest = text[cut:]
+    yield from DETECT_LINKS.findall(rest + decoder.decode(b"", final=True))
+
+
+def _iter_xml_links(
+    chunks: Iterable[bytes | str], target_lang: str | None, main_links: bool = True
+) -> Iterator[tuple[str, str | None]]:
+    """Parse an XML sitemap incrementally and discard each entry once it has been read.
+    With a target language the main links are only returned if the sitemap contains
+    no alternate link in this language, they are kept aside until then."""
+    parser = XMLPullParser(events=("end",), recover=True, resolve_entities=False, no_network=True)
+    loc, lastmod, alternates = "", None, []
+    # main links waiting for the end of the sitemap or for the first alternate link
+    pending: list[tuple[str, str | None]] = []
+    buffering, found_alternates = target_lang is not None, False
+    for chunk in chain(chunks, (None,)):
+        try:
+            if chunk is None:
+                parser.close()
+            else:
+                parser.feed(chunk)
+        except XMLSyntaxError as err:
+            LOGGER.debug("XML parsing error: %s", err)
+        for _, elem in parser.read_events():
+            if not isinstance(elem.tag, str):
+                continue
+            name = _localname(elem.tag)
+            if name == "loc":
+                parent = elem.getparent()
+                if parent is not None and _localname(str(parent.tag)) in ("url", "sitemap"):
+                    loc = (elem.text or "").strip()
+            elif name == "lastmod":
+                lastmod = (elem.text or "").strip() or None
+            elif name == "link" and target_lang is not None:
+                hreflang = elem.get("hreflang", "")
+                if elem.get("href") and (hreflang.startswith(target_lang) or hreflang == "x-default"):
+                    alternates.append(elem.get("href", ""))
+            elif name in ("url", "sitemap"):
+                if alternates:
+                    found_alternates = True
+                    pending.clear()
+                    yield from ((link, lastmod) for link in alternates)
+                elif loc.startswith("http") and main_links and not found_alternates:
+                    if not buffering:
+                        yield loc, lastmod
+                    else:
+                        pending.append((loc, lastmod))
+                        # no more links are taken from a sitemap anyway
+                        if len(pending) >= MAX_LINKS:
+                            buffering = False
+                            yield from pending
+                            pending.clear()
+                loc, lastmod, alternates = "", None, []
+                # free memory: the entry and the ones before it
+                elem.clear()
+                parent = elem.getparent()
+                if parent is not None:
+                    del parent[: parent.index(elem)]
+    yield from pending
+
+
+def iter_sitemap_links(
+    chunks: Iterable[bytes | str], url: str = "", target_lang: str | None = None
+) -> Generator[tuple[str, str | None], None, None]:
+    """Read a sitemap (XML, GZip-compressed XML or TXT) as it is downloaded
+    and yield the links it contains along with their last modification date if available.
+
+    Args:
+        chunks: Data of the sitemap, e.g. from fetch_stream().
+        url: URL of the sitemap, used to check the format.
+        target_lang: Return the alternate links in this language (hreflang) instead
+                     of the main links if the sitemap contains any.
+
+    Returns:
+        Tuples of link and lastmod string (or None).
+
+    """
+    data = _decompress(chunks)
+    # look at the beginning to determine the format
+    first = _read_at_least(data, PEEK_SIZE)
+    beginning = first.decode("utf-8", errors="ignore") if isinstance(first, bytes) else first
+
+    if not beginning or not is_plausible_sitemap(url, beginning):
+        return
+    # try to extract links from TXT file
+    if not SITEMAP_FORMAT.match(beginning):
+        yield from ((link, None) for link in _iter_text_links(chain((first,), data)))
+        return
+    # process XML sitemap
+    yield from _iter_xml_links(chain((first,), data), target_lang)
 
 
 def is_plausible_sitemap(url: str, contents: str | None) -> bool:
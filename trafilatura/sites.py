@@ -0,0 +1,350 @@
+"""
+Per-website adaptation of the extraction process.
+
+Pages of a website mostly share the same layout, so the extraction
+decisions taken on the first pages are likely to hold for the next ones.
+Settings can also be defined in advance for selected websites.
+"""
+
+import json
+import logging
+import re
+import sys
+from collections import Counter, OrderedDict
+from copy import copy
+from fnmatch import translate
+from functools import lru_cache
+from pathlib import Path
+from typing import Any
+from urllib.parse import urlsplit
+
+if sys.version_info >= (3, 11):
+    import tomllib
+
+from lxml.etree import XPath, iterwalk
+from lxml.html import HtmlElement
+
+from .settings import Document, Extractor
+from .utils import trim
+from .xml import delete_element
+from .xpaths import BODY_XPATH
+
+LOGGER = logging.getLogger(__name__)
+
+# a decision has to be taken on this many documents before being reused
+MIN_OBSERVATIONS = 10
+# share of documents on which the same decision has to be taken
+BODY_CONFIDENCE = 0.8
+COMPARISON_CONFIDENCE = 0.95
+# run the full comparison on every n-th document to check a skipped step
+REVALIDATION_PERIOD = 20
+# number of hosts kept in memory
+MAX_HOSTS = 10000
+
+# containers which can be part of the website template
+TEMPLATE_TAGS = {"aside", "div", "dl", "footer", "form", "header", "nav", "ol", "section", "table", "ul"}
+# a block seen on this many distinct pages of a website is considered to be boilerplate
+TEMPLATE_MIN_PAGES = 3
+# number of block fingerprints kept per host, the least recently seen are forgotten first
+MAX_TEMPLATE_ENTRIES = 1000
+
+# keys of a site profile
+PROFILE_KEYS = {"body_xpath", "metadata", "options", "prune_xpath"}
+# extraction options which can be changed for a website
+PROFILE_OPTIONS = {"comments", "dedup", "fast", "focus", "formatting", "images", "links", "tables"}
+# metadata fields which can be set for a whole website
+PROFILE_METADATA = {"author", "hostname", "language", "license", "pagetype", "sitename"}
+
+
+class Tally:
+    "Count the outcomes of a decision and find a reliable favorite."
+
+    __slots__ = ["counts", "total"]
+
+    def __init__(self) -> None:
+        self.counts: Counter[int] = Counter()
+        self.total = 0
+
+    def record(self, outcome: int | None) -> None:
+        "Store the outcome of a decision, None registers a failure."
+        self.total += 1
+        if outcome is not None:
+            self.counts[outcome] += 1
+
+    def confidence(self, outcome: int) -> float:
+        "Share of the decisions which led to the given outcome."
+        return self.counts[outcome] / self.total if self.total else 0.0
+
+    def favorite(self, threshold: float) -> int | None:
+        "Return the most frequent outcome if it is frequent enough."
+        if self.total < MIN_OBSERVATIONS or not self.counts:
+            return None
+        outcome, _ = self.counts.most_common(1)[0]
+        return outcome if self.confidence(outcome) >= threshold else None
+
+
+def block_fingerprints(tree: HtmlElement) -> dict[int, list[HtmlElement]]:
+    """Fingerprint the container elements of a tree by tag path, class and
+    a hash of their content, computed bottom-up in a single pass.
+    Elements without text are left out."""
+    blocks: dict[int, list[HtmlElement]] = {}
+    path: list[str] = []
+    # hashes and text lengths of the children of the elements being walked
+    stack: list[list[tuple[int, int]]] = [[]]
+    for event, elem in iterwalk(tree, events=("start", "end")):
+        tag = elem.tag if isinstance(elem.tag, str) else ""
+        if event == "start":
+            path.append(tag)
+            stack.append([])
+            continue
+        children = stack.pop()
+        text = trim(elem.text or "")
+        content = hash((tag, text, tuple(children)))
+        length = len(text) + sum(size for _, size in children)
+        if tag in TEMPLATE_TAGS and length > 0:
+            fingerprint = hash(("/".join(path), elem.get("class", ""), content))
+            blocks.setdefault(fingerprint, []).append(elem)
+        path.pop()
+        tail = trim(elem.tail or "")
+        stack[-1].append((content, length))
+        if tail:
+            stack[-1].append((hash(tail), len(tail)))
+    return blocks
+
+
+def main_containers(tree: HtmlElement) -> set[HtmlElement]:
+    "Elements selected by the main text expressions and their ancestors."
+    protected: set[HtmlElement] = set()
+    for expr in BODY_XPATH:
+        subtree = next(iter(expr(tree)), None)
+        if subtree is not None:
+            protected.add(subtree)
+            protected.update(subtree.iterancestors())
+    return protected
+
+
+class HostShortcuts:
+    """Extraction decisions recorded for a host: index of the XPath expressions
+    which found the main text and the comments, outcome of the comparison
+    with external algorithms (1 if the own extraction was kept), and pages
+    (URL hashes) on which blocks of the website template have been seen."""
+
+    __slots__ = ["body", "comments", "comparison", "skipped", "templates"]
+
+    def __init__(self) -> None:
+        self.body = Tally()
+        self.comments = Tally()
+        self.comparison = Tally()
+        self.skipped = 0
+        self.templates: OrderedDict[int, tuple[int, ...]] = OrderedDict()
+
+    @staticmethod
+    def _order(tally: Tally, length: int, threshold: float) -> list[int]:
+        "Put the favorite outcome first and keep the default order for the rest."
+        favorite = tally.favorite(threshold)
+        if favorite is None or not 0 <= favorite < length:
+            return list(range(length))
+        return [favorite] + [i for i in range(length) if i != favorite]
+
+    def body_order(self, length: int) -> list[int]:
+        "Order in which the main text expressions are to be tried."
+        return self._order(self.body, length, BODY_CONFIDENCE)
+
+    def comments_order(self, length: int) -> list[int]:
+        "Order in which the comments expressions are to be tried."
+        return self._order(self.comments, length, BODY_CONFIDENCE)
+
+    def skip_comparison(self) -> bool:
+        "Tell if the own extraction is reliable enough to skip the external algorithms."
+        if self.comparison.favorite(COMPARISON_CONFIDENCE) != 1:
+            return False
+        self.skipped += 1
+        # keep checking from time to time so that changes are noticed
+        return self.skipped % REVALIDATION_PERIOD != 0
+
+    def prune_templates(self, tree: HtmlElement, url: str) -> HtmlElement:
+        """Register the blocks of the page and delete those seen on other pages of the website,
+        each page is only counted once and the containers of the main text are kept."""
+        templates = self.templates
+        page = hash(url)
+        candidates = []
+        for fingerprint, elements in block_fingerprints(tree).items():
+            pages = templates.get(fingerprint, ())
+            if page not in pages and len(pages) < TEMPLATE_MIN_PAGES:
+                pages = (*pages, page)
+            # the blocks of the template are seen on every page and stay in memory
+            templates[fingerprint] = pages
+            templates.move_to_end(fingerprint)
+            if len(pages) >= TEMPLATE_MIN_PAGES:
+                candidates.extend(elements)
+        while len(templates) > MAX_TEMPLATE_ENTRIES:
+            templates.popitem(last=False)
+        if candidates:
+            protected = main_containers(tree)
+            for elem in candidates:
+                if elem not in protected:
+                    delete_element(elem)
+        return tree
+
+
+class SiteShortcuts:
+    "Store extraction decisions per host."
+
+    __slots__ = ["hosts"]
+
+    def __init__(self) -> None:
+        self.hosts: dict[str, HostShortcuts] = {}
+
+    def __len__(self) -> int:
+        return len(self.hosts)
+
+    def get(self, url: str | None) -> HostShortcuts | None:
+        "Find or create the record corresponding to the host of the URL."
+        try:
+            host = urlsplit(url).hostname if url else None
+        except ValueError:
+            host = None
+        if not host:
+            return None
+        if host not in self.hosts:
+            if len(self.hosts) >= MAX_HOSTS:
+                # evict the oldest host
+                del self.hosts[next(iter(self.hosts))]
+            self.hosts[host] = HostShortcuts()
+        return self.hosts[host]
+
+    def clear(self) -> None:
+        "Forget all recorded decisions."
+        self.hosts.clear()
+
+
+SITE_SHORTCUTS = SiteShortcuts()
+
+
+@lru_cache(maxsize=1024)
+def compile_xpaths(expressions: tuple[str, ...]) -> list[XPath]:
+    "Compile XPath expressions once and reuse them."
+    return [XPath(expr) for expr in expressions]
+
+
+def _as_tuple(value: str | list[str] | None) -> tuple[str, ...]:
+    "Accept single expressions as well as lists."
+    if value is None:
+        return ()
+    return (value,) if isinstance(value, str) else tuple(value)
+
+
+class SiteProfile:
+    """Extraction settings for a website: XPath expressions to prune the tree,
+    expressions to try first to find the main text, option overrides and
+    metadata values which hold for the whole website."""
+
+    __slots__ = ["body_xpath", "metadata", "name", "options", "prune_xpath"]
+
+    def __init__(self, name: str, settings: dict[str, Any]) -> None:
+        self.name = name
+        if unknown := set(settings) - PROFILE_KEYS:
+            raise ValueError(f"unknown profile keys for {name}: {sorted(unknown)}")
+        self.prune_xpath = compile_xpaths(_as_tuple(settings.get("prune_xpath")))
+        self.body_xpath = compile_xpaths(_as_tuple(settings.get("body_xpath")))
+        self.options: dict[str, Any] = settings.get("options", {})
+        if unknown := set(self.options) - PROFILE_OPTIONS:
+            raise ValueError(f"unknown profile options for {name}: {sorted(unknown)}")
+        if self.options.get("focus", "balanced") not in ("balanced", "precision", "recall"):
+            raise ValueError(f"invalid focus for {name}: {self.options['focus']}")
+        self.metadata: dict[str, str] = settings.get("metadata", {})
+        if unknown := set(self.metadata) - PROFILE_METADATA:
+            raise ValueError(f"unknown profile metadata for {name}: {sorted(unknown)}")
+
+    def apply(self, options: Extractor) -> Extractor:
+        "Return extraction options with the overrides of the profile."
+        if not self.options:
+            return options
+        options = copy(options)
+        for key, value in self.options.items():
+            setattr(options, key, value)
+        return options
+
+    def complete(self, document: Document) -> None:
+        "Set the metadata fields known for the website."
+        for key, value in self.metadata.items():
+            setattr(document, key, value)
+
+
+class SiteProfiles:
+    """Registry of site profiles indexed by hostname or URL pattern.
+    Hostnames also match their subdomains, patterns containing * or /
+    are matched against hostname and path of the URL."""
+
+    __slots__ = ["hosts", "lookups", "patterns"]
+
+    def __init__(self) -> None:
+        self.hosts: dict[str, SiteProfile] = {}
+        self.patterns: list[tuple[re.Pattern[str], SiteProfile]] = []
+        self.lookups: dict[str, SiteProfile | None] = {}
+
+    def __len__(self) -> int:
+        return len(self.hosts) + len(self.patterns)
+
+    def add(self, key: str, settings: dict[str, Any]) -> None:
+        "Register a profile for a hostname or a URL pattern."
+        profile = SiteProfile(key, settings)
+        if "*" in key or "/" in key:
+            self.patterns.append((re.compile(translate(key.lower())), profile))
+        else:
+            self.hosts[key.lower()] = profile
+        self.lookups.clear()
+
+    def load(self, filename: str) -> None:
+        "Read profiles from a JSON or TOML file, the top-level keys being hostnames or patterns."
+        filepath = Path(filename)
+        if filepath.suffix == ".toml":
+            if sys.version_info >= (3, 11):
+                with open(filepath, "rb") as filehandle:
+                    data = tomllib.load(filehandle)
+            else:
+                raise ValueError("TOML profiles require Python 3.11 or above")
+        else:
+            with open(filepath, "r", encoding="utf-8") as filehandle:
+                data = json.load(filehandle)
+        for key, settings in data.items():
+            self.add(key, settings)
+        LOGGER.debug("%s site profiles loaded from %s", len(data), filename)
+
+    def _find_host(self, host: str) -> SiteProfile | None:
+        "Look for the host and its parent domains."
+        if host not in self.lookups:
+            if len(self.lookups) >= MAX_HOSTS:
+                self.lookups.clear()
+            labels = host.split(".")
+            self.lookups[host] = next(
+                (self.hosts[d] for d in (".".join(labels[i:]) for i in range(len(labels))) if d in self.hosts), None
+            )
+        return self.lookups[host]
+
+    def get(self, url: str | None) -> SiteProfile | None:
+        "Find the profile corresponding to a URL."
+        if not url or not (self.hosts or self.patterns):
+            return None
+        try:
+            parts = urlsplit(url)
+            host = parts.hostname
+        except ValueError:
+            return None
+        if not host:
+            return None
+        if self.patterns:
+            target = host + parts.path
+            for pattern, profile in self.patterns:
+                if pattern.match(target):
+                    return profile
+        return self._find_host(host)
+
+    def clear(self) -> None:
+        "Remove all profiles."
+        self.hosts.clear()
+        self.patterns.clear()
+        self.lookups.clear()
+
+
+SITE_PROFILES = SiteProfiles()
@@ -22,12 +22,13 @@ try:
 except ImportError:
     pass
 
-from lxml.etree import XPath, tostring
+from lxml.etree import tostring
 
 from .baseline import baseline
 from .downloads import Response, fetch_response, fetch_url
 from .htmlprocessing import prune_unwanted_nodes
 from .settings import DEFAULT_CONFIG
+from .sites import compile_xpaths
 from .utils import LANGID_FLAG, decode_file, load_html
 
 LOGGER = logging.getLogger(__name__)
@@ -199,7 +200,7 @@ def process_links(
         xpaths = [params.prune_xpath] if isinstance(params.prune_xpath, str) else params.prune_xpath
         tree = load_html(htmlstring)
         if tree is not None:
-            tree = prune_unwanted_nodes(tree, [XPath(x) for x in xpaths])
+            tree = prune_unwanted_nodes(tree, compile_xpaths(tuple(xpaths)))
             htmlstring = tostring(tree).decode()
 
     links, links_priority = [], []
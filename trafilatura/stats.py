@@ -0,0 +1,217 @@
+"""
+Throughput and latency figures of command-line runs.
+"""
+
+import json
+import logging
+import sys
+from collections import Counter, deque
+from datetime import datetime, timezone
+from math import ceil
+from os import replace
+from threading import Event, Lock, Thread
+from time import monotonic
+from typing import Any
+from urllib.parse import urlsplit
+
+LOGGER = logging.getLogger(__name__)
+
+# latency samples kept per stage to compute percentiles
+MAX_SAMPLES = 10000
+# hosts listed in summaries, the slowest first
+MAX_HOSTS = 20
+PERCENTILES = (0.5, 0.9, 0.99)
+
+
+def percentile(values: list[float], share: float) -> float:
+    "Nearest-rank percentile of sorted values."
+    if not values:
+        return 0.0
+    return values[max(ceil(share * len(values)) - 1, 0)]
+
+
+class RunStats:
+    """Thread-safe counters of a run: documents and bytes written,
+    download status codes and latency per host, latency per stage
+    (download, extraction, write), failure reasons and queue depths."""
+
+    __slots__ = [
+        "documents",
+        "failures",
+        "hosts",
+        "input_bytes",
+        "lock",
+        "output_bytes",
+        "queues",
+        "stages",
+        "start",
+        "status",
+    ]
+
+    def __init__(self) -> None:
+        self.lock = Lock()
+        self.start = monotonic()
+        self.documents = 0
+        self.input_bytes = 0
+        self.output_bytes = 0
+        self.status: Counter[str] = Counter()
+        self.failures: Counter[str] = Counter()
+        # number of downloads, total and maximum time
+        self.hosts: dict[str, list[float]] = {}
+        self.stages: dict[str, deque[float]] = {}
+        self.queues: dict[str, int] = {}
+
+    def record_download(self, url: str, status: int | None, size: int, seconds: float) -> None:
+        "Register a download, None as status meaning that no response was received."
+        host = urlsplit(url).hostname or ""
+        with self.lock:
+            self.status[str(status) if status is not None else "none"] += 1
+            self.input_bytes += size
+            entry = self.hosts.setdefault(host, [0, 0.0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] = max(entry[2], seconds)
+            self._add_sample("download", seconds)
+
+    def record_stage(self, stage: str, seconds: float) -> None:
+        "Register the time spent on a document in a stage."
+        with self.lock:
+            self._add_sample(stage, seconds)
+
+    def _add_sample(self, stage: str, seconds: float) -> None:
+        self.stages.setdefault(stage, deque(maxlen=MAX_SAMPLES)).append(seconds)
+
+    def record_document(self, size: int) -> None:
+        "Register a document written out."
+        with self.lock:
+            self.documents += 1
+            self.output_bytes += size
+
+    def record_failure(self, reason: str) -> None:
+        "Register a failure along with its reason."
+        with self.lock:
+            self.failures[reason] += 1
+
+    def set_queue(self, name: str, depth: int) -> None:
+        "Store the current number of documents waiting in a queue."
+        with self.lock:
+            self.queues[name] = depth
+
+    def summary(self) -> dict[str, Any]:
+        "Return the current figures."
+        with self.lock:
+            elapsed = max(monotonic() - self.start, 1e-9)
+            stages = {}
+            for stage, samples in self.stages.items():
+                values = sorted(samples)
+                stages[stage] = {f"p{int(p * 100)}": round(percentile(values, p), 4) for p in PERCENTILES}
+                stages[stage]["max"] = round(values[-1], 4) if values else 0.0
+            slowest = sorted(self.hosts.items(), key=lambda item: item[1][1] / item[1][0], reverse=True)[:MAX_HOSTS]
+            return {
+                "time": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                "elapsed": round(elapsed, 2),
+                "documents": self.documents,
+                "docs_per_s": round(self.documents / elapsed, 3),
+                "input_bytes": self.input_bytes,
+                "output_bytes": self.output_bytes,
+                "bytes_per_s": round(self.input_bytes / elapsed, 1),
+                "status": dict(self.status),
+                "failures": dict(self.failures),
+                "stages": stages,
+                "queues": dict(self.queues),
+                "hosts": {
+                    host: {"count": int(count), "mean": round(total / count, 4), "max": round(maximum, 4)}
+                    for host, (count, total, maximum) in slowest
+                },
+            }
+
+
+def format_summary(summary: dict[str, Any]) -> str:
+    "Condense the figures on a single line."
+    parts = [
+        f"{summary['documents']} docs ({summary['docs_per_s']}/s)",
+        f"{summary['input_bytes'] / 2**20:.1f} MB read ({summary['bytes_per_s'] / 2**20:.2f} MB/s)",
+    ]
+    for stage, figures in summary["stages"].items():
+        parts.append(f"{stage} p50 {figures['p50']}s p99 {figures['p99']}s")
+    if summary["queues"]:
+        parts.append("queues " + " ".join(f"{k}={v}" for k, v in summary["queues"].items()))
+    if summary["failures"]:
+        parts.append("failures " + " ".join(f"{k}={v}" for k, v in summary["failures"].items()))
+    return " | ".join(parts)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+
+
+def prometheus_text(summary: dict[str, Any]) -> str:
+    "Convert the figures to the Prometheus text exposition format."
+    lines = []
+
+    def metric(name: str, kind: str, samples: list[tuple[str, float]]) -> None:
+        lines.append(f"# TYPE trafilatura_{name} {kind}")
+        lines.extend(f"trafilatura_{name}{labels} {value}" for labels, value in samples)
+
+    metric("documents_total", "counter", [("", summary["documents"])])
+    metric("input_bytes_total", "counter", [("", summary["input_bytes"])])
+    metric("output_bytes_total", "counter", [("", summary["output_bytes"])])
+    metric("documents_per_second", "gauge", [("", summary["docs_per_s"])])
+    metric("status_total", "counter", [(f'{{code="{k}"}}', v) for k, v in summary["status"].items()])
+    metric("failures_total", "counter", [(f'{{reason="{_escape(k)}"}}', v) for k, v in summary["failures"].items()])
+    metric(
+        "stage_latency_seconds",
+        "summary",
+        [
+            (f'{{stage="{stage}",quantile="{p}"}}', figures[f"p{int(p * 100)}"])
+            for stage, figures in summary["stages"].items()
+            for p in PERCENTILES
+        ],
+    )
+    metric("queue_depth", "gauge", [(f'{{queue="{k}"}}', v) for k, v in summary["queues"].items()])
+    metric(
+        "host_latency_seconds_mean",
+        "gauge",
+        [(f'{{host="{_escape(host)}"}}', figures["mean"]) for host, figures in summary["hosts"].items()],
+    )
+    return "\n".join(lines) + "\n"
+
+
+class StatsReporter(Thread):
+    """Print a summary at regular intervals on STDERR and eventually write it
+    to a file: Prometheus textfile if the file name ends with .prom, JSON lines otherwise."""
+
+    def __init__(self, stats: RunStats, interval: float, filename: str | None = None) -> None:
+        super().__init__(daemon=True)
+        self.stats = stats
+        self.interval = interval
+        self.filename = filename
+        self.stopped = Event()
+
+    def report(self) -> None:
+        "Output the current figures."
+        summary = self.stats.summary()
+        sys.stderr.write(format_summary(summary) + "\n")
+        if not self.filename:
+            return
+        if self.filename.endswith(".prom"):
+            # the textfile collector may read at any moment
+            with open(self.filename + ".tmp", "w", encoding="utf-8") as outputfile:
+                outputfile.write(prometheus_text(summary))
+            replace(self.filename + ".tmp", self.filename)
+        else:
+            with open(self.filename, "a", encoding="utf-8") as outputfile:
+                outputfile.write(json.dumps(summary) + "\n")
+
+    def run(self) -> None:
+        while not self.stopped.wait(self.interval):
+            try:
+                self.report()
+            except OSError as err:
+                LOGGER.error("cannot write statistics: %s", err)
+
+    def stop(self) -> None:
+        "Stop the periodic reports and output the final figures."
+        self.stopped.set()
+        self.join()
+        self.report()
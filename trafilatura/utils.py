@@ -74,6 +74,8 @@ FAULTY_HTML = re.compile(r"(<html.*?)\s*/>", re.I)
 HTML_STRIP_TAGS = re.compile(r"(<!--.*?-->|<[^>]*>)")
 # control characters
 INVALID_XML_CHARS = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]")
+# end of the document head: closing tag or, if it is omitted, start of the body
+HEAD_BOUNDARY = re.compile(r"</head\s*>|<body[\s>]", re.IGNORECASE)
 
 # note: htmldate could use HTML comments
 # huge_tree=True, remove_blank_text=True
@@ -278,6 +280,26 @@ def load_html(htmlobject: Any) -> HtmlElement | None:
     return tree
 
 
+def load_html_head(htmlobject: Any) -> HtmlElement | None:
+    """Parse the document only up to the end of its <head> section (or the start
+    of the <body> if the closing tag is missing), for metadata-only workloads.
+    Returns None if the input is already a tree or if no boundary is found,
+    in which case the caller should resort to load_html().
+    """
+    if isinstance(htmlobject, HtmlElement):
+        return None
+    if isinstance(htmlobject, HTTPResponse) or hasattr(htmlobject, "data"):
+        htmlobject = htmlobject.data
+    if not isinstance(htmlobject, (bytes, str)):
+        raise TypeError("incompatible input type", type(htmlobject))
+    htmlobject = decode_file(htmlobject)
+    match = HEAD_BOUNDARY.search(htmlobject)
+    if not match:
+        return None
+    # close the prefix so that libxml2 sees a complete (if empty) document
+    return load_html(htmlobject[: match.start()] + "</head><body></body></html>")
+
+
 @lru_cache(maxsize=2**14)  # sys.maxunicode = 1114111
 def return_printables_and_spaces(char: str) -> str:
     "Return a character if it belongs to certain classes"
@@ -0,0 +1,269 @@
+"""
+Reading and writing web archives in WARC format.
+"""
+
+import gzip
+import logging
+from collections.abc import Generator
+from datetime import datetime, timezone
+from http import HTTPStatus
+from importlib.metadata import version
+from io import BufferedIOBase, BufferedReader
+from os import listdir, makedirs, path
+from typing import TYPE_CHECKING, BinaryIO
+from urllib.parse import urlsplit
+from uuid import uuid4
+
+from .downloads import Response
+
+if TYPE_CHECKING:  # pragma: no cover
+    from typing_extensions import Self
+
+LOGGER = logging.getLogger(__name__)
+
+# content types of the payloads passed on to the extraction
+HTML_TYPES = ("text/html", "application/xhtml+xml")
+# read and skip record blocks by chunks of this size
+CHUNK_SIZE = 2**16
+# 1 GB per WARC file by default, as recommended by the specification
+WARC_SIZE = 2**30
+# the stored payloads are decoded, these headers would not describe them anymore
+DECODING_HEADERS = {"content-encoding", "content-length", "transfer-encoding"}
+
+
+class WarcRecord:
+    "Record of a WARC file: type, target URI, date (YYYY-MM-DD), WARC headers and content block."
+
+    __slots__ = ["content", "date", "headers", "type", "url"]
+
+    def __init__(self, headers: dict[str, str], content: bytes) -> None:
+        self.headers = headers
+        self.content = content
+        self.type = headers.get("warc-type", "")
+        self.url = headers.get("warc-target-uri", "").strip("<>")
+        self.date = headers.get("warc-date", "")[:10] or None
+
+
+def _open_stream(source: BinaryIO) -> BufferedIOBase:
+    "Read a WARC file, gzip members are decompressed on the fly."
+    stream = source if isinstance(source, BufferedReader) else BufferedReader(source)  # type: ignore[type-var]
+    if stream.peek(2)[:2] == b"\x1f\x8b":
+        # multi-member gzip: one member after the other, never expanded at once
+        return gzip.GzipFile(fileobj=stream, mode="rb")
+    return stream
+
+
+def _read_headers(stream: BufferedIOBase) -> dict[str, str]:
+    "Read header lines until an empty line, keys are lowercased."
+    headers: dict[str, str] = {}
+    while (line := stream.readline()) and line.strip():
+        key, _, value = line.decode("utf-8", errors="replace").partition(":")
+        headers[key.strip().lower()] = value.strip()
+    return headers
+
+
+def _skip(stream: BufferedIOBase, length: int) -> None:
+    "Advance in the stream without keeping the data."
+    while length > 0 and (data := stream.read(min(length, CHUNK_SIZE))):
+        length -= len(data)
+
+
+def iter_warc_records(source: str | BinaryIO, record_types: tuple[str, ...] = ()) -> Generator[WarcRecord, None, None]:
+    """Iterate over the records of a WARC file (plain or gzipped), optionally
+    restricted to certain record types whose blocks are the only ones read into memory."""
+    if isinstance(source, str):
+        with open(source, "rb") as filehandle:
+            yield from iter_warc_records(filehandle, record_types)
+        return
+    stream = _open_stream(source)
+    while line := stream.readline():
+        if not line.strip():
+            continue
+        if not line.startswith(b"WARC/"):
+            LOGGER.error("invalid WARC record, stopping: %s", line[:50])
+            break
+        headers = _read_headers(stream)
+        length = int(headers.get("content-length", 0))
+        if record_types and headers.get("warc-type") not in record_types:
+            _skip(stream, length)
+            continue
+        yield WarcRecord(headers, stream.read(length))
+
+
+def _dechunk(body: bytes) -> bytes:
+    "Decode a body sent with chunked transfer encoding."
+    chunks, position = [], 0
+    while True:
+        end = body.find(b"\r\n", position)
+        if end == -1:
+            break
+        try:
+            size = int(body[position:end].split(b";")[0], 16)
+        except ValueError:
+            return body
+        if size == 0:
+            break
+        chunks.append(body[end + 2 : end + 2 + size])
+        position = end + 4 + size
+    return b"".join(chunks)
+
+
+def parse_http_response(content: bytes) -> tuple[int, dict[str, str], bytes]:
+    "Split the block of a response record into status, headers (lowercased keys) and payload."
+    separator = content.find(b"\r\n\r\n")
+    if separator == -1:
+        return 0, {}, content
+    head, body = content[:separator], content[separator + 4 :]
+    status_line, *header_lines = head.decode("iso-8859-1").split("\r\n")
+    try:
+        status = int(status_line.split()[1])
+    except (IndexError, ValueError):
+        status = 0
+    headers = {}
+    for line in header_lines:
+        key, _, value = line.partition(":")
+        headers[key.strip().lower()] = value.strip()
+    if "chunked" in headers.get("transfer-encoding", "").lower():
+        body = _dechunk(body)
+    return status, headers, body
+
+
+def iter_html_responses(source: str | BinaryIO) -> Generator[tuple[str, bytes, str | None], None, None]:
+    """Stream the HTML pages archived in a WARC file: yield the target URI,
+    the payload and the fetch date (YYYY-MM-DD) of successful responses
+    whose content type is HTML or unknown."""
+    for record in iter_warc_records(source, ("response",)):
+        status, headers, payload = parse_http_response(record.content)
+        content_type = headers.get("content-type") or record.headers.get("warc-identified-payload-type", "")
+        # pages without content type are left to the extraction checks
+        if not 200 <= status < 300 or content_type and not content_type.lower().startswith(HTML_TYPES):
+            continue
+        yield record.url, payload, record.date
+
+
+def _format_headers(headers: dict[str, str]) -> str:
+    "Write header lines."
+    return "".join(f"{key}: {value}\r\n" for key, value in headers.items())
+
+
+class WarcWriter:
+    """Append records to WARC files in a directory. Each record is compressed
+    as a separate gzip member and a new file is started once the current one
+    exceeds the given size. Files of previous runs are not overwritten."""
+
+    __slots__ = ["directory", "filehandle", "filename", "max_size", "number", "prefix"]
+
+    def __init__(self, directory: str, max_size: int = WARC_SIZE, prefix: str = "backup") -> None:
+        self.directory = directory
+        self.max_size = max_size
+        self.prefix = prefix
+        makedirs(directory, exist_ok=True)
+        self.number = sum(1 for f in listdir(directory) if f.startswith(prefix + "-") and f.endswith(".warc.gz"))
+        self.filehandle: BinaryIO | None = None
+        self.filename = ""
+
+    def _open(self) -> BinaryIO:
+        "Start a new file with a warcinfo record."
+        self.filename = f"{self.prefix}-{self.number:05d}.warc.gz"
+        self.number += 1
+        filehandle = open(path.join(self.directory, self.filename), "ab")  # noqa: SIM115  # closed in close()
+        info = f"software: trafilatura/{version('trafilatura')}\r\nformat: WARC File Format 1.0\r\n"
+        _, record = self._build_record(
+            "warcinfo", "", info.encode(), "application/warc-fields", None, {"WARC-Filename": self.filename}
+        )
+        filehandle.write(record)
+        return filehandle
+
+    @staticmethod
+    def _build_record(
+        warc_type: str,
+        url: str,
+        block: bytes,
+        content_type: str,
+        date: datetime | None,
+        headers: dict[str, str] | None,
+    ) -> tuple[str, bytes]:
+        "Return the ID of a new record and its compressed content."
+        record_id = f"<urn:uuid:{uuid4()}>"
+        warc_headers = {
+            "WARC-Type": warc_type,
+            "WARC-Record-ID": record_id,
+            "WARC-Date": (date or datetime.now(timezone.utc)).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        }
+        if url:
+            warc_headers["WARC-Target-URI"] = url
+        warc_headers.update(headers or {})
+        warc_headers["Content-Type"] = content_type
+        warc_headers["Content-Length"] = str(len(block))
+        record = b"WARC/1.0\r\n" + _format_headers(warc_headers).encode("utf-8") + b"\r\n" + block + b"\r\n\r\n"
+        return record_id, gzip.compress(record)
+
+    def write_record(
+        self,
+        warc_type: str,
+        url: str,
+        block: bytes,
+        content_type: str,
+        date: datetime | None = None,
+        headers: dict[str, str] | None = None,
+    ) -> str:
+        "Append a record and return its ID."
+        filehandle = self._rotate()
+        record_id, record = self._build_record(warc_type, url, block, content_type, date, headers)
+        filehandle.write(record)
+        return record_id
+
+    def _rotate(self) -> BinaryIO:
+        "Return the current file or start a new one if it is full."
+        if self.filehandle is None or self.filehandle.tell() >= self.max_size:
+            self.close()
+            self.filehandle = self._open()
+        return self.filehandle
+
+    def write_response(
+        self, response: Response, request_headers: dict[str, str] | None = None, date: datetime | None = None
+    ) -> None:
+        "Store a downloaded page as a pair of request and response records."
+        date = date or datetime.now(timezone.utc)
+        parts = urlsplit(response.url)
+        target = parts.path or "/"
+        if parts.query:
+            target += "?" + parts.query
+        request = {"Host": parts.netloc, **(request_headers or {})}
+        response_id, response_record = self._build_record(
+            "response", response.url, self._http_response(response), "application/http; msgtype=response", date, None
+        )
+        _, request_record = self._build_record(
+            "request",
+            response.url,
+            f"GET {target} HTTP/1.1\r\n{_format_headers(request)}\r\n".encode(),
+            "application/http; msgtype=request",
+            date,
+            {"WARC-Concurrent-To": response_id},
+        )
+        # both records go to the same file
+        self._rotate().write(response_record + request_record)
+
+    @staticmethod
+    def _http_response(response: Response) -> bytes:
+        "Rebuild the HTTP response from the status, the headers and the (decoded) data."
+        try:
+            reason = HTTPStatus(response.status).phrase
+        except ValueError:
+            reason = ""
+        headers = {k: v for k, v in (response.headers or {}).items() if k.lower() not in DECODING_HEADERS}
+        headers["content-length"] = str(len(response.data or b""))
+        head = f"HTTP/1.1 {response.status} {reason}\r\n{_format_headers(headers)}\r\n"
+        return head.encode("iso-8859-1", errors="replace") + (response.data or b"")
+
+    def close(self) -> None:
+        "Close the current file."
+        if self.filehandle is not None:
+            self.filehandle.close()
+            self.filehandle = None
+
+    def __enter__(self) -> "Self":
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self.close()